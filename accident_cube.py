@@ -0,0 +1,180 @@
+import os
+import numpy as np
+import pandas as pd
+from accident_store import CLEANED_STORE
+from filter_engine import FilterIndex
+from calendar_features import day_numbers, calendar_from_days, weekday_labels, month_labels
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Pre-aggregated accident counts, built at ingest time and stored next to the data.
+# Every cuboid is grouped by the dashboard filter dimensions plus its own extra
+# dimensions, so the date, State and Severity filters apply to it directly:
+#   Day (days since 1970-01-01), State, Severity
+# Weekday, Month and Year are rolled up from Day, so the counts, KPIs and the calendar
+# charts never need raw rows. Only dimensions that keep the cube well below one group
+# per accident are in it: crossed with Day, State and Severity, Weather_Condition, Hour,
+# Sunrise_Sunset or City are each nearly row-level (on 284k synthetic accidents the
+# cube had 192k + 268k + 212k groups with Weather_Condition, Hour and Sunrise_Sunset;
+# without them 102k). A weather filter or those breakdowns are counted by the query
+# engine (see scan_cube), and top cities come from the heavy-hitter summaries
+# (approximate) or the query engine (exact).
+CUBE_DIR = '_cube'
+FILTER_DIMS = ['Day', 'State', 'Severity']
+CUBOIDS = {
+    'base': [],
+}
+# Numeric columns with sum / sum of squares / count kept in the base cuboid
+MOMENT_COLUMNS = ['Temperature(F)', 'Humidity(%)', 'Visibility(mi)', 'Wind_Speed(mph)']
+
+def build_cube(df):
+    """
+    Count cube for a cleaned DataFrame (or one cleaned chunk).
+    Returns {cuboid name: DataFrame of dims + 'count' (+ moments for 'base')}.
+    """
+    days = df['Day'] if 'Day' in df.columns else df['Start_Time']
+    frame = pd.DataFrame({'Day': day_numbers(days)}, index=df.index)
+    for col in FILTER_DIMS[1:] + [dim for dims in CUBOIDS.values() for dim in dims]:
+        if col in df.columns:
+            frame[col] = df[col]
+    frame['count'] = 1
+    for col in MOMENT_COLUMNS:
+        if col in df.columns:
+            values = df[col].astype('float64')
+            frame[f'{col}_sum'] = values.fillna(0)
+            frame[f'{col}_sumsq'] = (values ** 2).fillna(0)
+            frame[f'{col}_count'] = values.notna().astype('int64')
+
+    moments = [col for col in frame.columns if col.endswith(('_sum', '_sumsq', '_count'))]
+    cube = {}
+    for name, extra in CUBOIDS.items():
+        dims = FILTER_DIMS + [dim for dim in extra if dim in frame.columns]
+        values = ['count'] + (moments if name == 'base' else [])
+        cube[name] = _group(frame, dims, values)
+    return cube
+
+def scan_cube(engine, filters=None):
+    """
+    The cube of the rows matching `filters` (an Arrow expression, which may filter on
+    any column, e.g. Weather_Condition), built batch by batch by one scan of the query
+    engine.
+    """
+    columns = engine.columns(['Start_Time'] + FILTER_DIMS[1:] + MOMENT_COLUMNS)
+    cube = None
+    for batch in engine.batches(columns, filters):
+        cube = merge_cubes(cube, build_cube(batch))
+    return cube if cube is not None else build_cube(pd.DataFrame(columns=columns))
+
+def cube_indexes(cube):
+    """
+    A FilterIndex of every cuboid, for the date range and the other FILTER_DIMS.
+    """
+    return {name: FilterIndex(frame, columns=FILTER_DIMS[1:], time_column='Day') for name, frame in cube.items()}
+
+def _group(frame, dims, values):
+    grouped = frame.groupby(dims, observed=True, sort=False)[values].sum().reset_index()
+    for dim in dims:
+        if grouped[dim].dtype == object or str(grouped[dim].dtype) in ('str', 'string'):
+            grouped[dim] = grouped[dim].astype('category')
+    return grouped
+
+def merge_cubes(a, b):
+    """
+    Combine two cubes (e.g. of two chunks, or the stored cube and a new delta).
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    merged = {}
+    for name in a:
+        dims = [col for col in a[name].columns if col in FILTER_DIMS or col in CUBOIDS[name]]
+        values = [col for col in a[name].columns if col not in dims]
+        both = pd.concat([_as_object(a[name], dims), _as_object(b[name], dims)], ignore_index=True)
+        merged[name] = _group(both, dims, values)
+    return merged
+
+def _as_object(frame, dims):
+    # categories of two cubes differ; compare on the plain values
+    frame = frame.copy(deep=False)
+    for dim in dims:
+        if isinstance(frame[dim].dtype, pd.CategoricalDtype):
+            frame[dim] = frame[dim].astype(object)
+    return frame
+
+def save_cube(cube, store_dir=CLEANED_STORE):
+    cube_dir = os.path.join(store_dir, CUBE_DIR)
+    os.makedirs(cube_dir, exist_ok=True)
+    for name, frame in cube.items():
+        frame.to_parquet(os.path.join(cube_dir, f'{name}.parquet'), index=False)
+    for name in os.listdir(cube_dir):
+        if name.endswith('.parquet') and name[:-len('.parquet')] not in cube:
+            os.remove(os.path.join(cube_dir, name))  # a cuboid this version no longer keeps
+
+def load_cube(store_dir=CLEANED_STORE):
+    """
+    The stored cube, or None if Milestone 1 has not built one.
+    """
+    cube_dir = os.path.join(store_dir, CUBE_DIR)
+    if not os.path.isdir(cube_dir):
+        return None
+    cube = {}
+    for name in CUBOIDS:
+        path = os.path.join(cube_dir, f'{name}.parquet')
+        if not os.path.exists(path):
+            continue
+        frame = pd.read_parquet(path)
+        dims = [col for col in frame.columns if col in FILTER_DIMS or col in CUBOIDS[name]]
+        values = [col for col in frame.columns if col == 'count' or col.endswith(('_sum', '_sumsq', '_count'))]
+        if len(dims) + len(values) < len(frame.columns):
+            frame = _group(frame, dims, values)  # written by an older version, with more dimensions
+        cube[name] = frame
+    return cube
+
+def rollup(frame, by):
+    """
+    Sum the counts (and moments) of a cuboid, or of a filtered view of one, by some
+    of its dimensions. `by` may also name the derived dimensions Weekday, Month, Year.
+    """
+    frame = frame.to_frame() if hasattr(frame, 'to_frame') else frame
+    frame = add_calendar_dims(frame, [col for col in by if col in ('Weekday', 'Month', 'Year')])
+    values = [col for col in frame.columns if col == 'count' or col.endswith(('_sum', '_sumsq', '_count'))]
+    return frame.groupby(by, observed=True)[values].sum()
+
+def add_calendar_dims(frame, dims):
+    if not dims:
+        return frame
+    frame = frame.copy(deep=False)
+    codes = calendar_from_days(frame['Day'].to_numpy())
+    if 'Weekday' in dims:
+        frame['Weekday'] = weekday_labels(codes['Weekday'])
+    if 'Month' in dims:
+        frame['Month'] = month_labels(codes['Month'])
+    if 'Year' in dims:
+        frame['Year'] = codes['Year']
+    return frame
+
+def total(frame):
+    return int(frame['count'].sum())
+
+def mean(frame, col):
+    """
+    Mean of a moment column (or of a dimension such as Severity, weighted by count).
+    """
+    if f'{col}_sum' in frame.columns:
+        n = frame[f'{col}_count'].sum()
+        return frame[f'{col}_sum'].sum() / n if n else np.nan
+    n = frame['count'].sum()
+    if col not in frame.columns:
+        return np.nan
+    return (frame[col].astype('float64') * frame['count']).sum() / n if n else np.nan
+
+def top(frame, dim, n=10):
+    """
+    Top-n values of a dimension by accident count, largest first
+    (ties broken by value, like Series.mode()).
+    """
+    counts = frame.groupby(dim, observed=True)['count'].sum()
+    counts = counts.sort_index(kind='stable').sort_values(ascending=False, kind='stable')
+    return counts.head(n)
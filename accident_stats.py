@@ -0,0 +1,236 @@
+import os
+import numpy as np
+import pandas as pd
+from accident_store import CLEANED_STORE
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Mergeable summary statistics of the numeric weather columns, built at ingest time
+# and stored next to the data, so correlation heatmaps and severity box plots never
+# need the raw values. For every (Year, State, Severity) group it keeps:
+# - pairwise-complete sums: counts, sums, sums of squares and cross products
+#   (correlations from these match DataFrame.corr())
+# - min / max and a fixed-bin histogram per column (the quantile sketch)
+# Groups of two chunks, partitions or threads are combined by adding their arrays.
+STATS_FILE = '_stats.npz'
+STATS_KEYS = ['Year', 'State', 'Severity']
+STATS_COLUMNS = ['Severity', 'Temperature(F)', 'Humidity(%)', 'Visibility(mi)', 'Wind_Speed(mph)', 'Precipitation(in)']
+# Histogram range and bin width per column; values outside fall into the end bins
+SKETCH_BINS = {
+    'Temperature(F)': (-60.0, 140.0, 0.5),
+    'Humidity(%)': (0.0, 100.0, 1.0),
+    'Visibility(mi)': (0.0, 20.0, 0.1),
+    'Wind_Speed(mph)': (0.0, 100.0, 0.5),
+}
+
+def moment_sums(x):
+    """
+    Pairwise-complete sums of a 2-D float array with NaNs for missing values:
+    n[i, j] rows where both i and j are present, s[i, j] / ss[i, j] sum / sum of
+    squares of column i over those rows, sxy[i, j] sum of products.
+    """
+    present = (~np.isnan(x)).astype('float64')
+    x = np.nan_to_num(x)
+    return present.T @ present, x.T @ present, (x * x).T @ present, x.T @ x
+
+def correlation_matrix(n, s, ss, sxy, columns):
+    """
+    Pearson correlation (pairwise-complete, same as DataFrame.corr()) from moment_sums.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = n * sxy - s * s.T
+        var = (n * ss - s * s)
+        corr = cov / np.sqrt(var * var.T)
+    np.fill_diagonal(corr, np.where(np.diag(n) > 1, 1.0, np.nan))
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+def _sketch_bins(col):
+    lo, hi, width = SKETCH_BINS[col]
+    return lo, width, int(np.ceil((hi - lo) / width))
+
+class MomentStats:
+    """
+    Statistics of the groups in `keys` (one row per group); every array has the group
+    as its first axis. Queries (correlation, mean, quantile, box_stats) sum over all
+    groups, select() narrows the groups first.
+    """
+
+    def __init__(self, columns, keys, n, s, ss, sxy, minimum, maximum, sketches):
+        self.columns = list(columns)
+        self.keys = keys.reset_index(drop=True)
+        self.n, self.s, self.ss, self.sxy = n, s, ss, sxy
+        self.minimum, self.maximum = minimum, maximum
+        self.sketches = sketches
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _take(self, positions):
+        return MomentStats(self.columns, self.keys.iloc[positions], self.n[positions], self.s[positions],
+                           self.ss[positions], self.sxy[positions], self.minimum[positions],
+                           self.maximum[positions], {col: h[positions] for col, h in self.sketches.items()})
+
+    def select(self, **selected):
+        """
+        The groups matching {key column: selected values}; an empty selection means
+        no filter on that key.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for col, values in selected.items():
+            if values:
+                mask &= self.keys[col].isin(list(values)).to_numpy()
+        return self._take(np.flatnonzero(mask))
+
+    def by(self, col):
+        """
+        {value: stats of the groups with that value} for one key column.
+        """
+        return {value: self._take(np.flatnonzero(self.keys[col].to_numpy() == value))
+                for value in sorted(self.keys[col].unique())}
+
+    def correlation(self, columns=None):
+        columns = [col for col in (columns or self.columns) if col in self.columns]
+        idx = [self.columns.index(col) for col in columns]
+        sums = [a.sum(axis=0)[np.ix_(idx, idx)] for a in (self.n, self.s, self.ss, self.sxy)]
+        return correlation_matrix(*sums, columns)
+
+    def mean(self, col):
+        i = self.columns.index(col)
+        n = self.n[:, i, i].sum()
+        return self.s[:, i, i].sum() / n if n else np.nan
+
+    def quantile(self, col, q):
+        """
+        Approximate quantile (to within one histogram bin) of a sketched column.
+        """
+        i = self.columns.index(col)
+        hist = self.sketches[col].sum(axis=0)
+        total = hist.sum()
+        if total == 0:
+            return np.nan
+        lo, width, _ = _sketch_bins(col)
+        cum = np.cumsum(hist)
+        target = q * total
+        b = min(int(np.searchsorted(cum, target, side='left')), len(hist) - 1)
+        before = cum[b - 1] if b else 0
+        value = lo + (b + (target - before) / hist[b]) * width
+        return float(np.clip(value, self.minimum[:, i].min(), self.maximum[:, i].max()))
+
+    def box_stats(self, col, by='Severity'):
+        """
+        Box plot statistics per value of a key column, for Axes.bxp(): quartiles from
+        the sketch, whiskers at the furthest data within 1.5 IQR (to within one bin).
+        """
+        lo, width, _ = _sketch_bins(col)
+        i = self.columns.index(col)
+        stats = []
+        for value, group in self.by(by).items():
+            hist = group.sketches[col].sum(axis=0)
+            if hist.sum() == 0:
+                continue
+            q1, med, q3 = (group.quantile(col, q) for q in (0.25, 0.5, 0.75))
+            low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+            nonempty = np.flatnonzero(hist)
+            lower, upper = lo + nonempty * width, lo + (nonempty + 1) * width
+            first = nonempty[upper > low][0] if (upper > low).any() else nonempty[0]
+            last = nonempty[lower < high][-1] if (lower < high).any() else nonempty[-1]
+            stats.append({
+                'label': str(value), 'med': med, 'q1': q1, 'q3': q3, 'fliers': [],
+                'whislo': float(max(lo + first * width, low, group.minimum[:, i].min())),
+                'whishi': float(min(lo + (last + 1) * width, high, group.maximum[:, i].max())),
+            })
+        return stats
+
+def build_stats(df, columns=STATS_COLUMNS, keys=STATS_KEYS):
+    """
+    Statistics of a cleaned DataFrame (or one cleaned chunk).
+    """
+    columns = [col for col in columns if col in df.columns]
+    keys = [key for key in keys if key in df.columns]
+    x = df[columns].to_numpy(dtype='float64', na_value=np.nan)
+    sketched = [col for col in SKETCH_BINS if col in columns]
+    bins = {}
+    for col in sketched:
+        lo, width, size = _sketch_bins(col)
+        values = x[:, columns.index(col)]
+        bins[col] = np.clip(np.floor((values - lo) / width), 0, size - 1)
+
+    groups = df.groupby(keys, observed=True, sort=True).indices
+    k, g = len(columns), len(groups)
+    n, s, ss, sxy = (np.zeros((g, k, k)) for _ in range(4))
+    minimum = np.full((g, k), np.inf)
+    maximum = np.full((g, k), -np.inf)
+    sketches = {col: np.zeros((g, _sketch_bins(col)[2]), dtype='int64') for col in sketched}
+    for i, positions in enumerate(groups.values()):
+        part = x[positions]
+        n[i], s[i], ss[i], sxy[i] = moment_sums(part)
+        minimum[i] = np.fmin.reduce(part, axis=0, initial=np.inf)
+        maximum[i] = np.fmax.reduce(part, axis=0, initial=-np.inf)
+        for col in sketched:
+            b = bins[col][positions]
+            sketches[col][i] = np.bincount(b[~np.isnan(b)].astype('int64'), minlength=sketches[col].shape[1])
+
+    labels = [key if isinstance(key, tuple) else (key,) for key in groups]
+    key_frame = pd.DataFrame(labels, columns=keys)
+    return MomentStats(columns, key_frame, n, s, ss, sxy, minimum, maximum, sketches)
+
+def merge_stats(a, b):
+    """
+    Combine two MomentStats (e.g. of two chunks, or the stored stats and a new delta).
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    keys = pd.concat([a.keys.astype(object), b.keys.astype(object)], ignore_index=True)
+    grouped = keys.groupby(list(keys.columns), sort=True, dropna=False)
+    codes = grouped.ngroup().to_numpy()
+    uniques = grouped.size().index.to_frame(index=False)
+    g = len(uniques)
+
+    def combine(x, y, ufunc=np.add, fill=0):
+        out = np.full((g,) + x.shape[1:], fill, dtype=x.dtype)
+        ufunc.at(out, codes, np.concatenate([x, y]))
+        return out
+
+    return MomentStats(
+        a.columns, uniques,
+        combine(a.n, b.n), combine(a.s, b.s), combine(a.ss, b.ss), combine(a.sxy, b.sxy),
+        combine(a.minimum, b.minimum, np.minimum, np.inf), combine(a.maximum, b.maximum, np.maximum, -np.inf),
+        {col: combine(a.sketches[col], b.sketches[col]) for col in a.sketches},
+    )
+
+def save_stats(stats, store_dir=CLEANED_STORE):
+    arrays = {f'key:{col}': stats.keys[col].to_numpy(dtype=str if col == 'State' else 'int64')
+              for col in stats.keys.columns}
+    arrays.update({f'sketch:{col}': hist for col, hist in stats.sketches.items()})
+    np.savez_compressed(os.path.join(store_dir, STATS_FILE), columns=np.array(stats.columns),
+                        n=stats.n, s=stats.s, ss=stats.ss, sxy=stats.sxy,
+                        minimum=stats.minimum, maximum=stats.maximum, **arrays)
+
+def load_stats(store_dir=CLEANED_STORE):
+    """
+    The stored statistics, or None if Milestone 1 has not built them.
+    """
+    path = os.path.join(store_dir, STATS_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        keys = pd.DataFrame({key: data[f'key:{key}'] for key in STATS_KEYS if f'key:{key}' in data.files})
+        sketches = {name[7:]: data[name] for name in data.files if name.startswith('sketch:')}
+        return MomentStats([str(col) for col in data['columns']], keys, data['n'], data['s'], data['ss'], data['sxy'],
+                           data['minimum'], data['maximum'], sketches)
+
+def whole_years(date_range, min_date, max_date):
+    """
+    The years of a date range if it covers each of them completely (as far as the
+    data goes), so the per-Year statistics apply: [] without a range, else None.
+    """
+    if date_range is None or len(date_range) != 2:
+        return []
+    start, end = date_range
+    if (start == min_date or (start.month, start.day) == (1, 1)) and \
+       (end == max_date or (end.month, end.day) == (12, 31)):
+        return list(range(start.year, end.year + 1))
+    return None
@@ -0,0 +1,234 @@
+import os
+import json
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from dedup import FingerprintSet
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Cleaned data written by Milestone 1 and read by every other script.
+# Parquet files partitioned by Year/State, e.g. cleaned_accident_store/Year=2021/State=CA/
+CLEANED_STORE = 'cleaned_accident_store'
+PARTITION_COLUMNS = ['Year', 'State']
+PARTITION_SCHEMA = pa.schema([('Year', pa.int16()), ('State', pa.dictionary(pa.int32(), pa.string()))])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+# Text columns stored dictionary-encoded (they come back as pandas categories)
+CATEGORY_COLUMNS = ['Source', 'City', 'County', 'State', 'Timezone', 'Weather_Condition',
+                    'Wind_Direction', 'Sunrise_Sunset', 'Civil_Twilight', 'Nautical_Twilight',
+                    'Astronomical_Twilight', 'Weekday', 'Month']
+DATETIME_COLUMNS = ['Start_Time', 'End_Time']
+# Small row groups keep the min/max statistics of the Cell column (rows are written in
+# cell order, see spatial_index) tight enough to skip most of a file on a bbox query
+ROW_GROUP_SIZE = 64 * 1024
+
+def store_exists(store_dir=CLEANED_STORE):
+    return os.path.isdir(store_dir) and any(os.scandir(store_dir))
+
+def _to_table(df, schema=None):
+    """
+    Convert one cleaned chunk to Arrow with dictionary-encoded categories and
+    native timestamps, cast to the store schema so every chunk lines up.
+    """
+    df = df.copy(deep=False)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col in DATETIME_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    if 'Year' in df.columns:
+        df['Year'] = df['Year'].astype('int16')
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is None:
+        fields = []
+        for field in table.schema:
+            if pa.types.is_dictionary(field.type):
+                field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+            elif pa.types.is_large_string(field.type):
+                field = field.with_type(pa.string())
+            fields.append(field)
+        schema = pa.schema(fields)
+    return table.select(schema.names).cast(schema)
+
+def write_store(chunks, store_dir=CLEANED_STORE, append=False, schema=None, part_name=None):
+    """
+    Write cleaned DataFrame chunks as a Parquet dataset partitioned by Year/State.
+    chunks can be a single DataFrame or any iterable of them (e.g. the streaming cleaner).
+    With append=False any existing store is replaced.
+    schema: Arrow schema to cast to (default: the store's, or the first chunk's).
+    part_name: names the files written (part-<part_name>-<i>.parquet); writers
+    that append to one store at the same time must pass the schema and distinct names.
+    """
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    if not append and os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return 0
+    if schema is None and append:
+        schema = _store_schema(store_dir)
+    first_table = _to_table(first, schema)
+    schema = first_table.schema
+    rows = 0
+
+    def batches():
+        nonlocal rows
+        rows += first_table.num_rows
+        yield from first_table.to_batches()
+        for chunk in chunks:
+            table = _to_table(chunk, schema)
+            rows += table.num_rows
+            yield from table.to_batches()
+
+    ds.write_dataset(
+        batches(), store_dir, schema=schema, format='parquet',
+        partitioning=PARTITIONING,
+        basename_template=f'part-{part_name or uuid.uuid4().hex}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+        max_rows_per_group=ROW_GROUP_SIZE,
+    )
+    return rows
+
+def table_schema(df):
+    """
+    The store schema a cleaned DataFrame converts to.
+    """
+    return _to_table(df).schema
+
+def _store_schema(store_dir=CLEANED_STORE):
+    """
+    Schema of the files in the store (including the partition columns), or None.
+    """
+    if not store_exists(store_dir):
+        return None
+    schema = open_store(store_dir).schema
+    return pa.schema([field for field in schema if field.name not in PARTITION_COLUMNS] +
+                     [schema.field(name) for name in PARTITION_COLUMNS])
+
+def open_store(store_dir=CLEANED_STORE):
+    # discover() collects the State dictionary from the directory names
+    partitioning = ds.HivePartitioning.discover(schema=PARTITION_SCHEMA)
+    return ds.dataset(store_dir, format='parquet', partitioning=partitioning)
+
+def read_store(store_dir=CLEANED_STORE, columns=None, filters=None, limit=None):
+    """
+    Read the cleaned store into a DataFrame.
+    columns: only these columns are read (missing ones are skipped).
+    filters: pyarrow expression or list of (column, op, value) tuples, e.g.
+             [('State', 'in', ['CA', 'TX']), ('Year', '>=', 2020)].
+             Filters on Year/State skip whole partitions, others use Parquet row-group stats.
+    limit: read at most this many rows.
+    """
+    dataset = open_store(store_dir)
+    if columns is not None:
+        columns = [col for col in columns if col in dataset.schema.names]
+    if filters is not None and not isinstance(filters, ds.Expression):
+        filters = pq.filters_to_expression(filters)
+
+    if limit is not None:
+        table = dataset.scanner(columns=columns, filter=filters).head(limit)
+    else:
+        table = dataset.to_table(columns=columns, filter=filters)
+    return table.to_pandas()
+
+# ==========================================
+# INGEST STATE (used by incremental runs of Milestone 1)
+# ==========================================
+# Files starting with '_' are ignored when the store is read as a dataset.
+INGEST_STATE_FILE = '_ingest_state.json'
+# The row index is kept as sorted runs of fingerprints (see dedup.FingerprintSet)
+ROW_INDEX_DIR = '_row_index'
+# Row index of older stores: one sorted array
+ROW_INDEX_FILE = '_row_index.npy'
+ID_INDEX_FILE = '_id_index.npy'
+AGGREGATES_FILE = '_aggregates.json'
+
+def new_ingest_state(columns):
+    """
+    State of a fresh ingest: the raw columns kept by the cleaning, the Start_Time
+    watermark of the previous run (a pd.Timestamp) and the latest Start_Time seen by
+    the current one, the fingerprints of every raw row seen so far (a FingerprintSet)
+    and a sorted uint64 hash index of every ID.
+    """
+    return {
+        'columns': list(columns),
+        'watermark': None,
+        'latest': None,
+        'row_index': FingerprintSet(),
+        'id_index': np.empty(0, dtype='uint64'),
+        'new_ids': [],
+    }
+
+def load_ingest_state(store_dir=CLEANED_STORE):
+    path = os.path.join(store_dir, INGEST_STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        meta = json.load(f)
+    state = new_ingest_state(meta['columns'])
+    state['watermark'] = pd.Timestamp(meta['watermark']) if meta['watermark'] else None
+    state['row_index'] = FingerprintSet.load(os.path.join(store_dir, ROW_INDEX_DIR))
+    legacy = os.path.join(store_dir, ROW_INDEX_FILE)
+    if os.path.exists(legacy):
+        state['row_index'] = FingerprintSet(runs=[np.load(legacy, mmap_mode='r')] + state['row_index'].runs)
+    state['id_index'] = np.load(os.path.join(store_dir, ID_INDEX_FILE))
+    return state
+
+def save_ingest_state(state, store_dir=CLEANED_STORE):
+    """
+    Persist the ingest state next to the data. IDs collected during this run are
+    merged into the ID index first.
+    """
+    if state['new_ids']:
+        state['id_index'] = np.union1d(state['id_index'], np.concatenate(state['new_ids']))
+        state['new_ids'] = []
+    os.makedirs(store_dir, exist_ok=True)
+    state['row_index'].save(os.path.join(store_dir, ROW_INDEX_DIR))
+    if os.path.exists(os.path.join(store_dir, ROW_INDEX_FILE)):
+        os.remove(os.path.join(store_dir, ROW_INDEX_FILE))  # now one of the saved runs
+    np.save(os.path.join(store_dir, ID_INDEX_FILE), state['id_index'])
+    with open(os.path.join(store_dir, INGEST_STATE_FILE), 'w') as f:
+        watermark = state['watermark']
+        json.dump({'columns': state['columns'],
+                   'watermark': None if watermark is None else pd.Timestamp(watermark).isoformat()}, f, indent=2)
+
+def load_aggregates(store_dir=CLEANED_STORE):
+    path = os.path.join(store_dir, AGGREGATES_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def merge_counts(total, delta):
+    """
+    Add the (possibly nested) counts in delta into total, in place.
+    """
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            merge_counts(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+def update_aggregates(delta, store_dir=CLEANED_STORE, replace=False):
+    """
+    Add the aggregates of newly ingested rows to the stored ones (or replace them
+    after a full rebuild), so appends never need a pass over the whole store.
+    """
+    aggregates = {} if replace else load_aggregates(store_dir)
+    merge_counts(aggregates, delta)
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, AGGREGATES_FILE), 'w') as f:
+        json.dump(aggregates, f, indent=2, sort_keys=True)
+    return aggregates
@@ -1,8 +1,11 @@
 import streamlit as st
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import plotly.express as px # New library for interactive charts
+from concurrent.futures import ThreadPoolExecutor
+from accident_store import CLEANED_STORE, store_exists
+from data_access import store_fingerprint
+from instrumentation import stage, configure
+from startup_snapshot import load_snapshot, save_snapshot
+# The analysis modules (query engine, cube, rasters, ...) are imported once the first
+# page is on screen, and by the background loaders that need them
 
 # ==========================================
 # 1. PAGE CONFIGURATION
@@ -30,139 +33,327 @@ st.markdown("""
 # ==========================================
 # 2. LOAD DATA FUNCTION
 # ==========================================
-@st.cache_data
-def load_data():
-    file_path = 'cleaned_accident_data.csv'
-    try:
-        # Loading 500k rows
-        df = pd.read_csv(file_path, nrows=500000)
-        
-        df['Start_Time'] = pd.to_datetime(df['Start_Time'], errors='coerce')
-        df['Year'] = df['Start_Time'].dt.year
-        df['Month'] = df['Start_Time'].dt.month_name()
-        df['DayOfWeek'] = df['Start_Time'].dt.day_name()
-        df['Hour'] = df['Start_Time'].dt.hour
-        
-        # Handling missing values for visualization
-        if 'Visibility(mi)' not in df.columns: df['Visibility(mi)'] = 10.0
-        if 'Sunrise_Sunset' not in df.columns: df['Sunrise_Sunset'] = 'Day'
-        if 'Humidity(%)' not in df.columns: df['Humidity(%)'] = 50.0
-        if 'Temperature(F)' not in df.columns: df['Temperature(F)'] = 70.0
-            
-        return df
-    except FileNotFoundError:
-        st.error("File 'cleaned_accident_data.csv' not found.")
+# Columns used by the dashboard; Start_Time and the time features come pre-computed from Milestone 1
+DASHBOARD_COLUMNS = ['Start_Time', 'Year', 'Month', 'Weekday', 'Hour', 'State', 'City', 'Severity',
+                     'Weather_Condition', 'Sunrise_Sunset', 'Start_Lat', 'Start_Lng',
+                     'Temperature(F)', 'Humidity(%)', 'Visibility(mi)', 'Wind_Speed(mph)']
+# The box plot is drawn from a random sample of the filtered rows
+SAMPLE_ROWS = 15000
+# Grid resolution of the density map (see density_raster.ZOOM_LEVELS)
+MAP_ZOOM = 1
+# A map viewport with at most this many accidents shows the points themselves
+VIEWPORT_POINTS = 20000
+# Query one read-only memory-mapped Arrow copy of the dashboard columns, shared by all
+# sessions and processes (see shared_dataset), instead of scanning the Parquet store
+SHARED_DATASET = True
+SHARED_COLUMNS = DASHBOARD_COLUMNS + ['Cell']
+# Trends tab: granularities of the time rollups and the default moving-average window of each
+GRANULARITIES = {'Daily': 'D', 'Weekly': 'W', 'Monthly': 'M'}
+TREND_WINDOWS = {'D': 28, 'W': 8, 'M': 3}
+# Streamlit holds a download in memory (per session) before sending it, so dashboard
+# exports stop at this many rows; the query API's /export streams exports of any size
+EXPORT_MAX_ROWS = 1_000_000
+
+# Every rerun of the dashboard is traced, without a memory sampler thread per section
+configure(sample_memory=False)
+
+def open_engine():
+    from query_engine import QueryEngine
+    # The full dataset stays on disk (or in the shared memory map): filters and
+    # aggregations are pushed down to the query engine, and only aggregates or small
+    # pages of rows come back
+    return QueryEngine(CLEANED_STORE, shared=SHARED_COLUMNS if SHARED_DATASET else False)
+
+def open_cube_indexes():
+    from accident_cube import load_cube, cube_indexes
+    # Pre-aggregated counts over the FULL dataset (built by Milestone 1)
+    cube = load_cube(CLEANED_STORE)
+    if cube is None:
         return None
+    return cube_indexes(cube)
+
+@st.cache_resource
+def start_loading(fingerprint):
+    # The cube indexes and the query engine load in background threads, once per store
+    # version, while the first page renders from the startup snapshot; every session
+    # shares the results
+    pool = ThreadPoolExecutor(max_workers=2)
+    loading = {'cube_indexes': pool.submit(open_cube_indexes), 'engine': pool.submit(open_engine)}
+    pool.shutdown(wait=False)
+    return loading
+
+def wait_for(loading, name, what):
+    # The result of a background load, with a spinner while it is still running. A failed
+    # load is dropped from the resource cache, so the next rerun starts it again instead
+    # of getting the same exception until the server restarts
+    future = loading[name]
+    try:
+        if future.done():
+            return future.result()
+        with st.spinner(f"Loading the {what}..."):
+            return future.result()
+    except Exception as exc:
+        start_loading.clear()
+        st.error(f"Loading the {what} failed ({type(exc).__name__}: {exc}). Rerun the page to try again.")
+        st.stop()
+
+@st.cache_resource
+def load_figure_cache():
+    from figure_cache import FigureCache
+    # Rendered charts, shared by all sessions (bounded LRU, see figure_cache)
+    return FigureCache()
+
+def show_figure(image):
+    st.image(image, width='stretch')
 
-df = load_data()
+@st.cache_resource
+def load_top_n_summaries(fingerprint):
+    from heavy_hitters import load_heavy_hitters
+    # Heavy-hitter summaries of City / State / Weather_Condition per Year/State (built by
+    # Milestone 1), reloaded with every new store version
+    return load_heavy_hitters(CLEANED_STORE)
+
+@st.cache_resource
+def load_time_rollups(fingerprint):
+    from time_rollups import load_rollups
+    # Daily / weekly / monthly counts per State and Severity (built by Milestone 1)
+    return load_rollups(CLEANED_STORE)
+
+@st.cache_resource
+def load_weather_stats(fingerprint):
+    from accident_stats import load_stats
+    # Correlation sums and quantile sketches per Year/State/Severity (built by Milestone 1),
+    # reloaded with every new store version like the cube
+    return load_stats(CLEANED_STORE)
+
+@st.cache_data(max_entries=64)
+def top_cities(filter_state, n, _engine, _row_filter):
+    # Exact top cities per filter state (City has no cuboid): one query serves the
+    # Top City KPI and the chart of every rerun with the same filters
+    return _engine.top_values('City', _row_filter, n).to_frame('count')
+
+@st.cache_data(max_entries=64)
+def weather_cube(filter_state, _engine, _row_filter):
+    # The cube has no Weather_Condition dimension: with a weather filter, the cube of
+    # the matching rows is built by the query engine, once per filter state
+    from accident_cube import scan_cube
+    return scan_cube(_engine, _row_filter)
+
+@st.cache_data(max_entries=64)
+def column_counts(filter_state, column, _engine, _row_filter):
+    # Exact counts per value of a column the cube does not keep (Hour, Sunrise_Sunset)
+    counts = _engine.group_counts([column], _row_filter)
+    return counts.set_index(column)['count'].sort_index()
+
+def show_kpis(kpis):
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Total Accidents", f"{kpis['total']:,}")
+    c2.metric("Top City", kpis['top_city'] or "N/A")
+    c3.metric("Avg Severity", f"{kpis['severity']:.2f}")
+    c4.metric("Avg Visibility", f"{kpis['visibility']:.1f} mi")
+
+# Every section of a run is a stage in the instrumentation trace (see instrumentation)
+with stage('app.load'):
+    fingerprint = store_fingerprint(CLEANED_STORE) if store_exists(CLEANED_STORE) else None
+    loading = start_loading(fingerprint) if fingerprint is not None else None
+    # Date bounds, filter options and default KPIs (written by Milestone 1); a store
+    # from an older Milestone 1 gets its snapshot written on the first run
+    snapshot = load_snapshot(fingerprint, CLEANED_STORE) if loading is not None else None
+    if loading is not None and snapshot is None and save_snapshot(CLEANED_STORE) is not None:
+        snapshot = load_snapshot(fingerprint, CLEANED_STORE)
+    if loading is None:
+        st.error(f"Cleaned data store '{CLEANED_STORE}' not found. Please run Milestone 1 first.")
+    elif snapshot is None:
+        st.error(f"No pre-aggregated cube in '{CLEANED_STORE}'. Please re-run Milestone 1.")
 
 # ==========================================
 # 3. SIDEBAR FILTERS
 # ==========================================
-if df is not None:
+if snapshot is not None:
     st.sidebar.header("🔍 Advanced Filters")
+    options = snapshot['options']
     
     # Date Range
-    min_date = df['Start_Time'].min().date()
-    max_date = df['Start_Time'].max().date()
+    min_date, max_date = snapshot['min_date'], snapshot['max_date']
     date_range = st.sidebar.date_input("📅 Date Range", value=(min_date, max_date), min_value=min_date, max_value=max_date)
 
     # State Filter
-    all_states = sorted(df['State'].astype(str).unique())
-    selected_states = st.sidebar.multiselect("🗺️ Select State(s)", all_states, default=all_states[:3])
+    all_states = options['State']
+    selected_states = st.sidebar.multiselect("🗺️ Select State(s)", all_states, default=snapshot['default_view']['State'])
 
     # Weather Filter
-    all_weather = df['Weather_Condition'].dropna().unique()
+    all_weather = options['Weather_Condition']
     selected_weather = st.sidebar.multiselect("🌤️ Weather Condition", all_weather)
 
     # Severity Filter
-    all_severity = sorted(df['Severity'].unique())
-    selected_severity = st.sidebar.multiselect("⚠️ Severity Level", all_severity, default=all_severity)
+    all_severity = options['Severity']
+    selected_severity = st.sidebar.multiselect("⚠️ Severity Level", all_severity, default=snapshot['default_view']['Severity'])
 
-    # --- APPLY FILTERS ---
-    filtered_df = df.copy()
-    if len(date_range) == 2:
-        start_d, end_d = date_range
-        filtered_df = filtered_df[(filtered_df['Start_Time'].dt.date >= start_d) & (filtered_df['Start_Time'].dt.date <= end_d)]
-    
-    if selected_states:
-        filtered_df = filtered_df[filtered_df['State'].isin(selected_states)]
-    if selected_weather:
-        filtered_df = filtered_df[filtered_df['Weather_Condition'].isin(selected_weather)]
-    if selected_severity:
-        filtered_df = filtered_df[filtered_df['Severity'].isin(selected_severity)]
+    # Top-N charts from the heavy-hitter summaries (bounded error, O(k) per Year/State)
+    approximate_top_n = st.sidebar.checkbox("⚡ Approximate Top-N", value=False)
 
     # ==========================================
     # 4. MAIN DASHBOARD
     # ==========================================
     st.title("🚦 RoadSafe Analytics: US Accident Dashboard")
     st.markdown("### 📊 Comprehensive Traffic Safety Analysis")
-    
+
+    # The default view's KPIs come from the snapshot: they show before the cube has loaded
+    default_view = (tuple(date_range) == (min_date, max_date) and not selected_weather and not approximate_top_n and
+                    set(selected_states) == set(snapshot['default_view']['State']) and
+                    set(selected_severity) == set(snapshot['default_view']['Severity']))
+    if default_view:
+        with stage('app.kpis'):
+            show_kpis(snapshot['kpis'])
+
+    # The rest of the page needs the analysis modules and the cube (still loading in
+    # the background on a cold start)
+    with stage('app.imports'):
+        from query_engine import filter_expression
+        from density_raster import filtered_raster, prebuilt_raster, render_density, US_EXTENT
+        from spatial_index import bbox_expression, grid_hotspots
+        from accident_cube import rollup, total, mean, top
+        from calendar_features import WEEKDAYS, MONTHS
+        from accident_stats import whole_years
+        from heavy_hitters import top_k, draw_error_bounds
+        from data_export import EXPORT_FORMATS, export_file
+        from time_rollups import ANOMALY_THRESHOLD
+        figures = load_figure_cache()
+
+    # --- APPLY FILTERS ---
+    with stage('app.filters') as s:
+        cube_indexes = wait_for(loading, 'cube_indexes', "accident cube")
+        if cube_indexes is None:
+            st.error(f"No pre-aggregated cube in '{CLEANED_STORE}'. Please re-run Milestone 1.")
+            st.stop()
+        selected = dict(State=selected_states, Severity=selected_severity)
+        # The filters as an Arrow expression, for the queries that need row-level values
+        row_filter = filter_expression(date_range, Weather_Condition=selected_weather, **selected)
+        # Identifies the filtered data: charts with expensive inputs are cached on it
+        filter_state = (fingerprint, str(row_filter))
+        # Counts, KPIs and the calendar charts come from the cube slices
+        if selected_weather:
+            cube = weather_cube(filter_state, wait_for(loading, 'engine', "query engine"), row_filter)
+        else:
+            cube = {name: index.select(date_range, **selected).to_frame() for name, index in cube_indexes.items()}
+        # Heatmap and box plot statistics, when the filters line up with their Year/State/Severity groups
+        stats = load_weather_stats(fingerprint)
+        years = whole_years(date_range, min_date, max_date)
+        if stats is not None and years is not None and not selected_weather:
+            stats = stats.select(Year=years, State=selected_states, Severity=selected_severity)
+        else:
+            stats = None
+        # The summaries are kept per Year/State: they apply without weather/severity filters
+        summaries = load_top_n_summaries(fingerprint) if approximate_top_n else None
+        if summaries is not None and (years is None or selected_weather or
+                                      set(selected_severity) not in (set(), set(all_severity))):
+            st.sidebar.caption("Approximate Top-N needs whole years and no weather/severity filter; showing exact counts.")
+            summaries = None
+        total_accidents = s.rows_out = total(cube['base'])
+
+    def top_counts(cuboid, dim, n=10):
+        # Accident counts of the top-n values, approximate (with 'error' bounds) if enabled;
+        # dimensions without a cuboid (City) are counted exactly by the query engine
+        if summaries is not None:
+            return top_k(summaries[dim], n, Year=years, State=selected_states)
+        if cuboid is None:
+            return top_cities(filter_state, n, wait_for(loading, 'engine', "query engine"), row_filter)
+        return top(cube[cuboid], dim, n).to_frame('count')
+
     # KPIs
-    c1, c2, c3, c4 = st.columns(4)
-    c1.metric("Total Accidents", f"{len(filtered_df):,}")
-    c2.metric("Top City", filtered_df['City'].mode()[0] if not filtered_df.empty else "N/A")
-    c3.metric("Avg Severity", f"{filtered_df['Severity'].mean():.2f}")
-    c4.metric("Avg Visibility", f"{filtered_df['Visibility(mi)'].mean():.1f} mi")
+    if not default_view:
+        with stage('app.kpis'):
+            show_kpis({'total': total_accidents,
+                       # the Top 10 Cities query, shared with the chart below
+                       'top_city': top_counts(None, 'City', 10).head(1).index[0] if total_accidents else None,
+                       'severity': mean(cube['base'], 'Severity'),
+                       'visibility': mean(cube['base'], 'Visibility(mi)')})
     st.markdown("---")
 
     # TABS
-    tab1, tab2, tab3 = st.tabs(["📊 Univariate Analysis", "📈 Bivariate & Advanced", "🗺️ Map & Data"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📊 Univariate Analysis", "📈 Bivariate & Advanced", "🗺️ Map & Data", "📉 Trends"])
 
     # --- TAB 1: UNIVARIATE ---
-    with tab1:
+    # Every chart goes through the figure cache: it is keyed on its input counts (or on
+    # the filter state when the input is expensive) and only drawn on a miss.
+    with tab1, stage('app.univariate'):
+        # The plotting libraries are only imported now, with the sidebar and KPIs on screen
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         st.subheader("General Trends & Distributions")
         
         # Row 1: Hour & Weekday
         r1c1, r1c2 = st.columns(2)
         with r1c1:
             st.markdown("**1. Hourly Accident Trend**")
-            fig, ax = plt.subplots(figsize=(8, 4))
-            sns.histplot(filtered_df['Hour'], bins=24, kde=True, color='skyblue', ax=ax)
-            st.pyplot(fig)
+            hour_counts = column_counts(filter_state, 'Hour', wait_for(loading, 'engine', "query engine"), row_filter)
+            def draw():
+                fig, ax = plt.subplots(figsize=(8, 4))
+                sns.histplot(x=hour_counts.index, weights=hour_counts.values, bins=24, kde=True, color='skyblue', ax=ax)
+                return fig
+            show_figure(figures.render('hour_trend', draw, hour_counts))
         with r1c2:
             st.markdown("**2. Weekly Accident Trend**")
-            days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-            fig, ax = plt.subplots(figsize=(8, 4))
-            sns.countplot(x='DayOfWeek', data=filtered_df, order=days_order, palette='viridis', ax=ax)
-            plt.xticks(rotation=45)
-            st.pyplot(fig)
+            day_counts = rollup(cube['base'], ['Weekday'])['count'].reindex(WEEKDAYS, fill_value=0)
+            def draw():
+                fig, ax = plt.subplots(figsize=(8, 4))
+                sns.barplot(x=day_counts.index.astype(str), y=day_counts.values, palette='viridis', ax=ax)
+                plt.xticks(rotation=45)
+                return fig
+            show_figure(figures.render('weekday_trend', draw, day_counts))
 
         # Row 2: Top Cities & Top States (NEW)
         r2c1, r2c2 = st.columns(2)
         with r2c1:
             st.markdown("**3. Top 10 Cities**")
-            city_counts = filtered_df['City'].value_counts().head(10)
-            fig, ax = plt.subplots(figsize=(8, 5))
-            sns.barplot(x=city_counts.values, y=city_counts.index, palette='magma', ax=ax)
-            st.pyplot(fig)
+            city_counts = top_counts(None, 'City', 10)
+            def draw():
+                fig, ax = plt.subplots(figsize=(8, 5))
+                sns.barplot(x=city_counts['count'].values, y=city_counts.index.astype(str), palette='magma', ax=ax)
+                if 'error' in city_counts.columns:
+                    draw_error_bounds(ax, city_counts)
+                return fig
+            if 'error' in city_counts.columns:
+                st.caption(f"Approximate: each bar is an upper bound, the whisker reaches the lower bound; "
+                           f"unlisted cities have at most {city_counts.attrs['unlisted']:,} accidents.")
+            show_figure(figures.render('top_cities', draw, city_counts))
         with r2c2:
             st.markdown("**4. Top 10 States (NEW)**")
-            state_counts = filtered_df['State'].value_counts().head(10)
-            fig, ax = plt.subplots(figsize=(8, 5))
-            sns.barplot(x=state_counts.index, y=state_counts.values, palette='coolwarm', ax=ax)
-            st.pyplot(fig)
+            state_counts = top_counts('base', 'State', 10)
+            def draw():
+                fig, ax = plt.subplots(figsize=(8, 5))
+                sns.barplot(x=state_counts.index.astype(str), y=state_counts['count'].values, palette='coolwarm', ax=ax)
+                if 'error' in state_counts.columns:
+                    draw_error_bounds(ax, state_counts, horizontal=False)
+                return fig
+            show_figure(figures.render('top_states', draw, state_counts))
 
         # Row 3: Severity Pie Chart (NEW)
         st.markdown("---")
         r3c1, r3c2 = st.columns([1, 2])
         with r3c1:
             st.markdown("**5. Severity Distribution (Percentage)**")
-            sev_counts = filtered_df['Severity'].value_counts()
-            fig, ax = plt.subplots()
-            ax.pie(sev_counts, labels=sev_counts.index, autopct='%1.1f%%', startangle=90, colors=sns.color_palette('pastel'))
-            st.pyplot(fig)
+            sev_counts = rollup(cube['base'], ['Severity'])['count'].sort_values(ascending=False)
+            def draw():
+                fig, ax = plt.subplots()
+                ax.pie(sev_counts, labels=sev_counts.index, autopct='%1.1f%%', startangle=90, colors=sns.color_palette('pastel'))
+                return fig
+            show_figure(figures.render('severity_pie', draw, sev_counts))
         with r3c2:
              st.markdown("**6. Monthly Trend**")
-             months_order = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
-             existing_months = [m for m in months_order if m in filtered_df['Month'].unique()]
-             fig, ax = plt.subplots(figsize=(10, 4))
-             sns.countplot(x='Month', data=filtered_df, order=existing_months, palette='rocket', ax=ax)
-             plt.xticks(rotation=45)
-             st.pyplot(fig)
+             month_counts = rollup(cube['base'], ['Month'])['count'].reindex(MONTHS, fill_value=0)
+             month_counts = month_counts[month_counts > 0]
+             def draw():
+                 fig, ax = plt.subplots(figsize=(10, 4))
+                 sns.barplot(x=month_counts.index.astype(str), y=month_counts.values, palette='rocket', ax=ax)
+                 plt.xticks(rotation=45)
+                 return fig
+             show_figure(figures.render('month_trend', draw, month_counts))
 
     # --- TAB 2: BIVARIATE & ADVANCED ---
-    with tab2:
+    with tab2, stage('app.bivariate'):
+        # Row-level queries need the query engine (loading in the background until now)
+        engine = wait_for(loading, 'engine', "query engine")
         st.subheader("Deep Dive Analysis")
 
         # Row 1: Correlation Heatmap (NEW - Very Important)
@@ -170,11 +361,14 @@ if df is not None:
         st.write("This chart shows relationships between numerical variables.")
         corr_cols = ['Severity', 'Temperature(F)', 'Humidity(%)', 'Visibility(mi)', 'Wind_Speed(mph)']
         # Check if cols exist
-        valid_cols = [c for c in corr_cols if c in filtered_df.columns]
+        valid_cols = engine.columns(corr_cols)
         if len(valid_cols) > 1:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            sns.heatmap(filtered_df[valid_cols].corr(), annot=True, cmap='coolwarm', fmt=".2f", ax=ax)
-            st.pyplot(fig)
+            def draw():
+                fig, ax = plt.subplots(figsize=(10, 6))
+                corr = stats.correlation(valid_cols) if stats is not None else engine.correlation(valid_cols, row_filter)
+                sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f", ax=ax)
+                return fig
+            show_figure(figures.render('correlation', draw, filter_state, valid_cols, stats is not None))
         else:
             st.warning("Not enough numerical columns for heatmap.")
 
@@ -185,32 +379,132 @@ if df is not None:
         
         with r2c1:
             st.markdown("**🌞 Day vs 🌙 Night Accidents**")
-            if 'Sunrise_Sunset' in filtered_df.columns:
-                day_counts = filtered_df['Sunrise_Sunset'].value_counts()
-                fig, ax = plt.subplots()
-                # Donut Chart
-                ax.pie(day_counts, labels=day_counts.index, autopct='%1.1f%%', colors=['gold', 'black'], wedgeprops=dict(width=0.3))
-                st.pyplot(fig)
+            if engine.columns(['Sunrise_Sunset']):
+                daynight_counts = column_counts(filter_state, 'Sunrise_Sunset', engine, row_filter).sort_values(ascending=False)
+                def draw():
+                    fig, ax = plt.subplots()
+                    # Donut Chart
+                    ax.pie(daynight_counts, labels=daynight_counts.index, autopct='%1.1f%%', colors=['gold', 'black'], wedgeprops=dict(width=0.3))
+                    return fig
+                show_figure(figures.render('day_night', draw, daynight_counts))
         
         with r2c2:
             st.markdown("**🌡️ Temperature Impact on Severity**")
-            fig, ax = plt.subplots(figsize=(8, 5))
-            sns.boxplot(x='Severity', y='Temperature(F)', data=filtered_df, palette='Set2', ax=ax)
-            ax.set_title("Temperature Distribution by Severity")
-            st.pyplot(fig)
+            def draw():
+                fig, ax = plt.subplots(figsize=(8, 5))
+                if stats is not None:
+                    # Quartiles and whiskers of ALL filtered rows, from the stored sketches
+                    box_stats = stats.box_stats('Temperature(F)', by='Severity')
+                    if box_stats:
+                        boxes = ax.bxp(box_stats, showfliers=False, patch_artist=True)
+                        for patch, color in zip(boxes['boxes'], sns.color_palette('Set2')):
+                            patch.set_facecolor(color)
+                    ax.set_xlabel('Severity')
+                    ax.set_ylabel('Temperature(F)')
+                else:
+                    box_data = engine.sample(['Severity', 'Temperature(F)'], row_filter, SAMPLE_ROWS)
+                    sns.boxplot(x='Severity', y='Temperature(F)', data=box_data, palette='Set2', ax=ax)
+                ax.set_title("Temperature Distribution by Severity")
+                return fig
+            show_figure(figures.render('temperature_box', draw, filter_state, stats is not None))
 
     # --- TAB 3: MAP & DATA ---
-    with tab3:
+    with tab3, stage('app.map_data'):
         st.markdown("### 🗺️ Geographic Hotspots")
-        if not filtered_df.empty:
-            map_data = filtered_df[['Start_Lat', 'Start_Lng']].rename(columns={'Start_Lat': 'lat', 'Start_Lng': 'lon'}).dropna()
-            st.map(map_data.sample(min(len(map_data), 15000)))
-        
+        if total_accidents:
+            # Viewport: only the accidents (or grid cells) inside it are queried
+            lng_min, lng_max, lat_min, lat_max = US_EXTENT
+            v1, v2 = st.columns(2)
+            lat_range = v1.slider("Latitude", lat_min, lat_max, (lat_min, lat_max))
+            lng_range = v2.slider("Longitude", lng_min, lng_max, (lng_min, lng_max))
+            bbox = lat_range + lng_range
+            full_view = bbox == (lat_min, lat_max, lng_min, lng_max)
+
+            # Every filtered accident is counted in a density grid: views of the whole date
+            # range filtered by State/Severity only use the grids built by Milestone 1,
+            # other views are binned from the rows (cached on disk per filter)
+            grid = None
+            if tuple(date_range) == (min_date, max_date) and not selected_weather:
+                grid = prebuilt_raster(MAP_ZOOM, CLEANED_STORE, selected_states, selected_severity)
+            if grid is None:
+                grid = filtered_raster(engine, row_filter, MAP_ZOOM, cache_key="|".join(filter_state))
+            view_filter = None
+            in_view = int(grid.sum())
+            if not full_view:
+                view_filter = bbox_expression(*bbox, with_cells='Cell' in engine.dataset.schema.names)
+                view_filter = view_filter if row_filter is None else row_filter & view_filter
+                in_view = engine.count(view_filter)
+
+            if not full_view and in_view <= VIEWPORT_POINTS:
+                # Few enough accidents in view to draw each one
+                st.map(engine.page(['Start_Lat', 'Start_Lng'], view_filter, limit=VIEWPORT_POINTS),
+                       latitude='Start_Lat', longitude='Start_Lng', size=20)
+            else:
+                def draw():
+                    fig, ax = plt.subplots(figsize=(12, 6))
+                    image = render_density(ax, grid)
+                    ax.set_xlim(*lng_range)
+                    ax.set_ylim(*lat_range)
+                    fig.colorbar(image, ax=ax, label='log(1 + accidents per cell)')
+                    return fig
+                show_figure(figures.render('density_map', draw, filter_state, bbox))
+            st.caption(f"{in_view:,} accidents in view")
+
+            st.markdown("#### 🔥 Top Hotspots in View")
+            st.dataframe(grid_hotspots(grid, 10, None if full_view else bbox))
+
         st.markdown("### 📋 Filtered Data")
-        st.dataframe(filtered_df.head(100))
+        st.dataframe(engine.page(DASHBOARD_COLUMNS, row_filter, limit=100))
         
-        csv = filtered_df.to_csv(index=False).encode('utf-8')
-        st.download_button("📥 Download CSV", csv, "filtered_data.csv", "text/csv")
+        # The export is only generated when the button is clicked, written batch by batch
+        export_format = st.selectbox("Export format", list(EXPORT_FORMATS))
+        extension, mime = EXPORT_FORMATS[export_format]
+        def export_data():
+            # Streamlit keeps the download in memory anyway: read it, then delete the file
+            with export_file(engine, DASHBOARD_COLUMNS, row_filter, export_format, EXPORT_MAX_ROWS) as f:
+                return f.read()
+        st.download_button(f"📥 Download {export_format}", export_data, f"filtered_data.{extension}", mime)
+        if total_accidents > EXPORT_MAX_ROWS:
+            st.caption(f"The download holds the first {EXPORT_MAX_ROWS:,} of {total_accidents:,} rows; "
+                       "export all of them with the query API (`python query_api.py`, GET /export).")
+
+    # --- TAB 4: TRENDS ---
+    # Full-history trends straight from the time rollups: no row-level data is read
+    with tab4, stage('app.trends'):
+        import pandas as pd
+        st.subheader("Accident Trends Over Time")
+        rollups = load_time_rollups(fingerprint)
+        if rollups is None:
+            st.warning(f"No time rollups in '{CLEANED_STORE}'. Please re-run Milestone 1.")
+        else:
+            if selected_weather:
+                st.caption("Trends are kept per State and Severity: the weather filter does not apply here.")
+            t1, t2 = st.columns(2)
+            freq = GRANULARITIES[t1.radio("Granularity", list(GRANULARITIES), index=1, horizontal=True)]
+            window = t2.slider("Moving average (periods)", 2, 60, TREND_WINDOWS[freq])
+            trend_range = tuple(date_range) if len(date_range) == 2 else (min_date, max_date)
+            view = dict(State=selected_states, Severity=selected_severity)
+
+            counts = rollups.counts(freq, *trend_range, **view)
+            st.line_chart(pd.DataFrame({'Accidents': counts,
+                                        f'{window}-period average': rollups.moving_average(window, freq, *trend_range, **view)}))
+
+            tc1, tc2 = st.columns(2)
+            with tc1:
+                st.markdown("**Year-over-Year Change (%)**")
+                yoy = rollups.year_over_year(freq, *trend_range, **view)
+                st.line_chart((yoy['change'] * 100).rename('change vs. a year earlier (%)'))
+            with tc2:
+                st.markdown(f"**Unusual Periods** (over {ANOMALY_THRESHOLD:g} standard deviations from the {window} periods before)")
+                anomalies = rollups.anomalies(window, freq, *trend_range, **view)
+                st.dataframe(anomalies.round(2), height=300)
+
+    # Figure cache statistics (all sessions of this server)
+    with st.sidebar.expander("🖼️ Figure Cache"):
+        info = figures.info()
+        st.write(f"{info['hits']} hits / {info['misses']} renders, {info['entries']} images "
+                 f"({info['nbytes'] / 1e6:.1f} MB), {info['render_seconds']:.2f}s spent rendering")
+        st.dataframe(figures.chart_info())
 
 else:
     st.info("Loading Data...")
\ No newline at end of file
@@ -0,0 +1,178 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import contextlib
+import datetime
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from synthetic_data import SEED, write_synthetic_csv
+from instrumentation import PeakMemory
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Benchmarks of the pipeline on synthetic data (see synthetic_data): every stage is
+# timed (wall and CPU) and its peak resident memory is sampled, for each dataset size.
+# Milestone 1 runs the production streaming path (profile, then clean chunk by chunk
+# into the store); the later stages read the store like the milestone scripts do.
+# The results go to a JSON file so runs on two commits can be compared.
+BENCH_SIZES = [100_000, 1_000_000]
+# Opt-in (--large): generating and ingesting these takes a while
+LARGE_SIZES = [10_000_000]
+BENCH_DATA_DIR = 'bench_data'
+BENCH_OUTPUT = 'benchmark_results.json'
+
+def measure(results, rows, stage, fn, *args, rows_in=None):
+    """
+    Run fn(*args) with its output suppressed, append one result record and return
+    what fn returned.
+    """
+    wall, cpu = time.perf_counter(), time.process_time()
+    with PeakMemory() as memory, contextlib.redirect_stdout(io.StringIO()):
+        value = fn(*args)
+    record = {
+        'rows': rows,
+        'stage': stage,
+        'seconds': round(time.perf_counter() - wall, 4),
+        'cpu_seconds': round(time.process_time() - cpu, 4),
+        'peak_rss_mb': round(memory.peak / 2**20, 1),
+        'peak_rss_delta_mb': round((memory.peak - memory.start) / 2**20, 1),
+        'rows_in': rows_in,
+        'rows_out': len(value) if hasattr(value, '__len__') and not isinstance(value, (str, dict)) else None,
+    }
+    results.append(record)
+    print(f"  {stage:<28} {record['seconds']:>9.3f}s  cpu {record['cpu_seconds']:>9.3f}s  "
+          f"peak +{record['peak_rss_delta_mb']:,.1f} MB")
+    return value
+
+def dataset_path(rows, seed=SEED, data_dir=BENCH_DATA_DIR):
+    """
+    The synthetic CSV of the given size, generated on first use.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.abspath(os.path.join(data_dir, f'synthetic_{rows}_{seed}.csv'))
+    if not os.path.exists(path):
+        print(f"Generating {rows:,} synthetic rows -> {path}")
+        write_synthetic_csv(rows, path, seed)
+    return path
+
+def dashboard_filter_kpis(cube_indexes, engine, states, date_range, severity):
+    """
+    The dashboard's filter + KPI path: slice every cuboid, then the four KPIs (the
+    top city from the query engine).
+    """
+    from accident_cube import total, mean
+    from query_engine import filter_expression
+    cube = {name: index.select(date_range, State=states, Severity=severity).to_frame()
+            for name, index in cube_indexes.items()}
+    row_filter = filter_expression(date_range, State=states, Severity=severity)
+    return {
+        'total': total(cube['base']),
+        'top_city': engine.top_values('City', row_filter, 1).index[0] if total(cube['base']) else None,
+        'severity': mean(cube['base'], 'Severity'),
+        'visibility': mean(cube['base'], 'Visibility(mi)'),
+    }
+
+def run_size(rows, seed=SEED, data_dir=BENCH_DATA_DIR):
+    """
+    Benchmark every stage on one dataset size. Returns the result records.
+    """
+    import milestone1_analysis as m1
+    import milestone2_eda as m2
+    import milestone3_map as m3
+    import milestone4_report as m4
+    from accident_store import new_ingest_state, read_store
+    from accident_cube import cube_indexes
+    from query_engine import QueryEngine
+
+    path = dataset_path(rows, seed, data_dir)
+    store_dir = os.path.abspath('store')
+    results = []
+    print(f"\n--- {rows:,} rows ---")
+    chunksize = m1.chunksize_for_memory(path)
+    profile = measure(results, rows, 'm1.profile_data', m1.profile_data, path, chunksize)
+    state = new_ingest_state(m1.surviving_columns(profile))
+    measure(results, rows, 'm1.stream_clean_to_store', m1.stream_clean_to_store, path, state, store_dir,
+            chunksize, rows_in=profile['rows'])
+    cleaned = measure(results, rows, 'read_store', read_store, store_dir)
+    n = len(cleaned)
+
+    for stage, fn in [('m2.analyze_top_cities', m2.analyze_top_cities),
+                      ('m2.analyze_time_trends', m2.analyze_time_trends),
+                      ('m2.analyze_weather_conditions', m2.analyze_weather_conditions),
+                      ('m3.visualize_usa_map', m3.visualize_usa_map),
+                      ('m3.report_hotspots', m3.report_hotspots),
+                      ('m3.visualize_correlation', m3.visualize_correlation),
+                      ('m4.generate_insights', m4.generate_insights)]:
+        measure(results, rows, stage, fn, cleaned, rows_in=n)
+    measure(results, rows, 'm4.plot_severity_pie', m4.plot_severity_pie, cleaned['Severity'].value_counts(), rows_in=n)
+
+    del cleaned
+    # the cube is built during the streaming ingest, as in Milestone 1
+    # rows_in: the cube groups indexed, against n cleaned accidents
+    indexes = measure(results, rows, 'app.filter_index', cube_indexes, state['cube'],
+                      rows_in=sum(len(frame) for frame in state['cube'].values()))
+    first, last = indexes['base'].day_bounds()
+    states = [str(value) for value in indexes['base'].options('State')[:3]]
+    engine = measure(results, rows, 'app.query_engine', QueryEngine, store_dir)
+    measure(results, rows, 'app.filter_kpis', dashboard_filter_kpis, indexes, engine, states,
+            (first + (last - first) / 4, last - (last - first) / 4), [2, 3, 4])
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_benchmarks(sizes=BENCH_SIZES, seed=SEED, output=BENCH_OUTPUT, data_dir=BENCH_DATA_DIR):
+    """
+    Benchmark all sizes in a scratch directory (graphs and reports land there, not
+    in the project) and write the JSON results. Returns them.
+    """
+    output, data_dir = os.path.abspath(output), os.path.abspath(data_dir)
+    work_dir = os.path.join(data_dir, 'work')
+    os.makedirs(os.path.join(work_dir, 'graphs'), exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        results = [record for rows in sizes for record in run_size(rows, seed, data_dir)]
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': sys.modules['pandas'].__version__,
+        'seed': seed,
+        'sizes': list(sizes),
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved: {output}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic US accident data.")
+    parser.add_argument('sizes', nargs='*', type=lambda s: int(float(s)), default=BENCH_SIZES,
+                        help="dataset sizes in rows (default: %(default)s)")
+    parser.add_argument('--large', action='store_true', help=f"also run {LARGE_SIZES}")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', default=BENCH_OUTPUT)
+    parser.add_argument('--data-dir', default=BENCH_DATA_DIR)
+    args = parser.parse_args()
+    run_benchmarks(args.sizes + (LARGE_SIZES if args.large else []), args.seed, args.output, args.data_dir)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Time features of the accidents as small integer codes, derived with numpy datetime
+# arithmetic instead of per-row strings, shared by Milestone 1 and the dashboard:
+#   Hour    uint8  0-23
+#   Weekday uint8  0-6 (Monday = 0), stored as a category of WEEKDAYS
+#   Month   uint8  1-12, stored as a category of MONTHS
+#   Year    int16
+#   Day     int32  days since 1970-01-01
+# Weekday and Month names are only looked up when something is displayed.
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+# Day number of a missing timestamp: never inside a date range
+NO_DAY = np.iinfo('int32').min
+
+def day_numbers(values):
+    """
+    Days since 1970-01-01 as int32, for a datetime column or a sequence of dates.
+    Missing timestamps map to NO_DAY so they never fall inside a range.
+    Integer input is taken to be day numbers already (e.g. the Day column of the cube).
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values.to_numpy().astype('int32')
+    days = pd.to_datetime(values).to_numpy().astype('datetime64[D]')
+    out = days.astype('int64')
+    out[np.isnat(days)] = NO_DAY
+    return out.astype('int32')
+
+def calendar_from_days(days):
+    """
+    Weekday (0 = Monday), Month (1-12) and Year codes of int day numbers.
+    """
+    days = np.asarray(days)
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype('int64')
+    return {
+        # 1970-01-01 was a Thursday
+        'Weekday': ((days + 3) % 7).astype('uint8'),
+        'Month': (months % 12 + 1).astype('uint8'),
+        'Year': (months // 12 + 1970).astype('int16'),
+    }
+
+def calendar_codes(values):
+    """
+    {feature: numpy array} of Hour, Weekday, Month, Year and Day codes for a datetime
+    column. Missing timestamps get Day = NO_DAY and zero codes.
+    """
+    stamps = pd.to_datetime(pd.Series(values)).to_numpy().astype('datetime64[s]')
+    missing = np.isnat(stamps)
+    seconds = np.where(missing, 0, stamps.astype('int64'))
+    days = seconds // 86400
+    codes = calendar_from_days(days)
+    codes['Hour'] = (seconds % 86400 // 3600).astype('uint8')
+    codes['Day'] = np.where(missing, NO_DAY, days).astype('int32')
+    for name in ('Hour', 'Weekday', 'Month', 'Year'):
+        codes[name][missing] = 0
+    return codes
+
+def weekday_labels(codes):
+    """
+    Weekday codes as a categorical of the names (code -1 = missing).
+    """
+    return pd.Categorical.from_codes(np.asarray(codes, dtype='int8'), WEEKDAYS)
+
+def month_labels(codes):
+    """
+    Month codes (1-12) as a categorical of the names (code 0 = missing).
+    """
+    return pd.Categorical.from_codes(np.asarray(codes, dtype='int8') - 1, MONTHS)
+
+def add_calendar_features(df, time_column='Start_Time'):
+    """
+    Add Hour, Weekday, Month, Year and Day columns (compact codes) to a DataFrame
+    whose time column is already parsed.
+    """
+    codes = calendar_codes(df[time_column])
+    missing = codes['Day'] == NO_DAY
+    df['Hour'] = codes['Hour']
+    df['Weekday'] = weekday_labels(np.where(missing, -1, codes['Weekday']))
+    df['Month'] = month_labels(codes['Month'])  # month code 0 -> missing
+    df['Year'] = codes['Year']
+    df['Day'] = codes['Day']
+    return df
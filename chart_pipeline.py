@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+import inspect
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+from accident_store import CLEANED_STORE
+from accident_stats import load_stats
+from density_raster import load_raster, bin_frame
+from heavy_hitters import load_heavy_hitters
+from figure_cache import update_digest
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Batch rendering of the six milestone graphs: the small inputs of every graph (top-N
+# counts, hour counts, density grid, correlation matrix, severity counts) are computed
+# once in the parent process, then the PNGs are drawn in parallel worker processes
+# with the headless Agg backend. A graph whose inputs (and drawing code) are unchanged
+# since the last run, and whose PNG was not touched since, is not drawn again.
+GRAPHS_DIR = 'graphs'
+CHART_CACHE_FILE = os.path.join(GRAPHS_DIR, '.chart_cache.json')
+RENDER_WORKERS = min(6, os.cpu_count() or 1)
+
+# name -> (module, drawing function, seaborn style, output file)
+CHARTS = {
+    'top_cities': ('milestone2_eda', 'plot_top_cities', 'whitegrid', '1_top_cities.png'),
+    'hour_trend': ('milestone2_eda', 'plot_time_trends', 'whitegrid', '2_accident_hour_trend.png'),
+    'weather': ('milestone2_eda', 'plot_weather_conditions', 'whitegrid', '3_weather_impact.png'),
+    'usa_map': ('milestone3_map', 'plot_usa_map', 'darkgrid', '4_usa_accident_map.png'),
+    'correlation': ('milestone3_map', 'plot_correlation', 'darkgrid', '5_correlation_heatmap.png'),
+    'severity_pie': ('milestone4_report', 'plot_severity_pie', 'darkgrid', '6_severity_pie.png'),
+}
+
+def chart_inputs(df, store_dir=CLEANED_STORE, approximate_top_n=False):
+    """
+    {chart name: input} for every chart, from the loaded frame and the aggregates
+    Milestone 1 stored next to the data (density grid, statistics, heavy hitters).
+    """
+    import milestone2_eda
+    import milestone3_map
+    summaries = load_heavy_hitters(store_dir) if approximate_top_n else None
+    stats = load_stats(store_dir)
+    grid = load_raster(milestone3_map.MAP_ZOOM, store_dir)
+    if stats is not None:
+        corr_matrix = stats.correlation(milestone3_map.CORRELATION_COLUMNS)
+    else:
+        corr_matrix = df[[col for col in milestone3_map.CORRELATION_COLUMNS if col in df.columns]].corr()
+    return {
+        'top_cities': milestone2_eda.top_counts(df, 'City', summaries),
+        'hour_trend': df['Hour'].value_counts().sort_index(),
+        'weather': milestone2_eda.top_counts(df, 'Weather_Condition', summaries),
+        'usa_map': grid if grid is not None else bin_frame(df, zoom=milestone3_map.MAP_ZOOM),
+        'correlation': corr_matrix,
+        'severity_pie': df['Severity'].value_counts(),
+    }
+
+def chart_key(name, value):
+    """
+    Hash of a chart's input and of the source of the function that draws it.
+    """
+    module, function, style, filename = CHARTS[name]
+    digest = hashlib.sha1(f'{name}|{style}|{filename}'.encode())
+    digest.update(inspect.getsource(getattr(importlib.import_module(module), function)).encode())
+    update_digest(digest, value)
+    return digest.hexdigest()
+
+def _render(name, value):
+    # runs in a worker process
+    import matplotlib
+    matplotlib.use('Agg')
+    import seaborn as sns
+    module, function, style, filename = CHARTS[name]
+    sns.set_style(style)
+    getattr(importlib.import_module(module), function)(value)
+    return name
+
+def _mtime(name):
+    # a PNG written by anything else (e.g. a milestone script run on its own) is redrawn
+    path = os.path.join(GRAPHS_DIR, CHARTS[name][3])
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+def _load_cache():
+    if not os.path.exists(CHART_CACHE_FILE):
+        return {}
+    with open(CHART_CACHE_FILE) as f:
+        return json.load(f)
+
+def render_charts(inputs, workers=RENDER_WORKERS, force=False):
+    """
+    Draw the charts whose inputs changed (all of them with force=True) in a process
+    pool. Returns {chart name: 'rendered' or 'cached'}.
+    """
+    os.makedirs(GRAPHS_DIR, exist_ok=True)
+    cache = _load_cache()
+    keys = {name: chart_key(name, value) for name, value in inputs.items()}
+    stale = [name for name in inputs
+             if force or cache.get(name) != {'key': keys[name], 'mtime_ns': _mtime(name)}]
+
+    if stale:
+        with ProcessPoolExecutor(max_workers=min(workers, len(stale))) as pool:
+            for name in pool.map(_render, stale, [inputs[name] for name in stale]):
+                cache[name] = {'key': keys[name], 'mtime_ns': _mtime(name)}
+        with open(CHART_CACHE_FILE, 'w') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+    return {name: 'rendered' if name in stale else 'cached' for name in inputs}
@@ -0,0 +1,118 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from accident_store import CLEANED_STORE, INGEST_STATE_FILE, read_store, store_exists
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Memory budget for loaded datasets kept in the process-wide cache
+CACHE_BUDGET_MB = 4096
+
+# The frames handed out share memory with the cached frame: with copy-on-write (always
+# on from pandas 3.0, see requirements.txt) a caller that modifies one gets its own copy
+# instead of writing into the cache.
+
+# key -> {'df': DataFrame, 'columns': frozenset, 'nbytes': int}, least recently used first
+_cache = OrderedDict()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+# The dashboard and the query API call in from several threads
+_lock = threading.Lock()
+
+def store_fingerprint(store_dir=CLEANED_STORE):
+    """
+    Identify the current version of the store without walking its data files (the
+    dashboard and the query API check it on every rerun / reload check), from two
+    stats: the inode of the store directory, which a full ingest replaces, and the
+    ingest state, which every ingest (full or incremental) rewrites after writing
+    the data. The aggregates and caches written next to the data change neither.
+    Re-running Milestone 1 changes the fingerprint.
+    """
+    digest = hashlib.sha1()
+    try:
+        digest.update(str(os.stat(store_dir).st_ino).encode())
+        stat = os.stat(os.path.join(store_dir, INGEST_STATE_FILE))
+        digest.update(f":{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    except FileNotFoundError:
+        pass  # no store, or one written without an ingest state
+    return digest.hexdigest()
+
+def _filter_key(filters):
+    if filters is None:
+        return None
+    if isinstance(filters, (list, tuple)):
+        return tuple(_filter_key(item) for item in filters)
+    if isinstance(filters, (set, frozenset)):
+        return tuple(sorted(filters, key=repr))
+    return repr(filters)
+
+def load_accidents(columns=None, filters=None, store_dir=CLEANED_STORE, limit=None):
+    """
+    Load (a projection of) the cleaned dataset, memoized for the whole process.
+    Results are keyed by the store fingerprint, the filters and the row limit; a
+    request for a subset of the columns of a cached entry is served from that entry.
+    Returns a frame the caller may modify without changing the cache (see the
+    copy-on-write note above), or None if the store is missing.
+    """
+    if not store_exists(store_dir):
+        return None
+
+    base_key = (os.path.abspath(store_dir), store_fingerprint(store_dir), _filter_key(filters), limit)
+    wanted = None if columns is None else list(dict.fromkeys(columns))
+    df = None
+    with _lock:
+        for key, entry in reversed(_cache.items()):
+            if key[:4] != base_key:
+                continue
+            if entry['columns'] is None or (wanted is not None and set(wanted) <= entry['columns']):
+                _cache.move_to_end(key)
+                _stats['hits'] += 1
+                df = entry['df']
+                break
+        else:
+            _stats['misses'] += 1
+    if df is not None:
+        return _view(df, wanted)
+
+    # read outside the lock: other threads keep being served from the cache meanwhile
+    df = read_store(store_dir, columns=wanted, filters=filters, limit=limit)
+    key = base_key + (None if wanted is None else tuple(sorted(wanted)),)
+    with _lock:
+        _cache[key] = {
+            'df': df,
+            'columns': None if wanted is None else frozenset(wanted),
+            'nbytes': int(df.memory_usage(deep=True).sum()),
+        }
+        _evict(keep=key)
+    return _view(df, wanted)
+
+def _view(df, columns):
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
+    return df.copy(deep=False)
+
+def _evict(keep=None):
+    """
+    Drop least recently used entries until the cache fits in CACHE_BUDGET_MB.
+    The entry just loaded is kept even if it alone is over budget. Call with _lock held.
+    """
+    budget = CACHE_BUDGET_MB * 1024 * 1024
+    while sum(entry['nbytes'] for entry in _cache.values()) > budget:
+        key = next((k for k in _cache if k != keep), None)
+        if key is None:
+            break
+        del _cache[key]
+        _stats['evictions'] += 1
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+def cache_info():
+    """
+    Hit/miss/eviction counters plus the number and size of cached entries.
+    """
+    with _lock:
+        return dict(_stats, entries=len(_cache),
+                    nbytes=sum(entry['nbytes'] for entry in _cache.values()))
@@ -0,0 +1,79 @@
+import io
+import gzip
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Exports of a filtered row set, written batch by batch from the query engine so
+# only one batch (BATCH_SIZE rows) is in memory at a time, however many rows match.
+# The file goes to a temporary file; whoever serves it decides how it is sent (the
+# query API streams it, Streamlit's download button reads it into memory).
+# label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+GZIP_LEVEL = 6
+
+def _limited(batches, limit):
+    # the batches up to `limit` rows in total (all of them without a limit)
+    rows = 0
+    for batch in batches:
+        if limit is not None and rows + len(batch) > limit:
+            batch = batch[:limit - rows]
+        if len(batch):
+            yield batch
+        rows += len(batch)
+        if limit is not None and rows >= limit:
+            return
+
+def write_export(engine, columns, filters, fmt, sink, limit=None):
+    """
+    Stream the matching rows (the first `limit` of them, if given) into a binary
+    file object in one of EXPORT_FORMATS. Returns the number of rows written.
+    """
+    rows = 0
+    if fmt == 'Parquet':
+        writer = None
+        for batch in _limited(engine.record_batches(columns, filters), limit):
+            if writer is None:
+                writer = pq.ParquetWriter(sink, batch.schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+        if writer is None:
+            # nothing matched: a valid file with just the schema
+            schema = pa.schema([engine.dataset.schema.field(col) for col in engine.columns(columns)])
+            writer = pq.ParquetWriter(sink, schema)
+        writer.close()
+        return rows
+
+    out = gzip.GzipFile(fileobj=sink, mode='wb', compresslevel=GZIP_LEVEL) if fmt == 'CSV (gzip)' else sink
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+    # the header goes first, so a file without matching rows still has one
+    pd.DataFrame(columns=engine.columns(columns)).to_csv(text, index=False)
+    for batch in _limited(engine.batches(columns, filters), limit):
+        batch.to_csv(text, index=False, header=False)
+        rows += len(batch)
+    text.detach()  # leave sink open for the caller
+    if out is not sink:
+        out.close()
+    return rows
+
+def export_file(engine, columns, filters, fmt, limit=None):
+    """
+    The export as an anonymous temporary file (rewound, deleted once closed). If
+    the export fails, the file is closed (and so deleted) before the error is raised.
+    """
+    tmp = tempfile.TemporaryFile()
+    try:
+        write_export(engine, columns, filters, fmt, tmp, limit)
+        tmp.seek(0)
+    except BaseException:
+        tmp.close()
+        raise
+    return tmp
@@ -0,0 +1,226 @@
+import os
+import glob
+import uuid
+import shutil
+import weakref
+import tempfile
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Above this size the in-memory fingerprint set is written to disk as a sorted run
+DEDUP_MEMORY_LIMIT_MB = 256
+# A saved fingerprint set (e.g. the store's row index) keeps at most this many sorted
+# runs on disk; beyond that the smallest runs are merged
+MAX_SAVED_RUNS = 8
+# Text that read_csv would have parsed as a number
+NUMBER_PATTERN = r'\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*'
+# An integer as a numeric column writes it: no sign, padding or leading zeros
+INTEGER_PATTERN = r'-?(0|[1-9]\d*)'
+
+def _canonical(values):
+    """
+    A column in a form that does not depend on the dtype pandas inferred for the
+    chunk it came from, as a (number, text) pair: numbers as float64, anything else
+    (booleans included) as text.
+    The same Zipcode can be read as int64 in one chunk, float64 in a chunk with a
+    missing value and text in a chunk with a ZIP+4 code. Text only becomes a number
+    when it is written the way a number is (see _text_numbers), so two texts get the
+    same pair only if they are equal: '007' and '7', or '1.0' and '1', stay apart.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # parse the categories once, then look them up by code
+        number, text = _canonical(pd.Series(values.cat.categories.astype(object)))
+        codes = values.cat.codes.to_numpy()
+        number = np.append(number.to_numpy(), np.nan)[codes]
+        text = np.append(text.to_numpy(dtype=object), None)[codes]
+        return pd.Series(number, index=values.index), pd.Series(text, index=values.index, dtype=object)
+    if pd.api.types.is_bool_dtype(values.dtype):
+        # read_csv only makes booleans of the texts True / False
+        return pd.Series(np.nan, index=values.index), values.map({True: 'True', False: 'False'}).astype(object)
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return values.astype('float64'), pd.Series(None, index=values.index, dtype=object)
+    if pd.api.types.is_string_dtype(values.dtype) and values.dtype != object:
+        number = _text_numbers(values)
+    else:
+        # mixed Python objects (e.g. booleans left as objects by a missing value)
+        values = values.astype(object).map(lambda v: str(v) if isinstance(v, (bool, np.bool_)) else v)
+        is_text = values.map(lambda v: isinstance(v, str)).astype(bool)
+        number = pd.to_numeric(values.where(~is_text), errors='coerce').astype('float64')
+        if is_text.any():
+            number[is_text] = _text_numbers(values[is_text].astype(str))
+    return number, values.where(number.isna())
+
+def _text_numbers(text):
+    """
+    The numbers among text values, NaN elsewhere. Only text written as a numeric
+    chunk would write the number parses: an integer without leading zeros, or a
+    fraction as repr() writes it. Each number has one such text, so distinct texts
+    never map to the same number.
+    """
+    number = pd.Series(np.nan, index=text.index)
+    looks = text.str.fullmatch(NUMBER_PATTERN).fillna(False).astype(bool)
+    if looks.any():
+        candidates = text[looks]
+        parsed = pd.to_numeric(candidates, errors='coerce').astype('float64')
+        integer = candidates.str.fullmatch(INTEGER_PATTERN).astype(bool)
+        fraction = (parsed % 1 != 0) & (candidates == parsed.map(repr))
+        number[looks] = parsed.where(integer | fraction)
+    return number
+
+def row_fingerprints(df):
+    """
+    64-bit fingerprint of every row (all columns, index ignored), computed vectorized.
+    Equal rows always get equal fingerprints, whatever the column dtypes
+    (e.g. a category column hashes like the same values stored as strings, and an
+    integer column like the same values read as floats or as text).
+    """
+    parts = {}
+    for i, col in enumerate(df.columns):
+        parts[f'{i}:number'], parts[f'{i}:text'] = _canonical(df[col])
+    return pd.util.hash_pandas_object(pd.DataFrame(parts, index=df.index), index=False).to_numpy()
+
+class FingerprintSet:
+    """
+    Set of row fingerprints used to drop duplicate rows chunk by chunk.
+    Only the fingerprints are kept, as a sorted uint64 array. When that array grows
+    past memory_limit_mb and a spill directory is allowed, it is written to disk as
+    a sorted run and later lookups binary-search the memory-mapped runs.
+    A set is persisted (save) and reopened (load) as its sorted runs, so it is never
+    gathered into one array; `runs` starts a set on top of the runs of another one
+    (shared, not copied).
+    """
+
+    def __init__(self, fingerprints=None, memory_limit_mb=DEDUP_MEMORY_LIMIT_MB, spill=True, runs=()):
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.spill = spill
+        self._memory = np.empty(0, dtype='uint64')
+        self._runs = list(runs)
+        self._spill_dir = None
+        if fingerprints is not None:
+            self._memory = np.unique(np.asarray(fingerprints, dtype='uint64'))
+            self._maybe_spill()
+
+    def __len__(self):
+        return len(self._memory) + sum(len(run) for run in self._runs)
+
+    def contains(self, fingerprints):
+        """
+        Boolean mask: which of the fingerprints are already in the set.
+        """
+        found = _sorted_contains(self._memory, fingerprints)
+        for run in self._runs:
+            found |= _sorted_contains(run, fingerprints)
+        return found
+
+    def add_unique(self, fingerprints):
+        """
+        Add a batch of fingerprints and return the mask of rows to keep: the first
+        occurrence of each fingerprint that was not seen in an earlier batch.
+        Same result as DataFrame.drop_duplicates(keep='first') over all batches.
+        """
+        fingerprints = np.asarray(fingerprints, dtype='uint64')
+        _, first = np.unique(fingerprints, return_index=True)
+        keep = np.zeros(len(fingerprints), dtype=bool)
+        keep[first] = True
+        keep &= ~self.contains(fingerprints)
+
+        self._memory = np.union1d(self._memory, fingerprints[keep])
+        self._maybe_spill()
+        return keep
+
+    def _maybe_spill(self):
+        if not self.spill or self._memory.nbytes <= self.memory_limit:
+            return
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='dedup-')
+            # spilled runs that are never saved are removed with the set
+            weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+        self._runs.append(_write_run(self._spill_dir, self._memory))
+        self._memory = np.empty(0, dtype='uint64')
+
+    @property
+    def runs(self):
+        """
+        The sorted runs of the set (the in-memory part included).
+        """
+        return self._runs + ([self._memory] if len(self._memory) else [])
+
+    def to_array(self):
+        """
+        All fingerprints as one sorted array (for small sets, e.g. of one byte range).
+        """
+        return np.unique(np.concatenate([self._memory] + [np.asarray(run) for run in self._runs]))
+
+    @classmethod
+    def load(cls, directory, **kwargs):
+        """
+        The set saved in directory, as memory-mapped runs (empty if there is none).
+        """
+        paths = sorted(glob.glob(os.path.join(directory, 'run-*.npy')))
+        return cls(runs=[np.load(path, mmap_mode='r') for path in paths], **kwargs)
+
+    def save(self, directory):
+        """
+        Persist the set in directory as sorted runs: the runs already saved there stay
+        as they are, the others (spilled or in memory) are added next to them, and the
+        smallest runs are merged while there are more than MAX_SAVED_RUNS.
+        Runs of the directory that are not part of the set are removed.
+        """
+        os.makedirs(directory, exist_ok=True)
+        directory = os.path.realpath(directory)
+        saved = []
+        for run in self.runs:
+            saved.append(run if _in_directory(run, directory) else _write_run(directory, run))
+        while len(saved) > MAX_SAVED_RUNS:
+            saved.sort(key=len)
+            merged = _write_run(directory, np.union1d(saved[0], saved[1]))
+            saved = [merged] + saved[2:]
+        keep = {os.path.realpath(run.filename) for run in saved}
+        for path in glob.glob(os.path.join(directory, 'run-*.npy')):
+            if os.path.realpath(path) not in keep:
+                os.remove(path)
+        self._runs, self._memory = saved, np.empty(0, dtype='uint64')
+        self.close()
+
+    def close(self):
+        """
+        Remove the spilled runs from disk.
+        """
+        if self._spill_dir is not None:
+            spilled = os.path.realpath(self._spill_dir)
+            self._runs = [run for run in self._runs if not _in_directory(run, spilled)]
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+def _in_directory(run, directory):
+    path = getattr(run, 'filename', None)
+    return path is not None and os.path.dirname(os.path.realpath(path)) == directory
+
+def _write_run(directory, values):
+    # a sorted run as a new .npy file (complete once it has its name), opened memory-mapped
+    name = f'run-{uuid.uuid4().hex}.npy'
+    with open(os.path.join(directory, f'.{name}.tmp'), 'wb') as f:
+        np.save(f, np.asarray(values, dtype='uint64'))
+    os.replace(os.path.join(directory, f'.{name}.tmp'), os.path.join(directory, name))
+    return np.load(os.path.join(directory, name), mmap_mode='r')
+
+def _sorted_contains(sorted_values, values):
+    if len(sorted_values) == 0:
+        return np.zeros(len(values), dtype=bool)
+    pos = np.searchsorted(sorted_values, values)
+    pos[pos == len(sorted_values)] = 0
+    return sorted_values[pos] == values
+
+def drop_duplicate_rows(df, seen=None):
+    """
+    Memory-bounded replacement for df.drop_duplicates(): only a 64-bit fingerprint
+    per row is hashed and kept. Pass a FingerprintSet to de-duplicate across chunks.
+    Returns the de-duplicated frame and the number of rows removed.
+    """
+    if seen is None:
+        seen = FingerprintSet(spill=False)
+    keep = seen.add_unique(row_fingerprints(df))
+    return df[keep], len(df) - int(keep.sum())
@@ -0,0 +1,222 @@
+import os
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from accident_store import CLEANED_STORE
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Accident density grids: every Start_Lat/Start_Lng point is counted into a
+# fixed-resolution lat/lng grid per severity, so maps show all accidents instead of
+# a sample and render in constant time whatever the number of points.
+# Extent of the contiguous US (lng_min, lng_max, lat_min, lat_max)
+US_EXTENT = (-125.0, -66.0, 24.0, 50.0)
+# Zoom level -> grid width in cells (height keeps the extent's aspect ratio)
+ZOOM_LEVELS = {0: 256, 1: 512, 2: 1024}
+SEVERITIES = [1, 2, 3, 4]
+RASTER_DIR = '_raster'
+CACHE_DIR = os.path.join(RASTER_DIR, 'cache')
+# Filtered grids cached on disk are evicted (least recently used first) beyond this size
+CACHE_MAX_MB = 256
+# Zoom level of the per-State grids (the dashboard map's): their non-empty cells are
+# kept as a (State, cell, count) table, so State-only views need no rebinning
+STATE_ZOOM = 1
+
+def grid_shape(zoom):
+    width = ZOOM_LEVELS[zoom]
+    lng_min, lng_max, lat_min, lat_max = US_EXTENT
+    height = int(round(width * (lat_max - lat_min) / (lng_max - lng_min)))
+    return height, width
+
+def empty_grid(zoom):
+    return np.zeros((len(SEVERITIES),) + grid_shape(zoom), dtype='uint32')
+
+def grid_cells(lat, lng, severity, zoom=1):
+    """
+    Flat index into the (severity, lat row, lng column) grid of each point, and the
+    mask of the points that have one (inside US_EXTENT, known coordinates and severity).
+    """
+    height, width = grid_shape(zoom)
+    lng_min, lng_max, lat_min, lat_max = US_EXTENT
+    lat = np.asarray(lat, dtype='float64')
+    lng = np.asarray(lng, dtype='float64')
+    sev = np.asarray(severity).astype('int64') - SEVERITIES[0]
+    row = np.floor((lat - lat_min) / (lat_max - lat_min) * height)
+    col = np.floor((lng - lng_min) / (lng_max - lng_min) * width)
+    inside = (row >= 0) & (row < height) & (col >= 0) & (col < width) & (sev >= 0) & (sev < len(SEVERITIES))
+    cells = (sev[inside] * height + row[inside].astype('int64')) * width + col[inside].astype('int64')
+    return cells, inside
+
+def bin_points(lat, lng, severity, zoom=1):
+    """
+    Count points into a (severity, lat row, lng column) grid in one vectorized pass.
+    Points outside US_EXTENT or with a missing coordinate are left out.
+    """
+    cells, _ = grid_cells(lat, lng, severity, zoom)
+    counts = np.bincount(cells, minlength=empty_grid(zoom).size)
+    return counts.reshape(empty_grid(zoom).shape).astype('uint32')
+
+def bin_frame(df, zoom=1):
+    return bin_points(df['Start_Lat'], df['Start_Lng'], df['Severity'], zoom)
+
+def state_cells(df, zoom=STATE_ZOOM):
+    """
+    Non-empty cells of the grid of every State: a DataFrame of State, cell (flat
+    index into the (severity, lat row, lng column) grid) and count.
+    """
+    cells, inside = grid_cells(df['Start_Lat'], df['Start_Lng'], df['Severity'], zoom)
+    frame = pd.DataFrame({'State': df['State'].to_numpy()[inside], 'cell': cells, 'count': 1})
+    return _sum_cells(frame)
+
+def _sum_cells(frame):
+    frame = frame.astype({'State': object})
+    grouped = frame.groupby(['State', 'cell'], sort=False)['count'].sum().reset_index()
+    return grouped.astype({'State': 'category', 'cell': 'int32', 'count': 'uint32'})
+
+def build_rasters(df):
+    """
+    Grids for every zoom level of one cleaned DataFrame or chunk, plus the per-State
+    cells at STATE_ZOOM ('State', when the rows have a State column).
+    """
+    rasters = {zoom: bin_frame(df, zoom) for zoom in ZOOM_LEVELS}
+    if 'State' in df.columns:
+        rasters['State'] = state_cells(df)
+    return rasters
+
+def merge_rasters(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    merged = {zoom: a[zoom] + b[zoom] for zoom in ZOOM_LEVELS}
+    # the per-State cells are only complete if both sides have them
+    if 'State' in a and 'State' in b:
+        merged['State'] = _sum_cells(pd.concat([a['State'], b['State']], ignore_index=True))
+    return merged
+
+def save_rasters(rasters, store_dir=CLEANED_STORE):
+    raster_dir = os.path.join(store_dir, RASTER_DIR)
+    # filtered grids cached for the old data are stale now
+    shutil.rmtree(os.path.join(store_dir, CACHE_DIR), ignore_errors=True)
+    os.makedirs(raster_dir, exist_ok=True)
+    for zoom in ZOOM_LEVELS:
+        np.save(os.path.join(raster_dir, f'zoom{zoom}.npy'), rasters[zoom])
+    state_path = os.path.join(raster_dir, f'state_zoom{STATE_ZOOM}.parquet')
+    if 'State' in rasters:
+        rasters['State'].to_parquet(state_path, index=False)
+    elif os.path.exists(state_path):
+        os.remove(state_path)  # stale: it no longer matches the grids
+
+def load_raster(zoom=1, store_dir=CLEANED_STORE):
+    """
+    Pre-built grid of the full dataset for a zoom level, or None.
+    """
+    path = os.path.join(store_dir, RASTER_DIR, f'zoom{zoom}.npy')
+    return np.load(path) if os.path.exists(path) else None
+
+def load_state_cells(store_dir=CLEANED_STORE, states=None):
+    path = os.path.join(store_dir, RASTER_DIR, f'state_zoom{STATE_ZOOM}.parquet')
+    if not os.path.exists(path):
+        return None
+    filters = [('State', 'in', list(states))] if states else None
+    return pd.read_parquet(path, filters=filters)
+
+def load_rasters(store_dir=CLEANED_STORE):
+    rasters = {zoom: load_raster(zoom, store_dir) for zoom in ZOOM_LEVELS}
+    if any(grid is None for grid in rasters.values()):
+        return None
+    state = load_state_cells(store_dir)
+    if state is not None:
+        rasters['State'] = state
+    return rasters
+
+def prebuilt_raster(zoom=1, store_dir=CLEANED_STORE, states=None, severities=None):
+    """
+    Grid of a view of the whole date range filtered by State and/or Severity only,
+    from the grids built by Milestone 1; None if the store has no grid for it.
+    """
+    if states:
+        if zoom != STATE_ZOOM:
+            return None
+        cells = load_state_cells(store_dir, states)
+        if cells is None:
+            return None
+        grid = np.bincount(cells['cell'].to_numpy(dtype='int64'), weights=cells['count'].to_numpy(),
+                           minlength=empty_grid(zoom).size)
+        grid = grid.reshape(empty_grid(zoom).shape).astype('uint32')
+    else:
+        grid = load_raster(zoom, store_dir)
+        if grid is None:
+            return None
+    if severities:
+        keep = [SEVERITIES.index(sev) for sev in severities if sev in SEVERITIES]
+        grid[[i for i in range(len(SEVERITIES)) if i not in keep]] = 0
+    return grid
+
+def filtered_raster(engine, filters, zoom=1, cache_key=None):
+    """
+    Grid for a filtered view, binned batch by batch from the query engine. With a
+    cache_key (e.g. store fingerprint + filters) the grid is kept on disk, so the
+    same view is never binned twice; the cache stays under CACHE_MAX_MB. Engines
+    without a store directory (QueryEngine.from_frame) are not cached.
+    """
+    path = None
+    if cache_key is not None and engine.store_dir is not None:
+        digest = hashlib.sha1(f'{cache_key}|{zoom}'.encode()).hexdigest()
+        path = os.path.join(engine.store_dir, CACHE_DIR, f'{digest}.npy')
+        try:
+            grid = np.load(path)
+            os.utime(path)  # most recently used
+            return grid
+        except (FileNotFoundError, ValueError, OSError):
+            pass  # not cached yet (or evicted / half-written by another process)
+
+    grid = empty_grid(zoom)
+    for batch in engine.batches(['Start_Lat', 'Start_Lng', 'Severity'], filters):
+        grid += bin_frame(batch, zoom)
+
+    if path is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f'{path}.{os.getpid()}.tmp'
+        with open(temp, 'wb') as f:
+            np.save(f, grid)
+        os.replace(temp, path)
+        _evict_cache(os.path.dirname(path))
+    return grid
+
+def _evict_cache(cache_dir, max_mb=None):
+    # remove the least recently used grids until the cache fits in max_mb
+    max_bytes = (CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.npy'):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    size = sum(entry[1] for entry in entries)
+    for _, nbytes, path in sorted(entries):
+        if size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        size -= nbytes
+
+def render_density(ax, grid, severities=None, cmap='inferno'):
+    """
+    Draw a grid (summed over the given severities, default all) as a log-scaled
+    density image in lng/lat coordinates.
+    """
+    layers = [SEVERITIES.index(sev) for sev in (severities or SEVERITIES) if sev in SEVERITIES]
+    counts = grid[layers].sum(axis=0)
+    image = ax.imshow(np.log1p(counts), origin='lower', extent=US_EXTENT, cmap=cmap,
+                      aspect='auto', interpolation='nearest')
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    ax.grid(False)
+    return image
@@ -0,0 +1,113 @@
+import io
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Rendered charts, keyed by the chart id and a hash of everything the chart depends on
+# (its input aggregates and/or the filter state). A chart whose key was seen before is
+# served as stored image bytes without building a figure at all; figures that are
+# drawn are closed as soon as they are encoded.
+FIGURE_CACHE_MB = 64
+FIGURE_FORMAT = 'png'
+FIGURE_DPI = 100
+
+def update_digest(digest, value):
+    """
+    Feed a value into a hashlib digest by content: pandas objects (values, index,
+    columns, attrs), numpy arrays, or anything with a stable repr (tuples of these
+    are hashed element by element).
+    """
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        digest.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+        digest.update(repr(sorted(value.attrs.items())).encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(f'{value.dtype}{value.shape}'.encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (tuple, list)):
+        digest.update(f'{type(value).__name__}{len(value)}'.encode())
+        for item in value:
+            update_digest(digest, item)
+    else:
+        digest.update(repr(value).encode())
+
+def figure_key(chart_id, *parts):
+    digest = hashlib.sha1(str(chart_id).encode())
+    for part in parts:
+        update_digest(digest, part)
+    return digest.hexdigest()
+
+class FigureCache:
+    """
+    Thread-safe LRU cache of rendered chart images, bounded by budget_mb. render()
+    returns the image bytes for (chart_id, *parts), calling draw() (which returns a
+    matplotlib Figure) only on a miss.
+    """
+
+    def __init__(self, budget_mb=FIGURE_CACHE_MB, fmt=FIGURE_FORMAT, dpi=FIGURE_DPI):
+        self.budget = budget_mb * 1024 * 1024
+        self.fmt = fmt
+        self.dpi = dpi
+        self._images = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'render_seconds': 0.0}
+        self._charts = {}  # chart id -> {'hits', 'misses', 'render_seconds'}
+
+    def render(self, chart_id, draw, *parts):
+        key = figure_key(chart_id, *parts)
+        with self._lock:
+            chart = self._charts.setdefault(chart_id, {'hits': 0, 'misses': 0, 'render_seconds': 0.0})
+            if key in self._images:
+                self._images.move_to_end(key)
+                self._stats['hits'] += 1
+                chart['hits'] += 1
+                return self._images[key]
+
+        # matplotlib is only imported once a chart actually has to be drawn
+        import matplotlib.pyplot as plt
+        start = time.perf_counter()
+        fig = draw()
+        try:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format=self.fmt, dpi=self.dpi, bbox_inches='tight')
+        finally:
+            plt.close(fig)
+        image = buffer.getvalue()
+        seconds = time.perf_counter() - start
+
+        with self._lock:
+            self._stats['misses'] += 1
+            self._stats['render_seconds'] += seconds
+            chart['misses'] += 1
+            chart['render_seconds'] += seconds
+            if key not in self._images:
+                self._images[key] = image
+                self._nbytes += len(image)
+            while self._nbytes > self.budget and len(self._images) > 1:
+                _, old = self._images.popitem(last=False)
+                self._nbytes -= len(old)
+                self._stats['evictions'] += 1
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._nbytes = 0
+
+    def info(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._images), nbytes=self._nbytes)
+
+    def chart_info(self):
+        """
+        Hits, misses and total render time per chart id.
+        """
+        with self._lock:
+            return pd.DataFrame.from_dict(self._charts, orient='index')
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+from calendar_features import day_numbers, NO_DAY
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Columns the dashboard sidebar filters on (besides the date range)
+FILTER_COLUMNS = ['State', 'Weather_Condition', 'Severity']
+TIME_COLUMN = 'Start_Time'
+
+class FilterIndex:
+    """
+    Indexes built once per dataset so the sidebar filters never scan strings:
+    - per filter column: int codes per row plus the row ids of every value
+    - the day number of each row, sorted, for date-range binary search
+    select() combines the selected filters as boolean bitmaps and returns a lazy
+    FilteredView; no full-frame copy is made.
+    """
+
+    def __init__(self, df, columns=FILTER_COLUMNS, time_column=TIME_COLUMN):
+        self.df = df
+        self.codes = {}
+        self.values = {}
+        self.row_ids = {}
+        for col in columns:
+            codes, uniques = pd.factorize(df[col], sort=True)
+            codes = codes.astype('int32')
+            order = np.argsort(codes, kind='stable').astype('int64')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self.codes[col] = codes
+            self.values[col] = {value: i for i, value in enumerate(uniques)}
+            self.row_ids[col] = [order[bounds[i]:bounds[i + 1]] for i in range(len(uniques))]
+
+        days = day_numbers(df[time_column])
+        self.day_order = np.argsort(days, kind='stable').astype('int64')
+        self.sorted_days = days[self.day_order]
+
+    def __len__(self):
+        return len(self.df)
+
+    def options(self, col):
+        """
+        Distinct values of a filter column (sorted), e.g. for a multiselect.
+        """
+        return list(self.values[col])
+
+    def day_bounds(self):
+        valid = self.sorted_days[self.sorted_days != NO_DAY]
+        if len(valid) == 0:
+            return None
+        return (np.datetime64(int(valid[0]), 'D').astype(object),
+                np.datetime64(int(valid[-1]), 'D').astype(object))
+
+    def value_mask(self, col, selected):
+        """
+        Bitmap of the rows whose `col` is one of the selected values.
+        Few matching rows: scatter their row ids; otherwise look the codes up.
+        """
+        codes = [self.values[col][value] for value in selected if value in self.values[col]]
+        matching = sum(len(self.row_ids[col][code]) for code in codes)
+        if matching < len(self) // 8:
+            mask = np.zeros(len(self), dtype=bool)
+            for code in codes:
+                mask[self.row_ids[col][code]] = True
+            return mask
+        # the extra slot is for code -1 (missing value), which never matches
+        lookup = np.zeros(len(self.values[col]) + 1, dtype=bool)
+        lookup[codes] = True
+        return lookup[self.codes[col]]
+
+    def date_mask(self, start, end):
+        """
+        Bitmap of the rows whose day falls in [start, end] (dates, inclusive).
+        """
+        lo, hi = day_numbers([start, end])
+        first = np.searchsorted(self.sorted_days, lo, side='left')
+        last = np.searchsorted(self.sorted_days, hi, side='right')
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.day_order[first:last]] = True
+        return mask
+
+    def mask(self, date_range=None, **selected):
+        """
+        Combined bitmap for a date range and {column: selected values} filters.
+        An empty or missing selection means no filter on that column.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if date_range is not None and len(date_range) == 2:
+            mask &= self.date_mask(*date_range)
+        for col, values in selected.items():
+            if values:
+                mask &= self.value_mask(col, values)
+        return mask
+
+    def select(self, date_range=None, **selected):
+        return FilteredView(self.df, self.mask(date_range, **selected))
+
+class FilteredView:
+    """
+    Rows of a DataFrame selected by a bitmap. Columns are only gathered when they
+    are asked for, so a chart that needs one column copies one column.
+    """
+
+    def __init__(self, df, mask):
+        self.df = df
+        self.mask = mask
+        self._positions = None
+
+    @property
+    def positions(self):
+        if self._positions is None:
+            self._positions = np.flatnonzero(self.mask)
+        return self._positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def columns(self):
+        return self.df.columns
+
+    def __getitem__(self, key):
+        return self.df[key].iloc[self.positions]
+
+    def head(self, n=5):
+        return self.df.iloc[self.positions[:n]]
+
+    def to_frame(self):
+        return self.df.iloc[self.positions]
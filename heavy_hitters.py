@@ -0,0 +1,140 @@
+import os
+import numpy as np
+import pandas as pd
+from accident_store import CLEANED_STORE
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Approximate top-N (heavy hitters) of the high-cardinality columns, built at ingest
+# time and stored next to the data. For every (Year, State) group and column only the
+# HEAVY_HITTERS_K most frequent values are kept, Space-Saving style:
+#   count - error <= true count <= count   for a kept value
+#   true count <= floor                    for any value that was not kept
+# Summaries of two chunks, partitions or threads are merged (Agarwal et al.,
+# "Mergeable Summaries"), and a top-N query only touches k values per group.
+HEAVY_HITTERS_DIR = '_heavy_hitters'
+HEAVY_HITTERS_KEYS = ['Year', 'State']
+HEAVY_HITTERS_COLUMNS = ['City', 'State', 'Weather_Condition']
+HEAVY_HITTERS_K = 256
+
+def _truncate(table, keys, k):
+    """
+    Keep the k largest counts per group; the floor of a group becomes at least the
+    largest count dropped from it.
+    """
+    table = table.sort_values(keys + ['count', 'item'], ascending=[True] * len(keys) + [False, True],
+                              kind='stable').reset_index(drop=True)
+    rank = table.groupby(keys, sort=False).cumcount().to_numpy()
+    dropped = table[rank >= k]
+    table = table[rank < k]
+    if len(dropped):
+        lost = dropped.groupby(keys)['count'].max().rename('lost')
+        table = table.join(lost, on=keys)
+        table['floor'] = np.fmax(table['floor'], table.pop('lost'))
+    return table.reset_index(drop=True)
+
+def _plain(frame, keys):
+    # categories of two summaries differ; compare on the plain values
+    frame = frame.copy(deep=False)
+    for col in keys + ['item']:
+        frame[col] = frame[col].astype(object)
+    return frame
+
+def build_heavy_hitters(df, k=HEAVY_HITTERS_K):
+    """
+    {column: summary table} for a cleaned DataFrame (or one cleaned chunk).
+    A table has the group keys, item, count, error and the group's floor.
+    """
+    keys = [key for key in HEAVY_HITTERS_KEYS if key in df.columns]
+    summaries = {}
+    for col in HEAVY_HITTERS_COLUMNS:
+        if col not in df.columns:
+            continue
+        table = df.groupby(keys + [df[col].rename('item')], observed=True).size().rename('count').reset_index()
+        table = _plain(table, keys)
+        table['count'] = table['count'].astype('int64')
+        table['error'] = 0
+        table['floor'] = 0
+        summaries[col] = _truncate(table, keys, k)
+    return summaries
+
+def merge_heavy_hitters(a, b, k=HEAVY_HITTERS_K):
+    """
+    Combine two summaries (e.g. of two chunks, or the stored ones and a new delta).
+    A value missing from one side counts as that side's floor, both in its count
+    and in its error.
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    merged = {}
+    for col in a:
+        keys = [key for key in HEAVY_HITTERS_KEYS if key in a[col].columns]
+        left, right = _plain(a[col], keys), _plain(b[col], keys)
+        floors = pd.concat([left.groupby(keys)['floor'].first().rename('floor_a'),
+                            right.groupby(keys)['floor'].first().rename('floor_b')], axis=1).fillna(0)
+        both = left.drop(columns='floor').merge(right.drop(columns='floor'), on=keys + ['item'],
+                                                how='outer', suffixes=('_a', '_b'))
+        both = both.join(floors, on=keys)
+        table = both[keys + ['item']].copy()
+        table['count'] = (both['count_a'].fillna(both['floor_a']) + both['count_b'].fillna(both['floor_b'])).astype('int64')
+        table['error'] = (both['error_a'].fillna(both['floor_a']) + both['error_b'].fillna(both['floor_b'])).astype('int64')
+        table['floor'] = (both['floor_a'] + both['floor_b']).astype('int64')
+        merged[col] = _truncate(table, keys, k)
+    return merged
+
+def save_heavy_hitters(summaries, store_dir=CLEANED_STORE):
+    hh_dir = os.path.join(store_dir, HEAVY_HITTERS_DIR)
+    os.makedirs(hh_dir, exist_ok=True)
+    for col, table in summaries.items():
+        table.to_parquet(os.path.join(hh_dir, f'{col}.parquet'), index=False)
+
+def load_heavy_hitters(store_dir=CLEANED_STORE):
+    """
+    The stored summaries, or None if Milestone 1 has not built them.
+    """
+    hh_dir = os.path.join(store_dir, HEAVY_HITTERS_DIR)
+    if not os.path.isdir(hh_dir):
+        return None
+    return {col: pd.read_parquet(os.path.join(hh_dir, f'{col}.parquet'))
+            for col in HEAVY_HITTERS_COLUMNS if os.path.exists(os.path.join(hh_dir, f'{col}.parquet'))}
+
+def top_k(table, n=10, **selected):
+    """
+    Approximate top-n values over the groups matching {key: selected values}
+    (empty selection = all groups), largest first. Returns a DataFrame indexed by
+    value with 'count' (upper bound), 'error' and 'lower' (= count - error).
+    .attrs['floor'] bounds the true count of any value missing from the summaries;
+    .attrs['unlisted'] bounds any value not returned (also those kept by the
+    summaries but ranked below n): the larger of the floor and the next count.
+    """
+    for key, values in selected.items():
+        if values:
+            table = table[table[key].isin(list(values))]
+    keys = [key for key in HEAVY_HITTERS_KEYS if key in table.columns]
+    total_floor = int(table.groupby(keys)['floor'].first().sum()) if len(table) else 0
+    # a value missing from a group counts as that group's floor
+    excess = pd.DataFrame({'item': table['item'],
+                           'count': table['count'] - table['floor'],
+                           'error': table['error'] - table['floor']})
+    items = excess.groupby('item', sort=True)[['count', 'error']].sum() + total_floor
+    ranked = items.sort_values('count', ascending=False, kind='stable')
+    items = ranked.head(n).copy()
+    items['lower'] = items['count'] - items['error']
+    items.attrs['floor'] = total_floor
+    items.attrs['unlisted'] = max(total_floor, int(ranked['count'].iloc[n])) if len(ranked) > n else total_floor
+    return items
+
+def draw_error_bounds(ax, items, horizontal=True):
+    """
+    Error bars from each bar's count (upper bound) down to its lower bound, on top
+    of a bar chart of items['count'] in the same order.
+    """
+    positions = np.arange(len(items))
+    spread = [items['error'].to_numpy(), np.zeros(len(items))]
+    if horizontal:
+        ax.errorbar(x=items['count'], y=positions, xerr=spread, fmt='none', ecolor='black', capsize=3)
+    else:
+        ax.errorbar(x=positions, y=items['count'], yerr=spread, fmt='none', ecolor='black', capsize=3)
@@ -0,0 +1,297 @@
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import pstats
+import cProfile
+import resource
+import threading
+import functools
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Stage-level instrumentation of the pipeline. Every stage (load, dedup, datetime
+# parse, each graph, each dashboard section, ...) records its wall time, CPU time,
+# peak resident memory above its start and rows in/out as one JSON line in
+# TRACE_FILE. Stages can nest; a record names its parent stage.
+# One stage can additionally be captured in detail by naming it in PROFILE_STAGE
+# (env PIPELINE_PROFILE, e.g. "dedup" or "dedup:tracemalloc"); the cProfile stats
+# or the top allocation sites are written to PROFILE_DIR.
+# The peak memory of top-level stages is sampled by a background thread; nested
+# stages (e.g. the per-chunk stages of a streaming loop) only compare their start and
+# end sizes. PIPELINE_SAMPLE_MEMORY: "top" (default), "all" or "0" (no sampler).
+# Long-running processes (the query API, the dashboard) can change these settings with
+# configure(): turn stages off, stop the memory sampler, or write no trace file
+# (PIPELINE_TRACE=""). The trace and profiles go to logs/ and profiles/ in the
+# repository, wherever the script runs from. A trace file larger than TRACE_MAX_MB is
+# rotated to TRACE_FILE.1 (under a file lock: several processes may share the trace),
+# and only the last MAX_RECORDS records are kept in memory for summary().
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+INSTRUMENT = os.environ.get('PIPELINE_INSTRUMENT', '1') != '0'
+SAMPLE_MEMORY = os.environ.get('PIPELINE_SAMPLE_MEMORY', 'top')
+TRACE_FILE = os.environ.get('PIPELINE_TRACE', os.path.join(REPO_DIR, 'logs', 'pipeline_trace.jsonl'))
+TRACE_MAX_MB = float(os.environ.get('PIPELINE_TRACE_MAX_MB', '64'))
+MAX_RECORDS = 10000
+PROFILE_STAGE, _, PROFILE_MODE = os.environ.get('PIPELINE_PROFILE', '').partition(':')
+PROFILE_MODE = PROFILE_MODE or 'cprofile'
+PROFILE_DIR = os.path.join(REPO_DIR, 'profiles')
+PROFILE_TOP = 25
+# How often the memory sampler reads the resident set size
+SAMPLE_INTERVAL = 0.005
+
+RUN_ID = uuid.uuid4().hex[:12]
+_local = threading.local()
+_records = deque(maxlen=MAX_RECORDS)  # the latest records of this process, for summary()
+_write_lock = threading.Lock()
+
+def configure(enabled=None, sample_memory=None, trace_file=None):
+    """
+    Change INSTRUMENT, SAMPLE_MEMORY ("top", "all" or False) or TRACE_FILE ("" for
+    none) at run time.
+    """
+    global INSTRUMENT, SAMPLE_MEMORY, TRACE_FILE
+    if enabled is not None:
+        INSTRUMENT = enabled
+    if sample_memory is not None:
+        SAMPLE_MEMORY = sample_memory
+    if trace_file is not None:
+        TRACE_FILE = trace_file
+
+def rss_bytes():
+    """
+    Current resident set size of this process (Linux /proc; peak RSS elsewhere).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+class PeakMemory:
+    """
+    Context manager sampling the resident set size in a background thread;
+    .start and .peak are in bytes once it exits. With interval=None there is no
+    thread and the peak is only the larger of the start and end sizes.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.start = self.peak = 0
+        self._done = threading.Event()
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self):
+        self.start = self.peak = rss_bytes()
+        self._thread = None
+        if self.interval is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._done.set()
+            self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+        return False
+
+class Stage:
+    """
+    Handle of a running stage; set rows_out (or anything in .extra) before it ends.
+    """
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.extra = {}
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+@contextmanager
+def _capture(name):
+    """
+    cProfile or tracemalloc capture of one stage, written to PROFILE_DIR.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f'{name}.{os.getpid()}')
+    if PROFILE_MODE == 'tracemalloc':
+        tracemalloc.start(10)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            with open(f'{path}.tracemalloc.txt', 'w') as f:
+                f.write(f'peak traced memory: {peak / 2**20:.1f} MB\n')
+                for entry in snapshot.statistics('lineno')[:PROFILE_TOP]:
+                    f.write(f'{entry}\n')
+            print(f"Saved: {path}.tracemalloc.txt")
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f'{path}.prof')
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            with open(f'{path}.txt', 'w') as f:
+                f.write(text.getvalue())
+            print(f"Saved: {path}.prof")
+
+def _samples_memory(parent):
+    return SAMPLE_MEMORY == 'all' or (SAMPLE_MEMORY == 'top' and parent is None)
+
+@contextmanager
+def _file_lock(path):
+    # exclusive across processes: appends and the rotation of the trace never interleave
+    with open(f'{path}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _write(record):
+    _records.append(record)
+    path = TRACE_FILE
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    line = json.dumps(record, default=str) + '\n'
+    with _write_lock, _file_lock(path):
+        with open(path, 'a') as f:
+            f.write(line)
+            size = f.tell()
+        if size > TRACE_MAX_MB * 2**20:
+            os.replace(path, f'{path}.1')
+
+@contextmanager
+def stage(name, rows_in=None):
+    """
+    Instrument a block as one pipeline stage:
+        with stage('dedup', rows_in=len(df)) as s:
+            df = ...
+            s.rows_out = len(df)
+    """
+    handle = Stage(name, rows_in)
+    if not INSTRUMENT:
+        yield handle
+        return
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    wall, cpu = time.perf_counter(), time.process_time()
+    started = time.time()
+    error = None
+    try:
+        with PeakMemory(SAMPLE_INTERVAL if _samples_memory(parent) else None) as memory:
+            if name == PROFILE_STAGE:
+                with _capture(name):
+                    yield handle
+            else:
+                yield handle
+    except BaseException as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        stack.pop()
+        record = {
+            'run': RUN_ID,
+            'script': os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+            'pid': os.getpid(),
+            'stage': name,
+            'parent': parent,
+            'start': round(started, 3),
+            'wall_s': round(time.perf_counter() - wall, 6),
+            'cpu_s': round(time.process_time() - cpu, 6),
+            'rss_mb': round(memory.start / 2**20, 1),
+            'peak_rss_delta_mb': round((memory.peak - memory.start) / 2**20, 1),
+            'rows_in': handle.rows_in,
+            'rows_out': handle.rows_out,
+        }
+        record.update(handle.extra)
+        if error:
+            record['error'] = error
+        _write(record)
+
+def _rows(value):
+    # rows of a DataFrame / Series / array argument or result, if it has any
+    return len(value) if hasattr(value, '__len__') and hasattr(value, 'shape') else None
+
+def instrumented(name):
+    """
+    Decorator: every call of the function is a stage. Rows in / out are taken from
+    the first argument and the return value when they are frames or arrays.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name, rows_in=_rows(args[0]) if args else None) as s:
+                result = fn(*args, **kwargs)
+                s.rows_out = _rows(result)
+            return result
+        return wrapper
+    return decorate
+
+def read_trace(path=TRACE_FILE):
+    """
+    All records of a trace file as a DataFrame.
+    """
+    import pandas as pd
+    with open(path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+def summary(records=None):
+    """
+    Per-stage totals (calls, wall / CPU seconds, largest peak RSS delta, rows),
+    slowest first, of the given records or of the stages run by this process.
+    """
+    import pandas as pd
+    frame = pd.DataFrame(_records if records is None else records)
+    if frame.empty:
+        return frame
+    grouped = frame.groupby('stage', sort=False).agg(
+        calls=('wall_s', 'size'), wall_s=('wall_s', 'sum'), cpu_s=('cpu_s', 'sum'),
+        peak_rss_delta_mb=('peak_rss_delta_mb', 'max'))
+    for col in ('rows_in', 'rows_out'):
+        # stages that do not report rows stay empty rather than 0
+        grouped[col] = frame.groupby('stage', sort=False)[col].sum(min_count=1).astype('Int64')
+    return grouped.sort_values('wall_s', ascending=False)
+
+def print_summary(records=None):
+    """
+    Print summary(records); without records, the stages of this process so far,
+    which are then cleared so the next summary starts afresh.
+    """
+    table = summary(records)
+    if records is None:
+        _records.clear()
+    if not table.empty:
+        print(f"\nStage timings (trace: {TRACE_FILE or 'not written'}):")
+        print(table.to_string(float_format=lambda x: f'{x:,.3f}'))
+
+if __name__ == "__main__":
+    # python instrumentation.py [TRACE_FILE] -> per-stage totals of the last run in it
+    trace = read_trace(sys.argv[1] if len(sys.argv) > 1 else TRACE_FILE)
+    last = trace[trace['run'] == trace['run'].iloc[-1]]
+    print_summary(last.to_dict('records'))
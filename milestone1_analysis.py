@@ -3,6 +3,20 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import sys
+from accident_store import (CLEANED_STORE, write_store, new_ingest_state, load_ingest_state,
+                            save_ingest_state, update_aggregates, merge_counts)
+from data_access import store_fingerprint
+from accident_cube import build_cube, merge_cubes, save_cube, load_cube
+from density_raster import build_rasters, merge_rasters, save_rasters, load_rasters
+from accident_stats import build_stats, merge_stats, save_stats, load_stats
+from heavy_hitters import build_heavy_hitters, merge_heavy_hitters, save_heavy_hitters, load_heavy_hitters
+from time_rollups import build_rollups, merge_rollups, save_rollups, load_rollups
+from startup_snapshot import save_snapshot, refresh_snapshot
+from dedup import FingerprintSet, drop_duplicate_rows, row_fingerprints
+from spatial_index import add_cell_column
+from calendar_features import add_calendar_features
+from instrumentation import stage, print_summary
 
 # ==========================================
 # CONFIGURATION
@@ -10,20 +24,68 @@ import os
 # REPLACE with your actual file name downloaded from Kaggle
 DATASET_FILE = 'US_Accidents_March23.csv' 
 
-def load_data(filepath):
+# Streaming ingestion: read the raw file in bounded chunks instead of all at once.
+# MEMORY_LIMIT_MB is the ceiling for one chunk's working set during cleaning.
+STREAMING = True
+MEMORY_LIMIT_MB = 1024
+# Full ingests profile and clean the file in parallel worker processes (see
+# parallel_ingest); also enabled by running with --parallel. Needs the ID column.
+PARALLEL_INGEST = False
+
+# Explicit schema for the columns we filter and group on (saves a lot of memory)
+DTYPES = {
+    'State': 'category',
+    'City': 'category',
+    'Weather_Condition': 'category',
+    'Sunrise_Sunset': 'category',
+    'Severity': 'int8',
+}
+# Columns whose inferred dtype would depend on the chunk (every chunk is cast to the
+# store schema of the first one): free text that can look numeric, such as a Zipcode
+# ('02134' or '90039-1234'), and measurements that are whole numbers in one chunk
+# and have missing values in the next
+TEXT_COLUMNS = ['ID', 'Description', 'Street', 'Zipcode', 'Country', 'Airport_Code', 'Weather_Timestamp']
+FLOAT_COLUMNS = ['Start_Lat', 'Start_Lng', 'End_Lat', 'End_Lng', 'Distance(mi)', 'Temperature(F)',
+                 'Wind_Chill(F)', 'Humidity(%)', 'Pressure(in)', 'Visibility(mi)', 'Wind_Speed(mph)',
+                 'Precipitation(in)']
+DTYPES.update({col: 'str' for col in TEXT_COLUMNS})
+DTYPES.update({col: 'float64' for col in FLOAT_COLUMNS})
+DATETIME_COLUMNS = ['Start_Time', 'End_Time']
+KEY_COLUMNS = ['City', 'Sunrise_Sunset', 'Weather_Condition']
+
+# Number of hashes kept per column for the distinct-count estimate in the profile
+PROFILE_SKETCH_SIZE = 1024
+
+def load_data(filepath, chunksize=None, usecols=None):
     """
     Week 1: Dataset Acquisition and Exploration [cite: 29, 31]
+    If chunksize is given, returns an iterator of DataFrame chunks instead of one frame.
     """
     if not os.path.exists(filepath):
         print(f"Error: File '{filepath}' not found. Please download it from Kaggle.")
         return None
     
+    if chunksize:
+        print(f"Streaming dataset in chunks of {chunksize:,} rows...")
+        return pd.read_csv(filepath, dtype=DTYPES, chunksize=chunksize, usecols=usecols)
+
     print("Loading dataset... (This may take a moment due to size)")
     # data types optimization to save memory
-    df = pd.read_csv(filepath)
+    df = pd.read_csv(filepath, dtype=DTYPES, usecols=usecols)
     print("Dataset loaded successfully!")
     return df
 
+def chunksize_for_memory(filepath, memory_limit_mb=MEMORY_LIMIT_MB, sample_rows=10000):
+    """
+    Pick a chunk size (in rows) so that one chunk stays under the memory ceiling.
+    The bytes-per-row figure comes from a small sample of the file.
+    """
+    sample = pd.read_csv(filepath, dtype=DTYPES, nrows=sample_rows)
+    bytes_per_row = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    # Cleaning holds roughly 4 copies of a chunk at its peak (raw, hashes, parsed times, filtered)
+    rows = int(memory_limit_mb * 1024 * 1024 / (bytes_per_row * 4))
+    return max(rows, 10000)
+
 def explore_data(df):
     """
     Week 1: Explore structure, shape, and basic stats 
@@ -48,55 +110,429 @@ def clean_and_preprocess(df, missing_values):
     print("\n--- Data Cleaning & Preprocessing ---")
     
     # 1. Drop columns with excessive missing values (>40%) 
-    threshold = 0.4 * len(df)
-    cols_to_drop = missing_values[missing_values > threshold].index
-    print(f"Dropping columns with >40% missing values: {list(cols_to_drop)}")
-    df = df.drop(columns=cols_to_drop)
+    with stage('drop_columns', rows_in=len(df)) as s:
+        cols_to_drop = columns_to_drop(missing_values, len(df))
+        print(f"Dropping columns with >40% missing values: {cols_to_drop}")
+        df = df.drop(columns=cols_to_drop)
+        s.rows_out = len(df)
     
     # 2. Drop Duplicate Entries 
     print("Removing duplicate rows...")
-    df.drop_duplicates(inplace=True)
+    with stage('dedup', rows_in=len(df)) as s:
+        df, duplicates = drop_duplicate_rows(df)
+        s.rows_out = len(df)
+    print(f"Removed {duplicates} duplicate rows.")
     
     # 3. Handle specific missing values (Example: dropping rows where key info like City is missing)
     # You can also impute (fill) values here if preferred
-    df.dropna(subset=['City', 'Sunrise_Sunset', 'Weather_Condition'], inplace=True)
+    with stage('drop_missing', rows_in=len(df)) as s:
+        df.dropna(subset=KEY_COLUMNS, inplace=True)
+        s.rows_out = len(df)
     
     # 4. Convert Datetime columns 
     print("Converting timestamp columns...")
-    df['Start_Time'] = pd.to_datetime(df['Start_Time'], errors='coerce')
-    df['End_Time'] = pd.to_datetime(df['End_Time'], errors='coerce')
-    
     # 5. Create New Features: Hour, Weekday, Month 
     print("Extracting features (Hour, Weekday, Month)...")
-    df['Hour'] = df['Start_Time'].dt.hour
-    df['Weekday'] = df['Start_Time'].dt.day_name()
-    df['Month'] = df['Start_Time'].dt.month_name()
-    df['Year'] = df['Start_Time'].dt.year
-    
     # 6. Basic Outlier Check (Example: Duration) 
-    # Calculate duration in minutes
-    df['Duration_Minutes'] = (df['End_Time'] - df['Start_Time']).dt.total_seconds() / 60
-    
-    # Filter out negative durations or absurdly long ones (cleaning logic)
     original_count = len(df)
-    df = df[(df['Duration_Minutes'] > 0) & (df['Duration_Minutes'] < 1440)] # Keep < 24 hours
+    df = add_time_features(df)
     print(f"Removed {original_count - len(df)} rows with invalid durations.")
 
+    # 7. Spatial cell of every accident (rows ordered by it for viewport queries)
+    with stage('spatial_cell', rows_in=len(df)) as s:
+        df = add_cell_column(df)
+        s.rows_out = len(df)
+
     return df
 
+def add_time_features(df):
+    """
+    Steps 4-6 of the cleaning: parse timestamps (once), derive the time features
+    and drop rows with invalid durations. Shared by the in-memory and streaming paths.
+    """
+    with stage('datetime_parse', rows_in=len(df)):
+        for col in DATETIME_COLUMNS:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    # Compact integer / categorical codes (see calendar_features)
+    with stage('feature_extraction', rows_in=len(df)):
+        df = add_calendar_features(df)
+    
+    with stage('duration_filter', rows_in=len(df)) as s:
+        # Calculate duration in minutes
+        df['Duration_Minutes'] = (df['End_Time'] - df['Start_Time']).dt.total_seconds() / 60
+        
+        # Filter out negative durations or absurdly long ones (cleaning logic)
+        df = df[(df['Duration_Minutes'] > 0) & (df['Duration_Minutes'] < 1440)] # Keep < 24 hours
+        s.rows_out = len(df)
+    return df
+
+def profile_data(filepath, chunksize, sketch_size=PROFILE_SKETCH_SIZE):
+    """
+    Week 1 exploration as a single streaming pass. Builds a per-column profile
+    (dtype, null count, min/max and an approximate distinct count) without ever
+    holding the raw frame. Returns {'rows': total rows, 'columns': profile DataFrame}.
+    """
+    partial = new_profile()
+    for chunk in load_data(filepath, chunksize):
+        update_profile(partial, chunk, sketch_size)
+    return finish_profile(partial, sketch_size)
+
+def new_profile():
+    """
+    Running totals of a profile; update_profile() adds chunks to it, and the
+    partial profiles of two parts of the file combine with merge_profiles().
+    """
+    return {'rows': 0, 'null_counts': {}, 'dtypes': {}, 'mins': {}, 'maxs': {}, 'sketches': {}, 'head': None}
+
+def update_profile(partial, chunk, sketch_size=PROFILE_SKETCH_SIZE):
+    if partial['head'] is None:
+        partial['head'] = chunk.head()
+    partial['rows'] += len(chunk)
+    null_counts, dtypes, sketches = partial['null_counts'], partial['dtypes'], partial['sketches']
+    for col in chunk.columns:
+        values = chunk[col].dropna()
+        null_counts[col] = null_counts.get(col, 0) + len(chunk) - len(values)
+        dtypes.setdefault(col, str(chunk[col].dtype))
+        if len(values) == 0:
+            continue
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # read_csv only creates categories that occur in the chunk
+            values = values.cat.categories.to_series()
+        try:
+            _update_range(partial, col, values.min(), values.max())
+        except TypeError:
+            pass  # mixed types, no meaningful ordering
+
+        # K-minimum-values sketch: keep the k smallest distinct hashes per column
+        hashes = np.unique(pd.util.hash_pandas_object(values, index=False).to_numpy())
+        if col in sketches:
+            hashes = np.union1d(sketches[col], hashes)
+        sketches[col] = hashes[:sketch_size]
+    return partial
+
+def _update_range(partial, col, lo, hi):
+    mins, maxs = partial['mins'], partial['maxs']
+    mins[col] = lo if col not in mins else min(mins[col], lo)
+    maxs[col] = hi if col not in maxs else max(maxs[col], hi)
+
+def merge_profiles(a, b, sketch_size=PROFILE_SKETCH_SIZE):
+    """
+    Add partial profile b (of a later part of the file) into a, in place.
+    """
+    if a['head'] is None:
+        a['head'] = b['head']
+    a['rows'] += b['rows']
+    for col, n in b['null_counts'].items():
+        a['null_counts'][col] = a['null_counts'].get(col, 0) + n
+    for col, dtype in b['dtypes'].items():
+        a['dtypes'].setdefault(col, dtype)
+    for col in b['mins']:
+        try:
+            _update_range(a, col, b['mins'][col], b['maxs'][col])
+        except TypeError:
+            pass
+    for col, hashes in b['sketches'].items():
+        if col in a['sketches']:
+            hashes = np.union1d(a['sketches'][col], hashes)
+        a['sketches'][col] = hashes[:sketch_size]
+    return a
+
+def finish_profile(partial, sketch_size=PROFILE_SKETCH_SIZE):
+    columns = pd.DataFrame({
+        'dtype': pd.Series(partial['dtypes']),
+        'null_count': pd.Series(partial['null_counts']),
+        'min': pd.Series(partial['mins'], dtype=object),
+        'max': pd.Series(partial['maxs'], dtype=object),
+        'distinct_estimate': pd.Series({col: _estimate_distinct(h, sketch_size) for col, h in partial['sketches'].items()}),
+    })
+    columns['distinct_estimate'] = columns['distinct_estimate'].fillna(0).astype('int64')
+    return {'rows': partial['rows'], 'columns': columns, 'head': partial['head']}
+
+def _estimate_distinct(sketch, sketch_size):
+    # Fewer than k distinct hashes means the sketch saw every value exactly
+    if len(sketch) < sketch_size:
+        return len(sketch)
+    return int((sketch_size - 1) * 2.0**64 / float(sketch[-1]))
+
+def explore_profile(profile):
+    """
+    Week 1: print the structure, shape and basic stats from a streaming profile.
+    Returns the missing value counts, like explore_data.
+    """
+    columns = profile['columns']
+    print("\n--- Data Exploration ---")
+    print(f"Shape of dataset: ({profile['rows']}, {len(columns)})")
+    print("\nColumns, Data Types and Ranges:")
+    print(columns)
+
+    print("\nFirst 5 rows:")
+    print(profile['head'])
+
+    print("\nMissing Values Summary (Top 10 columns):")
+    missing_values = columns['null_count'].sort_values(ascending=False)
+    print(missing_values.head(10))
+    return missing_values
+
+def columns_to_drop(missing_values, total_rows):
+    """
+    Columns with excessive missing values (>40%).
+    """
+    threshold = 0.4 * total_rows
+    return list(missing_values[missing_values > threshold].index)
+
+def surviving_columns(profile):
+    """
+    Raw columns kept by the cleaning: everything except the >40%-missing columns.
+    """
+    cols_to_drop = columns_to_drop(profile['columns']['null_count'], profile['rows'])
+    print(f"Dropping columns with >40% missing values: {cols_to_drop}")
+    return [col for col in profile['columns'].index if col not in cols_to_drop]
+
+def select_new_records(chunk, state):
+    """
+    Incremental ingestion: keep only the rows that earlier runs have not ingested.
+    Rows are matched by ID when the dataset has one, otherwise by the Start_Time
+    watermark (the latest parsed Start_Time) of the previous run: several accidents
+    can share the watermark's timestamp, so rows at the watermark are kept unless
+    their fingerprint is in the row index. Every row seen is recorded in the state;
+    the watermark itself only moves in advance_watermark(), once the run is over,
+    so the rows of a later chunk are never compared with an earlier chunk's times.
+    """
+    times = pd.to_datetime(chunk['Start_Time'], errors='coerce')
+    if 'ID' in chunk.columns:
+        ids = pd.util.hash_pandas_object(chunk['ID'], index=False).to_numpy()
+        known = np.isin(ids, state['id_index'])
+        state['new_ids'].append(ids[~known])
+        new = ~known
+    elif state['watermark'] is not None:
+        new = (times > state['watermark']).to_numpy(copy=True)
+        at_watermark = (times == state['watermark']).to_numpy()
+        if at_watermark.any():
+            new[at_watermark] = ~state['row_index'].contains(row_fingerprints(chunk[at_watermark]))
+    else:
+        new = np.ones(len(chunk), dtype=bool)
+
+    latest = times.max()
+    if pd.notna(latest) and (state['latest'] is None or latest > state['latest']):
+        state['latest'] = latest
+    return chunk[new]
+
+def advance_watermark(state):
+    """
+    End of a run: move the watermark to the latest Start_Time the run has seen.
+    """
+    latest = state['latest']
+    if latest is not None and (state['watermark'] is None or latest > state['watermark']):
+        state['watermark'] = latest
+    state['latest'] = None
+
+def ingest_state_of(df, missing_values):
+    """
+    Ingest state after an in-memory run over the raw frame df (see clean_and_preprocess),
+    so that an incremental run can follow it: the columns kept, the fingerprints of
+    every raw row, the IDs and the Start_Time watermark.
+    """
+    dropped = columns_to_drop(missing_values, len(df))
+    raw = df[[col for col in df.columns if col not in dropped]]
+    state = new_ingest_state(raw.columns)
+    select_new_records(raw, state)
+    advance_watermark(state)
+    state['row_index'] = FingerprintSet(row_fingerprints(raw))
+    return state
+
+def chunk_aggregates(chunk):
+    """
+    Counts for one cleaned chunk; summed into the store's aggregates file.
+    """
+    by_partition = chunk.groupby(['Year', 'State'], observed=True).size()
+    return {
+        'rows': len(chunk),
+        'rows_by_partition': {f"{year}/{state}": int(n) for (year, state), n in by_partition.items()},
+        'rows_by_severity': {str(sev): int(n) for sev, n in chunk['Severity'].value_counts().items()},
+    }
+
+def clean_rows(chunk):
+    """
+    Steps 3-7 of the cleaning for rows that are already de-duplicated: drop rows
+    missing key values, time features, duration filter and spatial cell.
+    Returns the cleaned rows and the index labels of the rows dropped for an
+    invalid duration.
+    """
+    with stage('drop_missing', rows_in=len(chunk)) as s:
+        chunk = chunk.dropna(subset=KEY_COLUMNS)
+        s.rows_out = len(chunk)
+    timed = add_time_features(chunk)
+    invalid = chunk.index.difference(timed.index)
+    with stage('spatial_cell', rows_in=len(timed)) as s:
+        cleaned = add_cell_column(timed)
+        s.rows_out = len(cleaned)
+    return cleaned, invalid
+
+def accumulate_chunk(state, chunk):
+    """
+    Add a cleaned chunk to the aggregates, cube, rasters, statistics, heavy hitters
+    and time rollups kept in the ingest state.
+    """
+    with stage('aggregates', rows_in=len(chunk)):
+        merge_counts(state['aggregates'], chunk_aggregates(chunk))
+        state['cube'] = merge_cubes(state['cube'], build_cube(chunk))
+        state['rasters'] = merge_rasters(state['rasters'], build_rasters(chunk))
+        state['stats'] = merge_stats(state['stats'], build_stats(chunk))
+        state['heavy_hitters'] = merge_heavy_hitters(state['heavy_hitters'], build_heavy_hitters(chunk))
+        state['rollups'] = merge_rollups(state['rollups'], build_rollups(chunk))
+
+def clean_and_preprocess_streaming(filepath, state, chunksize):
+    """
+    Week 2 cleaning, chunk by chunk. Only the columns in state['columns'] are read
+    from disk. Yields cleaned chunks (e.g. into write_store), so only one chunk (plus
+    the 64-bit row fingerprints used for de-duplication, which spill to disk when
+    they outgrow DEDUP_MEMORY_LIMIT_MB) is in memory.
+    state comes from new_ingest_state (full run) or load_ingest_state (incremental
+    run); its indexes and watermark are updated in place, and its 'aggregates',
+    'cube', 'rasters', 'stats', 'heavy_hitters' and 'rollups' hold the counts and
+    statistics of the rows yielded.
+    """
+    print("\n--- Data Cleaning & Preprocessing (streaming) ---")
+    aggregates = state['aggregates'] = {}
+    state['cube'] = state['rasters'] = state['stats'] = state['heavy_hitters'] = state['rollups'] = None
+    rows_written = duplicates = invalid = 0
+    # Duplicates are checked against every row seen before, including earlier runs (their
+    # runs of the row index are shared, not loaded; state['row_index'] stays the
+    # previous runs' index until the end, for select_new_records)
+    seen = FingerprintSet(runs=state['row_index'].runs)
+    for i, chunk in enumerate(load_data(filepath, chunksize, usecols=state['columns'])):
+        with stage('select_new', rows_in=len(chunk)) as s:
+            chunk = select_new_records(chunk, state)
+            s.rows_out = len(chunk)
+        if chunk.empty:
+            continue
+
+        with stage('dedup', rows_in=len(chunk)) as s:
+            chunk, chunk_duplicates = drop_duplicate_rows(chunk, seen)
+            s.rows_out = len(chunk)
+        duplicates += chunk_duplicates
+
+        chunk, chunk_invalid = clean_rows(chunk)
+        invalid += len(chunk_invalid)
+
+        rows_written += len(chunk)
+        accumulate_chunk(state, chunk)
+        print(f"  chunk {i + 1}: {rows_written:,} cleaned rows so far ({chunk_duplicates} duplicates removed)")
+        yield chunk
+
+    state['row_index'] = seen  # spilled runs are moved into the store by save_ingest_state
+    advance_watermark(state)
+    merge_counts(aggregates, {'duplicates_removed': duplicates, 'invalid_durations': invalid})
+    print(f"Removed {duplicates} duplicate rows.")
+    print(f"Removed {invalid} rows with invalid durations.")
+
+def stream_clean_to_store(filepath, state, store_dir=CLEANED_STORE, chunksize=None):
+    """
+    Week 2 cleaning streamed straight into the columnar store (replacing it), reading
+    only the columns in state['columns']. Returns the number of rows written; state
+    holds their aggregates afterwards (see clean_and_preprocess_streaming).
+    """
+    chunksize = chunksize or chunksize_for_memory(filepath)
+    return write_store(clean_and_preprocess_streaming(filepath, state, chunksize), store_dir)
+
+def run_incremental(filepath, store_dir=CLEANED_STORE, memory_limit_mb=MEMORY_LIMIT_MB):
+    """
+    Append only the records that are new since the last run to the cleaned store.
+    The column selection of the original run is reused, duplicates are checked
+    against the stored row index and the stored aggregates are updated in place.
+    """
+    if not os.path.exists(filepath):
+        print(f"Error: File '{filepath}' not found. Please download it from Kaggle.")
+        return None
+    state = load_ingest_state(store_dir)
+    if state is None:
+        print(f"No ingest state in '{store_dir}'. Run a full ingest first.")
+        return None
+    print(f"Incremental ingest (previous watermark: {state['watermark']})")
+
+    chunksize = chunksize_for_memory(filepath, memory_limit_mb)
+    with stage('ingest') as s:
+        rows = s.rows_out = write_store(clean_and_preprocess_streaming(filepath, state, chunksize), store_dir, append=True)
+    with stage('save_aggregates'):
+        previous = store_fingerprint(store_dir)
+        save_ingest_state(state, store_dir)
+        update_aggregates(state['aggregates'], store_dir)
+        if rows:
+            save_cube(merge_cubes(load_cube(store_dir), state['cube']), store_dir)
+            save_rasters(merge_rasters(load_rasters(store_dir), state['rasters']), store_dir)
+            save_stats(merge_stats(load_stats(store_dir), state['stats']), store_dir)
+            save_heavy_hitters(merge_heavy_hitters(load_heavy_hitters(store_dir), state['heavy_hitters']), store_dir)
+            save_rollups(merge_rollups(load_rollups(store_dir), state['rollups']), store_dir)
+            save_snapshot(store_dir)
+        else:
+            # no rows added: the summaries stand, and the startup snapshot only needs
+            # the fingerprint of the rewritten ingest state
+            refresh_snapshot(previous, store_dir)
+    print(f"\nAppended {rows:,} new cleaned rows to '{store_dir}'")
+    return rows
+
 # ==========================================
 # MAIN EXECUTION
 # ==========================================
-if __name__ == "__main__":
+if __name__ == "__main__" and "--incremental" in sys.argv:
+    # Only ingest the records added to DATASET_FILE since the last run
+    if run_incremental(DATASET_FILE) is not None:
+        print_summary()
+        print("Milestone 1 Complete!")
+
+elif __name__ == "__main__" and STREAMING:
+    if os.path.exists(DATASET_FILE):
+        chunksize = chunksize_for_memory(DATASET_FILE)
+        parallel = PARALLEL_INGEST or "--parallel" in sys.argv
+        if parallel:
+            import parallel_ingest
+
+        # Step 1 + 2: Load & Explore (Week 1) in a single profiling pass
+        with stage('load_explore') as s:
+            profile = parallel_ingest.profile_parallel(DATASET_FILE) if parallel else profile_data(DATASET_FILE, chunksize)
+            s.rows_out = profile['rows']
+        explore_profile(profile)
+
+        # Step 3: Clean & Preprocess (Week 2), reading only the surviving columns
+        # and writing each cleaned chunk straight into the columnar store
+        state = new_ingest_state(surviving_columns(profile))
+        with stage('ingest', rows_in=profile['rows']) as s:
+            if parallel:
+                rows = s.rows_out = parallel_ingest.ingest_parallel(DATASET_FILE, state)
+            else:
+                rows = s.rows_out = stream_clean_to_store(DATASET_FILE, state, chunksize=chunksize)
+        with stage('save_aggregates'):
+            save_ingest_state(state)
+            update_aggregates(state['aggregates'], replace=True)
+            if state['cube'] is not None:
+                save_cube(state['cube'])
+                save_rasters(state['rasters'])
+                save_stats(state['stats'])
+                save_heavy_hitters(state['heavy_hitters'])
+                save_rollups(state['rollups'])
+                save_snapshot()
+        print(f"\nSaved {rows:,} cleaned rows to '{CLEANED_STORE}'")
+        print_summary()
+        print("Milestone 1 Complete!")
+    else:
+        print(f"Error: File '{DATASET_FILE}' not found. Please download it from Kaggle.")
+
+elif __name__ == "__main__":
     # Step 1: Load
-    df = load_data(DATASET_FILE)
+    with stage('load') as s:
+        df = load_data(DATASET_FILE)
+        s.rows_out = len(df) if df is not None else None
     
     if df is not None:
         # Step 2: Explore (Week 1)
-        missing_vals = explore_data(df)
+        with stage('explore', rows_in=len(df)):
+            missing_vals = explore_data(df)
         
         # Step 3: Clean & Preprocess (Week 2)
-        df_cleaned = clean_and_preprocess(df, missing_vals)
+        with stage('clean', rows_in=len(df)) as s:
+            df_cleaned = clean_and_preprocess(df, missing_vals)
+            s.rows_out = len(df_cleaned)
         
         # Step 4: Verification
         print("\n--- Post-Cleaning Summary ---")
@@ -104,7 +540,18 @@ if __name__ == "__main__":
         print(df_cleaned[['Start_Time', 'Hour', 'Weekday', 'Month']].head())
         
         # Save cleaned data for Milestone 2
-        print("\nSaving cleaned data to 'cleaned_accident_data.csv'...")
-        df_cleaned.to_csv('cleaned_accident_data.csv', index=False)
+        print(f"\nSaving cleaned data to '{CLEANED_STORE}' (Parquet, partitioned by Year/State)...")
+        with stage('write_store', rows_in=len(df_cleaned)):
+            write_store(df_cleaned)
+        with stage('save_aggregates', rows_in=len(df_cleaned)):
+            save_ingest_state(ingest_state_of(df, missing_vals))
+            update_aggregates(chunk_aggregates(df_cleaned), replace=True)
+            save_cube(build_cube(df_cleaned))
+            save_rasters(build_rasters(df_cleaned))
+            save_stats(build_stats(df_cleaned))
+            save_heavy_hitters(build_heavy_hitters(df_cleaned))
+            save_rollups(build_rollups(df_cleaned))
+            save_snapshot()
+        print_summary()
         print("Milestone 1 Complete!")
       
\ No newline at end of file
@@ -1,39 +1,62 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from accident_store import CLEANED_STORE
+from data_access import load_accidents
+from heavy_hitters import load_heavy_hitters, top_k, draw_error_bounds
+from instrumentation import instrumented, print_summary
 
 # CONFIGURATION
 # We use the CLEANED data from Milestone 1
-CLEANED_DATA_FILE = 'cleaned_accident_data.csv'
+# Only the columns these graphs need are read from the store
+GRAPH_COLUMNS = ['City', 'Hour', 'Weather_Condition']
+# Approximate Top 10 charts: read from the heavy-hitter summaries stored by Milestone 1
+# (no pass over the City / Weather_Condition columns), with error bars for the bounds
+APPROXIMATE_TOP_N = False
 
 # Create a folder to save graphs if it doesn't exist
 if not os.path.exists('graphs'):
     os.makedirs('graphs')
 
-def load_cleaned_data(filepath):
+@instrumented('load')
+def load_cleaned_data(store_dir, columns=GRAPH_COLUMNS, filters=None):
     """
     Load the cleaned dataset efficiently.
+    Only `columns` are read; `filters` (e.g. [('State', '==', 'CA')]) are pushed down to the store.
     """
-    if not os.path.exists(filepath):
-        print(f"Error: '{filepath}' not found. Please run Milestone 1 code first.")
+    print("Loading cleaned dataset...")
+    df = load_accidents(columns, filters, store_dir)
+    if df is None:
+        print(f"Error: '{store_dir}' not found. Please run Milestone 1 code first.")
         return None
-        
-    print("Loading cleaned dataset... (This might take 1-2 minutes)")
-    # Optimize memory by specifying types if needed, but standard load is usually fine for cleaned data
-    df = pd.read_csv(filepath)
     print(f"Data loaded! Shape: {df.shape}")
     return df
 
-def analyze_top_cities(df):
+def top_counts(df, col, summaries=None, n=10):
+    """
+    Top-n values of a column with their accident counts: exact, or from the
+    heavy-hitter summaries (then with 'error' bounds) if given.
+    """
+    if summaries is not None and col in summaries:
+        return top_k(summaries[col], n)
+    return df[col].value_counts().head(n).rename('count').to_frame()
+
+def analyze_top_cities(df, summaries=None):
     """
     Graph 1: Top 10 Cities with highest number of accidents
     """
     print("\nGenerating Graph 1: Top 10 Cities...")
-    city_counts = df['City'].value_counts().head(10)
-    
+    plot_top_cities(top_counts(df, 'City', summaries))
+
+@instrumented('graph.top_cities')
+def plot_top_cities(city_counts):
+    """
+    Draw Graph 1 from the top city counts (see top_counts)
+    """
     plt.figure(figsize=(12, 6))
-    sns.barplot(x=city_counts.values, y=city_counts.index, palette='viridis')
+    sns.barplot(x=city_counts['count'].values, y=city_counts.index.astype(str), palette='viridis')
+    if 'error' in city_counts.columns:
+        draw_error_bounds(plt.gca(), city_counts)
     plt.title('Top 10 US Cities by Number of Accidents', fontsize=16)
     plt.xlabel('Number of Accidents', fontsize=12)
     plt.ylabel('City', fontsize=12)
@@ -41,6 +64,7 @@ def analyze_top_cities(df):
     # Save the plot
     plt.tight_layout()
     plt.savefig('graphs/1_top_cities.png')
+    plt.close()
     print("Saved: graphs/1_top_cities.png")
     # plt.show() # Uncomment if you want to see the window popup
 
@@ -49,9 +73,15 @@ def analyze_time_trends(df):
     Graph 2: Accidents by Hour of the Day (Identifying Rush Hours)
     """
     print("\nGenerating Graph 2: Accidents by Time of Day...")
-    
+    plot_time_trends(df['Hour'].value_counts().sort_index())
+
+@instrumented('graph.hour_trend')
+def plot_time_trends(hour_counts):
+    """
+    Draw Graph 2 from the accident counts per hour
+    """
     plt.figure(figsize=(12, 6))
-    sns.histplot(df['Hour'], bins=24, kde=True, color='orange')
+    sns.histplot(x=hour_counts.index.to_numpy(), weights=hour_counts.to_numpy(), bins=24, kde=True, color='orange')
     plt.title('Distribution of Accidents by Hour of Day', fontsize=16)
     plt.xlabel('Hour of Day (0-23)', fontsize=12)
     plt.ylabel('Number of Accidents', fontsize=12)
@@ -61,17 +91,25 @@ def analyze_time_trends(df):
     # Save the plot
     plt.tight_layout()
     plt.savefig('graphs/2_accident_hour_trend.png')
+    plt.close()
     print("Saved: graphs/2_accident_hour_trend.png")
 
-def analyze_weather_conditions(df):
+def analyze_weather_conditions(df, summaries=None):
     """
     Graph 3: Top 10 Weather Conditions during accidents
     """
     print("\nGenerating Graph 3: Weather Conditions...")
-    weather_counts = df['Weather_Condition'].value_counts().head(10)
-    
+    plot_weather_conditions(top_counts(df, 'Weather_Condition', summaries))
+
+@instrumented('graph.weather')
+def plot_weather_conditions(weather_counts):
+    """
+    Draw Graph 3 from the top weather condition counts (see top_counts)
+    """
     plt.figure(figsize=(12, 6))
-    sns.barplot(x=weather_counts.values, y=weather_counts.index, palette='coolwarm')
+    sns.barplot(x=weather_counts['count'].values, y=weather_counts.index.astype(str), palette='coolwarm')
+    if 'error' in weather_counts.columns:
+        draw_error_bounds(plt.gca(), weather_counts)
     plt.title('Top 10 Weather Conditions During Accidents', fontsize=16)
     plt.xlabel('Number of Accidents', fontsize=12)
     plt.ylabel('Weather Condition', fontsize=12)
@@ -79,20 +117,26 @@ def analyze_weather_conditions(df):
     # Save the plot
     plt.tight_layout()
     plt.savefig('graphs/3_weather_impact.png')
+    plt.close()
     print("Saved: graphs/3_weather_impact.png")
 
 # MAIN EXECUTION
-if __name__ == "__main__":
+def main():
     # 1. Load Data
-    df = load_cleaned_data(CLEANED_DATA_FILE)
+    df = load_cleaned_data(CLEANED_STORE)
     
     if df is not None:
         # Set the visual style
         sns.set_style("whitegrid")
         
         # 2. Run Analysis
-        analyze_top_cities(df)
+        summaries = load_heavy_hitters(CLEANED_STORE) if APPROXIMATE_TOP_N else None
+        analyze_top_cities(df, summaries)
         analyze_time_trends(df)
-        analyze_weather_conditions(df)
+        analyze_weather_conditions(df, summaries)
         
-        print("\nMilestone 2 Complete! Check the 'graphs' folder for images.")
\ No newline at end of file
+        print_summary()
+        print("\nMilestone 2 Complete! Check the 'graphs' folder for images.")
+
+if __name__ == "__main__":
+    main()
@@ -1,72 +1,98 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from accident_store import CLEANED_STORE
+from data_access import load_accidents
+from density_raster import bin_frame, render_density
+from spatial_index import SpatialIndex
+from accident_stats import load_stats
+from instrumentation import instrumented, print_summary
 
 # CONFIGURATION
-CLEANED_DATA_FILE = 'cleaned_accident_data.csv'
+CORRELATION_COLUMNS = ['Severity', 'Temperature(F)', 'Humidity(%)', 'Visibility(mi)', 'Wind_Speed(mph)', 'Precipitation(in)']
+POINT_COLUMNS = ['Start_Lat', 'Start_Lng', 'Cell', 'Severity']
+MAP_COLUMNS = POINT_COLUMNS + CORRELATION_COLUMNS[1:]
+# Grid resolution of the density map (see density_raster.ZOOM_LEVELS)
+MAP_ZOOM = 2
 
 # Create graphs folder if it doesn't exist
 if not os.path.exists('graphs'):
     os.makedirs('graphs')
 
-def load_data(filepath):
+@instrumented('load')
+def load_data(store_dir, columns=MAP_COLUMNS, filters=None):
     """
-    Load the cleaned data=
+    Load the cleaned data (only the map/correlation columns, optionally filtered)
     """
-    if not os.path.exists(filepath):
-        print(f"Error: '{filepath}' not found. Please run Milestone 1 first.")
+    print("Loading dataset for Map Analysis...")
+    df = load_accidents(columns, filters, store_dir)
+    if df is None:
+        print(f"Error: '{store_dir}' not found. Please run Milestone 1 first.")
         return None
-    
-    print("Loading dataset for Map Analysis... (Please wait)")
-    df = pd.read_csv(filepath)
     print(f"Data loaded successfully! Rows: {len(df)}")
     return df
 
 def visualize_usa_map(df):
     """
-    Graph 4: Scatter Plot of Latitude/Longitude (Creates a Map of USA)
-    NOTE: We take a sample of data to make plotting faster.
+    Graph 4: Density Map of Latitude/Longitude (Creates a Map of USA)
+    NOTE: Every accident is counted into a lat/lng grid, so no sampling is needed
+    and drawing takes the same time however many points there are.
     """
     print("\nGenerating Graph 4: Accident Map of USA...")
+    plot_usa_map(bin_frame(df, zoom=MAP_ZOOM))
+
+@instrumented('graph.usa_map')
+def plot_usa_map(grid):
+    """
+    Draw Graph 4 from a density grid (see density_raster)
+    """
+    fig, ax = plt.subplots(figsize=(12, 8))
     
-    # Taking a random sample of 100,000 points to prevent computer lagging
-    # If your computer is fast, you can increase this number
-    sample_df = df.sample(n=100000, random_state=42)
-    
-    plt.figure(figsize=(12, 8))
-    
-    # Plotting Longitude on X-axis and Latitude on Y-axis
-    sns.scatterplot(
-        x='Start_Lng', 
-        y='Start_Lat', 
-        data=sample_df, 
-        hue='Severity', 
-        palette='coolwarm', 
-        s=10,        # Size of dots
-        alpha=0.3    # Transparency
-    )
+    # Longitude on X-axis and Latitude on Y-axis, colour = log(accidents per cell)
+    image = render_density(ax, grid)
+    fig.colorbar(image, ax=ax, label='log(1 + accidents per cell)')
     
-    plt.title('Geographic Distribution of Accidents (Sample of 100k)', fontsize=16)
+    plt.title(f'Geographic Distribution of Accidents (all {int(grid.sum()):,})', fontsize=16)
     plt.xlabel('Longitude', fontsize=12)
     plt.ylabel('Latitude', fontsize=12)
-    plt.legend(title='Severity', loc='lower right')
     
     # Save map
     plt.tight_layout()
     plt.savefig('graphs/4_usa_accident_map.png')
+    plt.close(fig)
     print("Saved: graphs/4_usa_accident_map.png")
 
-def visualize_correlation(df):
+@instrumented('hotspots')
+def report_hotspots(df, n=10):
+    """
+    Regional analysis: the n grid cells (about 5 x 3 km) with the most accidents
+    """
+    print(f"\nTop {n} accident hotspots:")
+    hotspots = SpatialIndex(df).hotspots(n)
+    print(hotspots[['lat', 'lng', 'accidents']].to_string(index=False, float_format='%.3f'))
+    return hotspots
+
+def visualize_correlation(df, stats=None):
     """
     Graph 5: Correlation Heatmap (Relationship between variables)
+    NOTE: With the statistics stored by Milestone 1 the matrix comes straight from
+    their sums; the raw columns are only needed for older stores.
     """
     print("\nGenerating Graph 5: Correlation Heatmap...")
     
-    # Select only numerical columns for correlation
-    cols = ['Severity', 'Temperature(F)', 'Humidity(%)', 'Visibility(mi)', 'Wind_Speed(mph)', 'Precipitation(in)']
-    corr_matrix = df[cols].corr()
-    
+    if stats is not None:
+        corr_matrix = stats.correlation(CORRELATION_COLUMNS)
+    else:
+        # Select only numerical columns for correlation
+        cols = [col for col in CORRELATION_COLUMNS if col in df.columns]
+        corr_matrix = df[cols].corr()
+    plot_correlation(corr_matrix)
+
+@instrumented('graph.correlation')
+def plot_correlation(corr_matrix):
+    """
+    Draw Graph 5 from a correlation matrix
+    """
     plt.figure(figsize=(10, 8))
     sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', fmt=".2f", linewidths=0.5)
     plt.title('Correlation Heatmap: Weather vs Severity', fontsize=16)
@@ -74,12 +100,14 @@ def visualize_correlation(df):
     # Save heatmap
     plt.tight_layout()
     plt.savefig('graphs/5_correlation_heatmap.png')
+    plt.close()
     print("Saved: graphs/5_correlation_heatmap.png")
 
 # MAIN EXECUTION
-if __name__ == "__main__":
-    # 1. Load Data
-    df = load_data(CLEANED_DATA_FILE)
+def main():
+    # 1. Load Data (the correlation columns only if there are no stored statistics)
+    stats = load_stats(CLEANED_STORE)
+    df = load_data(CLEANED_STORE, MAP_COLUMNS if stats is None else POINT_COLUMNS)
     
     if df is not None:
         sns.set_style("darkgrid")
@@ -87,7 +115,12 @@ if __name__ == "__main__":
         # 2. Run Map Visualization
         visualize_usa_map(df)
         
-        # 3. Run Correlation Analysis
-        visualize_correlation(df)
+        # 3. Rank the hotspots
+        report_hotspots(df)
         
-        
\ No newline at end of file
+        # 4. Run Correlation Analysis
+        visualize_correlation(df, stats)
+        print_summary()
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,49 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from accident_store import CLEANED_STORE
+from data_access import load_accidents
+from accident_cube import load_cube
+from report_engine import metrics_from_frame, metrics_from_cube, variant_metrics, row_counts
+from instrumentation import stage, instrumented, print_summary
 
 # CONFIGURATION
-CLEANED_DATA_FILE = 'cleaned_accident_data.csv'
+REPORT_COLUMNS = ['City', 'Hour', 'Weather_Condition', 'Severity']
 REPORT_FILE = 'final_project_report.txt'
+# Extra reports per value of these dimensions, written to REPORT_DIR
+REPORT_VARIANTS = ['State', 'Year']
+REPORT_DIR = 'reports'
 
-def load_data(filepath):
-    if not os.path.exists(filepath):
-        print(f"Error: '{filepath}' not found.")
-        return None
+@instrumented('load')
+def load_data(store_dir, columns=REPORT_COLUMNS, filters=None):
     print("Loading data for Final Report...")
-    return pd.read_csv(filepath)
+    df = load_accidents(columns, filters, store_dir)
+    if df is None:
+        print(f"Error: '{store_dir}' not found.")
+    return df
 
+@instrumented('insights')
 def generate_insights(df):
     """
     Calculates key statistics for the project.
+    NOTE: All metrics come from one value_counts() per column (see report_engine);
+    main() skips the raw rows entirely and reads them from the pre-aggregated cube
+    and grouped counts of the cities, hours and weather conditions.
     """
     print("Calculating insights...")
-    
-    # 1. Total Accidents
-    total_accidents = len(df)
-    
-    # 2. Most Dangerous City
-    top_city = df['City'].mode()[0]
-    top_city_count = df['City'].value_counts().iloc[0]
-    
-    # 3. Most Dangerous Time (Hour)
-    peak_hour = int(df['Hour'].mode()[0])
-    
-    # 4. Most Common Weather
-    common_weather = df['Weather_Condition'].mode()[0]
-    
-    # 5. Severity Analysis (Percentage of severe accidents)
-    # Assuming Severity 3 and 4 are "Severe"
-    severe_accidents = df[df['Severity'] >= 3]
-    severe_pct = (len(severe_accidents) / total_accidents) * 100
+    return format_report(metrics_from_frame(df))
+
+def format_report(metrics, scope=None):
+    """
+    The text report for a dict of metrics (see report_engine.headline_metrics),
+    optionally for one State / Year only.
+    """
+    total_accidents = metrics['total_accidents']
+    top_city, top_city_count = metrics['top_city'], metrics['top_city_count']
+    peak_hour = metrics['peak_hour']
+    common_weather = metrics['common_weather']
+    severe_pct = metrics['severe_pct']
+    scope = f" ({scope})" if scope else ""
     
     # --- Prepare Text Report ---
     report_text = f"""
@@ -45,7 +52,7 @@ def generate_insights(df):
 ==================================================
 
 1. OVERVIEW
-   - Total Accidents Analyzed: {total_accidents:,}
+   - Total Accidents Analyzed: {total_accidents:,}{scope}
    - Data Source: Kaggle (US Accidents 2016-2023)
 
 2. KEY INSIGHTS (The "Where", "When", and "How")
@@ -84,12 +91,25 @@ def save_report(text):
     print(text) # Print to terminal as well
     print("-" * 30)
 
-def plot_severity_pie(df):
+@instrumented('variant_reports')
+def save_variant_reports(cube, rows):
+    """
+    One report per State and per Year (computed in parallel from the cube and row counts)
+    """
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    for by in REPORT_VARIANTS:
+        variants = variant_metrics(cube, rows, by)
+        for value, metrics in variants.items():
+            with open(os.path.join(REPORT_DIR, f'report_{by}_{value}.txt'), "w") as f:
+                f.write(format_report(metrics, f"{by}: {value}"))
+        print(f"Saved {len(variants)} per-{by} reports to '{REPORT_DIR}/'")
+
+@instrumented('graph.severity_pie')
+def plot_severity_pie(severity_counts):
     """
-    Graph 6: Pie Chart of Severity Distribution
+    Graph 6: Pie Chart of Severity Distribution (accident counts per Severity)
     """
     print("\nGenerating Final Graph: Severity Distribution...")
-    severity_counts = df['Severity'].value_counts()
     
     plt.figure(figsize=(8, 8))
     plt.pie(severity_counts, labels=severity_counts.index, autopct='%1.1f%%', startangle=140, colors=sns.color_palette('pastel'))
@@ -99,21 +119,37 @@ def plot_severity_pie(df):
         os.makedirs('graphs')
         
     plt.savefig('graphs/6_severity_pie.png')
+    plt.close()
     print("Saved: graphs/6_severity_pie.png")
 
 # ==========================================
 # MAIN EXECUTION
 # ==========================================
-if __name__ == "__main__":
-    df = load_data(CLEANED_DATA_FILE)
+def main():
+    # The pre-aggregated cube and the row counts have every count the report needs;
+    # raw rows are only loaded for stores built before the cube existed
+    cube = load_cube(CLEANED_STORE)
+    if cube is not None:
+        print("Calculating insights from the pre-aggregated cube...")
+        with stage('insights'):
+            rows = row_counts(CLEANED_STORE)
+            metrics = metrics_from_cube(cube, rows)
+    else:
+        df = load_data(CLEANED_STORE)
+        metrics = metrics_from_frame(df) if df is not None else None
     
-    if df is not None:
+    if metrics is not None:
         # 1. Generate Text Report
-        report = generate_insights(df)
-        save_report(report)
+        save_report(format_report(metrics))
+        if cube is not None:
+            save_variant_reports(cube, rows)
         
         # 2. Generate Final Graph
-        plot_severity_pie(df)
+        plot_severity_pie(metrics['severity_counts'])
         
+        print_summary()
         print("\nCONGRATULATIONS! PROJECT COMPLETED.")
-        print("You can now submit 'final_project_report.txt' and the 'graphs' folder.")
\ No newline at end of file
+        print("You can now submit 'final_project_report.txt' and the 'graphs' folder.")
+
+if __name__ == "__main__":
+    main()
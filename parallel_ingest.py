@@ -0,0 +1,282 @@
+import io
+import os
+import csv
+import math
+import glob
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from concurrent.futures import ProcessPoolExecutor
+from accident_store import CLEANED_STORE, PARTITION_SCHEMA, write_store, table_schema, merge_counts
+from accident_cube import merge_cubes
+from density_raster import merge_rasters
+from accident_stats import merge_stats
+from heavy_hitters import merge_heavy_hitters
+from time_rollups import merge_rollups
+from dedup import FingerprintSet, row_fingerprints
+from instrumentation import stage
+import milestone1_analysis as m1
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Parallel full ingest: the raw CSV is split into byte ranges that end on line
+# boundaries, and each range is profiled, then cleaned, in its own worker process.
+# A worker writes its cleaned rows straight into the store (its own part-rNNNNN-*
+# files) and only sends back small results: counts, its share of the cube / rasters
+# / statistics / heavy hitters / time rollups, and the 64-bit fingerprints of its rows. Duplicates
+# across ranges are resolved from those fingerprints at the end. Every range infers
+# its own dtypes, so the fingerprints must not depend on them (see dedup.row_fingerprints).
+# A repeated row is removed from the later range by the fingerprint of its cleaned,
+# stored form: equal raw rows clean to equal stored rows.
+# Lines are split on '\n', so quoted fields must not contain line breaks.
+INGEST_WORKERS = os.cpu_count() or 1
+RANGE_MB = 128
+# Memory ceiling for one chunk inside a worker
+WORKER_MEMORY_MB = 256
+# Rows cleaned up front to fix the store schema every worker casts to
+SCHEMA_SAMPLE_ROWS = 100_000
+
+class _RangeFile(io.RawIOBase):
+    """
+    Read-only view of bytes [start, end) of a file.
+    """
+
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._left = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self._file.readinto(memoryview(buffer)[:max(0, min(len(buffer), self._left))])
+        self._left -= n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+def byte_ranges(filepath, n_ranges):
+    """
+    Header column names and up to n_ranges (start, end) byte ranges covering the
+    data lines of a CSV file, each starting at the beginning of a line.
+    """
+    size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        header = f.readline()
+        columns = next(csv.reader([header.decode('utf-8')]))
+        bounds = [f.tell()]
+        for i in range(1, n_ranges):
+            target = bounds[0] + (size - bounds[0]) * i // n_ranges
+            if target <= bounds[-1]:
+                continue
+            # the byte before the target ends a line or belongs to the line we skip
+            f.seek(target - 1)
+            f.readline()
+            if bounds[-1] < f.tell() < size:
+                bounds.append(f.tell())
+        bounds.append(size)
+    return columns, list(zip(bounds[:-1], bounds[1:]))
+
+def read_range(filepath, columns, byte_range, chunksize, usecols=None):
+    """
+    The lines of one byte range as DataFrame chunks (same dtypes as load_data).
+    """
+    raw = io.BufferedReader(_RangeFile(filepath, *byte_range), buffer_size=1 << 20)
+    return pd.read_csv(raw, header=None, names=columns, dtype=m1.DTYPES, usecols=usecols, chunksize=chunksize)
+
+def _profile_range(filepath, columns, byte_range, chunksize):
+    # runs in a worker process
+    partial = m1.new_profile()
+    for chunk in read_range(filepath, columns, byte_range, chunksize):
+        m1.update_profile(partial, chunk)
+    return partial
+
+def profile_parallel(filepath, workers=INGEST_WORKERS, range_mb=RANGE_MB, memory_limit_mb=WORKER_MEMORY_MB):
+    """
+    profile_data() with the byte ranges profiled in parallel.
+    """
+    columns, ranges = byte_ranges(filepath, _range_count(filepath, workers, range_mb))
+    chunksize = m1.chunksize_for_memory(filepath, memory_limit_mb)
+    print(f"Profiling {len(ranges)} parts of the file with {workers} workers...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(_profile_range, *zip(*[(filepath, columns, r, chunksize) for r in ranges])))
+    profile = partials[0]
+    for partial in partials[1:]:
+        m1.merge_profiles(profile, partial)
+    return m1.finish_profile(profile)
+
+def _range_count(filepath, workers, range_mb):
+    return max(workers, math.ceil(os.path.getsize(filepath) / (range_mb * 1024 * 1024)))
+
+def _require_id(usecols):
+    # Rows are matched by ID only: the workers have no row index to check the rows at
+    # the watermark against (and a full ingest has no watermark)
+    if 'ID' not in usecols:
+        raise ValueError("Parallel ingest needs the ID column; run the streaming ingest instead.")
+
+def _clean_range(filepath, columns, usecols, byte_range, chunksize, schema, part_name, store_dir):
+    """
+    Clean one byte range and write it to the store (runs in a worker process).
+    Returns its counts, its aggregates and the fingerprints the parent needs to
+    resolve duplicates across ranges.
+    """
+    _require_id(usecols)
+    state = {'id_index': np.empty(0, dtype='uint64'), 'new_ids': [], 'watermark': None, 'latest': None,
+             'aggregates': {}, 'cube': None, 'rasters': None, 'stats': None, 'heavy_hitters': None,
+             'rollups': None}
+    seen = FingerprintSet()
+    counts = {'duplicates': 0, 'invalid': 0}
+    survivors, invalid = [], []
+
+    def cleaned_chunks():
+        for chunk in read_range(filepath, columns, byte_range, chunksize, usecols):
+            chunk = m1.select_new_records(chunk, state)
+            with stage('dedup', rows_in=len(chunk)) as s:
+                fingerprints = row_fingerprints(chunk)
+                keep = seen.add_unique(fingerprints)
+                # the fingerprint of every row travels along as its index
+                chunk = chunk[keep].set_axis(pd.Index(fingerprints[keep]), axis=0)
+                s.rows_out = len(chunk)
+            counts['duplicates'] += int((~keep).sum())
+            chunk, chunk_invalid = m1.clean_rows(chunk)
+            counts['invalid'] += len(chunk_invalid)
+            invalid.append(chunk_invalid.to_numpy(dtype='uint64'))
+            survivors.append(pd.DataFrame({'fingerprint': chunk.index.to_numpy(dtype='uint64'),
+                                           'stored': _stored_fingerprints(chunk, schema)}))
+            m1.accumulate_chunk(state, chunk)
+            yield chunk
+
+    rows = write_store(cleaned_chunks(), store_dir, append=True, schema=schema, part_name=part_name)
+    return {
+        'part_name': part_name,
+        'rows': rows,
+        'counts': counts,
+        'aggregates': state['aggregates'],
+        'cube': state['cube'], 'rasters': state['rasters'], 'stats': state['stats'],
+        'heavy_hitters': state['heavy_hitters'], 'rollups': state['rollups'],
+        'ids': np.concatenate(state['new_ids']) if state['new_ids'] else np.empty(0, dtype='uint64'),
+        'watermark': state['latest'],
+        'fingerprints': seen.to_array(),
+        'survivors': pd.concat(survivors, ignore_index=True) if survivors else None,
+        'invalid': np.concatenate(invalid) if invalid else np.empty(0, dtype='uint64'),
+    }
+
+def _stored_fingerprints(df, schema):
+    # fingerprint of each cleaned row as stored: the same for a cleaned chunk and for
+    # its rows read back from the store (columns by name, timestamps in one unit)
+    df = df[sorted(schema.names)]
+    units = {col: 'datetime64[us]' for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])}
+    return row_fingerprints(df.astype(units))
+
+def _part_files(store_dir, part_name):
+    return sorted(glob.glob(os.path.join(store_dir, '**', f'part-{part_name}-*.parquet'), recursive=True))
+
+def _read_part(store_dir, part_name, chunksize):
+    """
+    The rows of one range as DataFrames of about chunksize rows (the files of its
+    Year/State partitions are small: their batches are gathered first).
+    """
+    dataset = ds.dataset(_part_files(store_dir, part_name), format='parquet',
+                         partitioning=ds.HivePartitioning.discover(schema=PARTITION_SCHEMA),
+                         partition_base_dir=store_dir)
+    batches, rows = [], 0
+    for batch in dataset.to_batches():
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= chunksize:
+            yield pa.Table.from_batches(batches).to_pandas()
+            batches, rows = [], 0
+    if rows:
+        yield pa.Table.from_batches(batches).to_pandas()
+
+def _drop_rows(store_dir, part_name, fingerprints, schema, state, chunksize):
+    """
+    Rewrite the files of one range, batch by batch, without the rows whose stored
+    fingerprint is listed; what is left of the range is accumulated into state (to
+    rebuild its aggregates). Returns the number of rows left.
+    """
+    files = _part_files(store_dir, part_name)
+
+    def kept():
+        for df in _read_part(store_dir, part_name, chunksize):
+            df = df[~np.isin(_stored_fingerprints(df, schema), fingerprints)]
+            if len(df):
+                m1.accumulate_chunk(state, df)
+                yield df
+
+    # written under a new name while the old files are read, which are removed after
+    rows = write_store(kept(), store_dir, append=True, schema=schema, part_name=f'{part_name}d')
+    for path in files:
+        os.remove(path)
+    return rows
+
+def ingest_parallel(filepath, state, store_dir=CLEANED_STORE, workers=INGEST_WORKERS,
+                    range_mb=RANGE_MB, memory_limit_mb=WORKER_MEMORY_MB):
+    """
+    Full ingest of filepath into a fresh store, cleaned in parallel. Fills state
+    (indexes, watermark, aggregates, cube, rasters, stats, heavy hitters, rollups) like
+    clean_and_preprocess_streaming does, and returns the number of rows written.
+    """
+    print("\n--- Data Cleaning & Preprocessing (parallel) ---")
+    columns, ranges = byte_ranges(filepath, _range_count(filepath, workers, range_mb))
+    chunksize = m1.chunksize_for_memory(filepath, memory_limit_mb)
+    usecols = state['columns']
+    _require_id(usecols)
+
+    # every worker casts to the schema of a cleaned sample (as the streaming
+    # cleaner does with its first chunk)
+    sample = next(read_range(filepath, columns, ranges[0], SCHEMA_SAMPLE_ROWS, usecols))
+    sample, _ = m1.clean_rows(m1.drop_duplicate_rows(sample)[0])
+    schema = table_schema(sample)
+    if os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+    os.makedirs(store_dir)
+
+    print(f"Cleaning {len(ranges)} parts of the file with {workers} workers...")
+    args = [(filepath, columns, usecols, r, chunksize, schema, f'r{i:05d}', store_dir) for i, r in enumerate(ranges)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_clean_range, *zip(*args)))
+
+    # Resolve duplicates across ranges: the copy in the earliest range is kept
+    with stage('merge_ranges'):
+        seen = FingerprintSet()
+        rows = duplicates = invalid = 0
+        aggregates = state['aggregates'] = {}
+        state['cube'] = state['rasters'] = state['stats'] = state['heavy_hitters'] = state['rollups'] = None
+        for result in results:
+            repeated = seen.contains(result['fingerprints'])
+            seen.add_unique(result['fingerprints'])
+            duplicates += result['counts']['duplicates'] + int(repeated.sum())
+            invalid += result['counts']['invalid']
+            if repeated.any():
+                repeated = result['fingerprints'][repeated]
+                invalid -= int(np.isin(result['invalid'], repeated).sum())
+                survivors = result['survivors']
+                drop = survivors['stored'][np.isin(survivors['fingerprint'], repeated)].to_numpy()
+                if len(drop):
+                    partial = {'aggregates': {}, 'cube': None, 'rasters': None, 'stats': None,
+                               'heavy_hitters': None, 'rollups': None}
+                    part_rows = _drop_rows(store_dir, result['part_name'], drop, schema, partial, chunksize)
+                    result.update(partial, rows=part_rows)
+
+            rows += result['rows']
+            merge_counts(aggregates, result['aggregates'])
+            for key, merge in (('cube', merge_cubes), ('rasters', merge_rasters),
+                               ('stats', merge_stats), ('heavy_hitters', merge_heavy_hitters),
+                               ('rollups', merge_rollups)):
+                state[key] = merge(state[key], result[key])
+            state['new_ids'].append(result['ids'])
+            if result['watermark'] is not None and (state['watermark'] is None or result['watermark'] > state['watermark']):
+                state['watermark'] = result['watermark']
+        state['row_index'] = seen
+        merge_counts(aggregates, {'duplicates_removed': duplicates, 'invalid_durations': invalid})
+
+    print(f"Removed {duplicates} duplicate rows.")
+    print(f"Removed {invalid} rows with invalid durations.")
+    return rows
@@ -0,0 +1,508 @@
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+import numpy as np
+import pandas as pd
+from accident_store import CLEANED_STORE, store_exists
+from data_access import store_fingerprint
+from query_engine import QueryEngine, filter_expression
+from data_export import EXPORT_FORMATS, export_file
+from accident_cube import load_cube, cube_indexes, scan_cube, rollup, total, mean, top
+from accident_stats import load_stats, whole_years
+from calendar_features import WEEKDAYS, MONTHS
+from time_rollups import load_rollups, FREQUENCIES
+from instrumentation import stage, configure
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Local HTTP/JSON query service over the cleaned store, with the dashboard sidebar's
+# filters as query parameters:
+#   start, end                  inclusive dates (YYYY-MM-DD), default the whole history
+#   state, weather, severity    comma-separated (or repeated) values, default all
+# Endpoints (GET):
+#   /kpis                           total, top city, average severity and visibility
+#   /top?dim=City&n=10              top-N of City, State or Weather_Condition
+#   /histogram?dim=Hour             counts per Hour, Weekday, Month, Year, Severity or Sunrise_Sunset
+#   /correlation?columns=a,b        Pearson correlation matrix of the weather columns
+#   /trends?freq=M&window=3         counts per day / week / month (+ moving average)
+#   /health                         store fingerprint and cache counters
+#   /export?format=csv&columns=a,b  the matching rows as a csv, csv.gz or parquet file
+# The data (cube, statistics, rollups and, for row-level queries, the shared query
+# engine) is loaded once and shared by all requests, which a fixed pool of worker
+# threads answers. Responses are cached by normalized query and carry an ETag; a
+# request whose If-None-Match matches gets 304 Not Modified.
+# Exports are not cached: each one is written to a temporary file batch by batch and
+# streamed to the client in EXPORT_BLOCK_BYTES blocks, so any size fits in memory.
+# Each uncached query is a stage in the instrumentation trace (rotated by size, see
+# instrumentation), without the per-stage memory sampler thread; --no-trace turns it off.
+API_HOST = '127.0.0.1'
+API_PORT = 8765
+API_WORKERS = 8
+RESPONSE_CACHE_ENTRIES = 4096
+# How often the store fingerprint is checked; a new store is loaded and the cache cleared
+RELOAD_CHECK_SECONDS = 30
+# Cuboid each dimension is counted from (None: from the rows, by the query engine).
+# With a weather filter the cuboids are built from the matching rows (see scan_cube).
+TOP_N_DIMS = {'City': None, 'State': 'base', 'Weather_Condition': None}
+HISTOGRAM_DIMS = {'Hour': None, 'Weekday': 'base', 'Month': 'base', 'Year': 'base',
+                  'Severity': 'base', 'Sunrise_Sunset': None}
+# Largest n of /top (n and the moving-average window must be positive)
+MAX_TOP_N = 1000
+CORRELATION_COLUMNS = ['Severity', 'Temperature(F)', 'Humidity(%)', 'Visibility(mi)', 'Wind_Speed(mph)']
+# Columns of the shared dataset file the row-level queries need (see shared_dataset)
+SHARED_COLUMNS = (['Start_Time', 'Year', 'Hour', 'State', 'City', 'Weather_Condition', 'Sunrise_Sunset'] +
+                  CORRELATION_COLUMNS)
+# Columns exported when none are asked for (the dashboard's), and the export formats by extension
+EXPORT_COLUMNS = ['Start_Time', 'Year', 'Month', 'Weekday', 'Hour', 'State', 'City', 'Severity',
+                  'Weather_Condition', 'Sunrise_Sunset', 'Start_Lat', 'Start_Lng',
+                  'Temperature(F)', 'Humidity(%)', 'Visibility(mi)', 'Wind_Speed(mph)']
+EXPORT_EXTENSIONS = {extension: label for label, (extension, mime) in EXPORT_FORMATS.items()}
+EXPORT_BLOCK_BYTES = 1024 * 1024
+FILTER_PARAMS = ['start', 'end', 'state', 'weather', 'severity']
+ENDPOINT_PARAMS = {
+    '/kpis': [],
+    '/top': ['dim', 'n'],
+    '/histogram': ['dim'],
+    '/correlation': ['columns'],
+    '/trends': ['freq', 'window'],
+}
+EXPORT_PARAMS = ['columns', 'format']
+
+def _values(params, name):
+    """
+    All values of a list parameter (comma-separated and/or repeated), deduplicated.
+    """
+    values = [value.strip() for raw in params.get(name, []) for value in raw.split(',')]
+    return list(dict.fromkeys(value for value in values if value))
+
+def _single(params, name, default=None):
+    values = _values(params, name)
+    if len(values) > 1:
+        raise ValueError(f"'{name}' takes one value")
+    return values[0] if values else default
+
+def normalize_query(path, params):
+    """
+    The request as a canonical tuple of (parameter, values): list filters sorted,
+    dates and numbers parsed, unknown parameters rejected (ValueError). Two requests
+    for the same data get the same tuple, whatever their spelling.
+    """
+    allowed = EXPORT_PARAMS if path == '/export' else ENDPOINT_PARAMS[path]
+    unknown = set(params) - set(FILTER_PARAMS) - set(allowed)
+    if unknown:
+        raise ValueError(f"unknown parameter(s): {', '.join(sorted(unknown))}")
+    query = {}
+    for name in ('start', 'end'):
+        value = _single(params, name)
+        if value is not None:
+            query[name] = datetime.date.fromisoformat(value)
+    query['state'] = sorted(_values(params, 'state'))
+    query['weather'] = sorted(_values(params, 'weather'))
+    query['severity'] = sorted({int(value) for value in _values(params, 'severity')})
+    if path in ('/top', '/histogram'):
+        query['dim'] = _single(params, 'dim', 'City' if path == '/top' else 'Hour')
+        choices = TOP_N_DIMS if path == '/top' else HISTOGRAM_DIMS
+        if query['dim'] not in choices:
+            raise ValueError(f"dim must be one of {', '.join(choices)}")
+    if path == '/top':
+        query['n'] = int(_single(params, 'n', 10))
+        if not 1 <= query['n'] <= MAX_TOP_N:
+            raise ValueError(f"n must be between 1 and {MAX_TOP_N}")
+    if path == '/correlation':
+        query['columns'] = _values(params, 'columns') or CORRELATION_COLUMNS
+        unknown = [col for col in query['columns'] if col not in CORRELATION_COLUMNS]
+        if unknown:
+            raise ValueError(f"unknown column(s): {', '.join(unknown)}; columns must be among "
+                             f"{', '.join(CORRELATION_COLUMNS)}")
+    if path == '/trends':
+        query['freq'] = _single(params, 'freq', 'M').upper()
+        if query['freq'] not in FREQUENCIES:
+            raise ValueError(f"freq must be one of {', '.join(FREQUENCIES)}")
+        window = _single(params, 'window')
+        query['window'] = int(window) if window is not None else None
+        if query['window'] is not None and query['window'] < 1:
+            raise ValueError("window must be positive")
+    if path == '/export':
+        query['columns'] = _values(params, 'columns') or EXPORT_COLUMNS
+        query['format'] = _single(params, 'format', 'csv').lower()
+        if query['format'] not in EXPORT_EXTENSIONS:
+            raise ValueError(f"format must be one of {', '.join(EXPORT_EXTENSIONS)}")
+    return tuple((name, tuple(value) if isinstance(value, list) else value) for name, value in query.items())
+
+def _jsonable(value):
+    # numpy scalars -> Python, NaN / inf -> null
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, (datetime.date, pd.Timestamp)):
+        return value.isoformat()[:10]
+    return value
+
+class QueryService:
+    """
+    Answers API queries from data loaded once per store version, with a bounded LRU
+    cache of encoded responses. Thread-safe: requests read one immutable snapshot of
+    the loaded data, and a reload swaps in a new one.
+    """
+
+    def __init__(self, store_dir=CLEANED_STORE, cache_entries=RESPONSE_CACHE_ENTRIES):
+        if not store_exists(store_dir):
+            raise FileNotFoundError(f"Cleaned data store '{store_dir}' not found. Please run Milestone 1 first.")
+        self.store_dir = store_dir
+        self.cache_entries = cache_entries
+        self._lock = threading.Lock()
+        self._responses = OrderedDict()  # (fingerprint, path, query) -> (body, etag)
+        self._stats = {'requests': 0, 'hits': 0, 'misses': 0, 'not_modified': 0, 'errors': 0}
+        self._data = self._load()
+
+    def _load(self):
+        fingerprint = store_fingerprint(self.store_dir)
+        cube = load_cube(self.store_dir)
+        if not cube:
+            raise FileNotFoundError(f"No pre-aggregated cube in '{self.store_dir}'. Please re-run Milestone 1.")
+        indexes = cube_indexes(cube)
+        return {
+            'fingerprint': fingerprint,
+            'checked': time.monotonic(),
+            'indexes': indexes,
+            'bounds': indexes['base'].day_bounds(),
+            'stats': load_stats(self.store_dir),
+            'rollups': load_rollups(self.store_dir),
+            'engine': None,
+        }
+
+    def _current(self):
+        """
+        The loaded data, reloaded first if the store has changed since it was loaded.
+        """
+        data = self._data
+        if time.monotonic() - data['checked'] < RELOAD_CHECK_SECONDS:
+            return data
+        with self._lock:
+            if self._data is data:
+                if store_fingerprint(self.store_dir) != data['fingerprint']:
+                    print(f"Store '{self.store_dir}' changed: reloading.")
+                    self._data = self._load()
+                    self._responses.clear()
+                else:
+                    data['checked'] = time.monotonic()
+            return self._data
+
+    def _engine(self, data):
+        # row-level queries only: the shared memory-mapped dataset, opened on first use.
+        # The first request builds it outside the service lock (which only publishes the
+        # Future), so other requests are not held up; those that need it wait on the Future.
+        with self._lock:
+            future = data['engine']
+            building = future is None
+            if building:
+                future = data['engine'] = Future()
+        if building:
+            try:
+                future.set_result(QueryEngine(self.store_dir, shared=SHARED_COLUMNS))
+            except Exception as exc:
+                future.set_exception(exc)
+                with self._lock:
+                    data['engine'] = None  # the next request tries again
+        return future.result()
+
+    def respond(self, path, params, if_none_match=None):
+        """
+        (HTTP status, JSON body bytes, ETag) for a GET request.
+        """
+        with self._lock:
+            self._stats['requests'] += 1
+        if path == '/health':
+            return 200, json.dumps(self.health()).encode(), None
+        if path not in ENDPOINT_PARAMS:
+            return self._error(404, f"unknown endpoint {path}; try {', '.join(ENDPOINT_PARAMS)}")
+        try:
+            query = normalize_query(path, params)
+        except ValueError as exc:
+            return self._error(400, str(exc))
+
+        data = self._current()
+        key = (data['fingerprint'], path, query)
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is not None:
+                self._responses.move_to_end(key)
+                self._stats['hits'] += 1
+        if cached is None:
+            try:
+                with stage(f'api{path}'):
+                    result = getattr(self, path[1:])(data, dict(query))
+            except ValueError as exc:
+                return self._error(400, str(exc))
+            body = json.dumps(_jsonable(dict(result, query=dict(query))), allow_nan=False).encode()
+            cached = (body, f'"{hashlib.sha1(body).hexdigest()[:20]}"')
+            with self._lock:
+                self._stats['misses'] += 1
+                self._responses[key] = cached
+                while len(self._responses) > self.cache_entries:
+                    self._responses.popitem(last=False)
+        body, etag = cached
+        if if_none_match is not None and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            with self._lock:
+                self._stats['not_modified'] += 1
+            return 304, b'', etag
+        return 200, body, etag
+
+    def export(self, params):
+        """
+        (HTTP status, body, MIME type, file name) for GET /export. The body is the
+        export as a rewound temporary file for the caller to stream and close, or
+        JSON error bytes.
+        """
+        with self._lock:
+            self._stats['requests'] += 1
+        try:
+            query = dict(normalize_query('/export', params))
+        except ValueError as exc:
+            return self._error(400, str(exc)) + (None,)
+        data = self._current()
+        engine = QueryEngine(self.store_dir)
+        missing = [col for col in query['columns'] if col not in engine.dataset.schema.names]
+        if missing:
+            return self._error(400, f"unknown column(s): {', '.join(missing)}") + (None,)
+        label = EXPORT_EXTENSIONS[query['format']]
+        with stage('api/export'):
+            tmp = export_file(engine, list(query['columns']), self._row_filter(data, query), label)
+        return 200, tmp, EXPORT_FORMATS[label][1], f"accidents.{query['format']}"
+
+    def _error(self, status, message):
+        with self._lock:
+            self._stats['errors'] += 1
+        return status, json.dumps({'error': message}).encode(), None
+
+    def health(self):
+        with self._lock:
+            return dict(self._stats, fingerprint=self._data['fingerprint'], cached_responses=len(self._responses))
+
+    # --- endpoints: (loaded data, normalized query) -> result dict ---
+
+    def _date_range(self, data, query):
+        if data['bounds'] is None:
+            return None  # an empty cube: no accidents to match, whatever the dates
+        first, last = data['bounds']
+        return (max(query.get('start', first), first), min(query.get('end', last), last))
+
+    def _cube(self, data, query, cuboid):
+        if query['weather']:
+            return scan_cube(self._engine(data), self._row_filter(data, query))[cuboid]
+        return data['indexes'][cuboid].select(self._date_range(data, query), State=list(query['state']),
+                                              Severity=list(query['severity'])).to_frame()
+
+    def _row_filter(self, data, query):
+        return filter_expression(self._date_range(data, query), State=list(query['state']),
+                                 Weather_Condition=list(query['weather']), Severity=list(query['severity']))
+
+    def kpis(self, data, query):
+        base = self._cube(data, query, 'base')
+        accidents = total(base)
+        city = self._engine(data).top_values('City', self._row_filter(data, query), 1) if accidents else None
+        return {
+            'total': accidents,
+            'top_city': str(city.index[0]) if city is not None and len(city) else None,
+            'avg_severity': mean(base, 'Severity'),
+            'avg_visibility': mean(base, 'Visibility(mi)'),
+        }
+
+    def top(self, data, query):
+        cuboid = TOP_N_DIMS[query['dim']]
+        if cuboid is None:
+            counts = self._engine(data).top_values(query['dim'], self._row_filter(data, query), query['n'])
+        else:
+            counts = top(self._cube(data, query, cuboid), query['dim'], query['n'])
+        return {'items': [{'value': str(value), 'count': int(count)} for value, count in counts.items()]}
+
+    def histogram(self, data, query):
+        dim = query['dim']
+        if HISTOGRAM_DIMS[dim] is None:
+            counts = self._engine(data).group_counts([dim], self._row_filter(data, query))
+            counts = counts.set_index(dim)['count'].sort_index()
+        else:
+            counts = rollup(self._cube(data, query, HISTOGRAM_DIMS[dim]), [dim])['count']
+        if dim in ('Weekday', 'Month'):
+            counts = counts.reindex(WEEKDAYS if dim == 'Weekday' else MONTHS, fill_value=0)
+        return {'labels': [_jsonable(label) for label in counts.index], 'counts': counts.astype('int64').tolist()}
+
+    def correlation(self, data, query):
+        # From the per-Year/State/Severity statistics when the filters line up with
+        # them (as in the dashboard), otherwise from the matching rows
+        date_range = self._date_range(data, query)
+        years = whole_years(date_range, *data['bounds']) if data['bounds'] is not None else None
+        stats = data['stats']
+        columns = [col for col in query['columns'] if stats is None or col in stats.columns]
+        if stats is not None and years is not None and not query['weather']:
+            source = 'stats'
+            corr = stats.select(Year=years, State=list(query['state']), Severity=list(query['severity'])).correlation(columns)
+        else:
+            source = 'rows'
+            corr = self._engine(data).correlation(columns, self._row_filter(data, query))
+        return {'source': source, 'columns': list(corr.columns), 'matrix': corr.to_numpy().tolist()}
+
+    def trends(self, data, query):
+        rollups = data['rollups']
+        if rollups is None:
+            raise ValueError("no time rollups in the store; re-run Milestone 1")
+        if query['weather']:
+            raise ValueError("trends are kept per State and Severity; the weather filter does not apply")
+        view = dict(State=list(query['state']), Severity=list(query['severity']))
+        counts = rollups.counts(query['freq'], query.get('start'), query.get('end'), **view)
+        result = {'periods': [_jsonable(day) for day in counts.index], 'counts': counts.tolist()}
+        if query['window']:
+            result['moving_average'] = rollups.moving_average(query['window'], query['freq'], query.get('start'),
+                                                              query.get('end'), **view).round(3).tolist()
+        return result
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTPServer whose requests are handled by a fixed pool of worker threads.
+    """
+    request_queue_size = 256
+
+    def __init__(self, address, handler, service, workers=API_WORKERS):
+        super().__init__(address, handler)
+        self.service = service
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+class QueryHandler(BaseHTTPRequestHandler):
+    quiet = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip('/') or '/'
+        try:
+            if path == '/export':
+                return self._export(parse_qs(url.query))
+            status, body, etag = self.server.service.respond(path, parse_qs(url.query),
+                                                             self.headers.get('If-None-Match'))
+        except Exception as exc:
+            self.log_error("%s: %s", type(exc).__name__, exc)
+            status, body, etag = 500, json.dumps({'error': 'internal error'}).encode(), None
+        self._send_json(status, body, etag)
+
+    def _export(self, params):
+        status, body, mime, filename = self.server.service.export(params)
+        if status != 200:
+            return self._send_json(status, body, None)
+        with body:
+            size = body.seek(0, 2)
+            body.seek(0)
+            self.send_response(200)
+            self.send_header('Content-Type', mime)
+            self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+            self.send_header('Content-Length', str(size))
+            self.end_headers()
+            shutil.copyfileobj(body, self.wfile, EXPORT_BLOCK_BYTES)
+
+    def _send_json(self, status, body, etag):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+def serve(host=API_HOST, port=API_PORT, workers=API_WORKERS, store_dir=CLEANED_STORE, quiet=True, trace=True):
+    configure(enabled=trace, sample_memory=False)
+    service = QueryService(store_dir)
+    QueryHandler.quiet = quiet
+    server = PooledHTTPServer((host, port), QueryHandler, service, workers)
+    print(f"Query API on http://{host}:{server.server_port} ({workers} workers, store '{store_dir}')")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def load_test(base_url, paths, requests=2000, concurrency=32):
+    """
+    Fire `requests` GETs (cycling through paths) from `concurrency` client threads;
+    half of the repeats send the ETag they got before. Returns requests/s and
+    latency percentiles in ms.
+    """
+    etags = {}
+
+    def fetch(i):
+        path = paths[i % len(paths)]
+        request = Request(base_url + path)
+        if i % 2 and path in etags:
+            request.add_header('If-None-Match', etags[path])
+        start = time.perf_counter()
+        try:
+            with urlopen(request) as response:
+                response.read()
+                etags[path] = response.headers.get('ETag')
+                status = response.status
+        except HTTPError as exc:
+            status = exc.code
+        return status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, range(requests)))
+    seconds = time.perf_counter() - start
+    latency = np.array([r[1] for r in results]) * 1000
+    statuses = pd.Series([r[0] for r in results]).value_counts().to_dict()
+    return {'requests': requests, 'seconds': round(seconds, 3), 'requests_per_second': round(requests / seconds, 1),
+            'p50_ms': round(float(np.percentile(latency, 50)), 2), 'p99_ms': round(float(np.percentile(latency, 99)), 2),
+            'statuses': statuses}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON query API over the cleaned accident store.")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    parser.add_argument('--workers', type=int, default=API_WORKERS)
+    parser.add_argument('--store', default=CLEANED_STORE)
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    parser.add_argument('--no-trace', action='store_true', help="do not record queries in the instrumentation trace")
+    parser.add_argument('--load-test', metavar='URL', help="load-test a running API instead of serving")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+    if args.load_test:
+        paths = ['/kpis', '/kpis?state=CA,TX', '/top?dim=City&n=10', '/histogram?dim=Hour',
+                 '/histogram?dim=Weekday&severity=3,4', '/correlation', '/trends?freq=W&window=4']
+        print(json.dumps(load_test(args.load_test.rstrip('/'), paths, args.requests, args.concurrency), indent=2))
+    else:
+        serve(args.host, args.port, args.workers, args.store, quiet=not args.verbose, trace=not args.no_trace)
@@ -0,0 +1,168 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from accident_store import CLEANED_STORE, open_store
+from shared_dataset import shared_table
+from accident_stats import moment_sums, correlation_matrix
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Rows per scanned batch: the most row-level data held in memory at once
+BATCH_SIZE = 256 * 1024
+
+def filter_expression(date_range=None, **selected):
+    """
+    Arrow filter for the dashboard sidebar: an inclusive (start, end) date range and
+    {column: selected values} filters (empty selection = no filter).
+    The Year bounds let the scan skip whole Year=... partitions.
+    """
+    expr = None
+    def add(term):
+        nonlocal expr
+        expr = term if expr is None else expr & term
+
+    if date_range is not None and len(date_range) == 2:
+        start, end = date_range
+        add(ds.field('Year') >= start.year)
+        add(ds.field('Year') <= end.year)
+        add(ds.field('Start_Time') >= pa.scalar(_as_datetime(start), pa.timestamp('us')))
+        add(ds.field('Start_Time') < pa.scalar(_as_datetime(end) + datetime.timedelta(days=1), pa.timestamp('us')))
+    for col, values in selected.items():
+        if values:
+            add(ds.field(col).isin([v.item() if hasattr(v, 'item') else v for v in values]))
+    return expr
+
+def _as_datetime(day):
+    return datetime.datetime(day.year, day.month, day.day)
+
+def _sum_counts(parts, columns):
+    # one table of counts per combination of values, from several
+    table = pa.concat_tables(parts).unify_dictionaries().combine_chunks()
+    return _aggregate_counts(table, columns, ('count', 'sum'), 'count_sum')
+
+def _aggregate_counts(table, columns, aggregation, name):
+    # the key and count columns are picked by name: where group_by().aggregate() puts
+    # the keys depends on the pyarrow version
+    grouped = table.group_by(columns).aggregate([aggregation])
+    return pa.table([grouped[col] for col in columns] + [grouped[name]], names=columns + ['count'])
+
+class QueryEngine:
+    """
+    Out-of-core queries over the cleaned Parquet store. Filters and column
+    projections are pushed into the Arrow scan (partition pruning, row-group
+    statistics); results are aggregated batch by batch, so only aggregates or small
+    pages of rows are ever materialized, however large the dataset is.
+    With shared=True the queries run over the memory-mapped shared Arrow file instead
+    (see shared_dataset): no decompression, and no per-process copy of the data;
+    shared may also be the list of columns the file needs.
+    """
+
+    def __init__(self, store_dir=CLEANED_STORE, shared=False):
+        self.store_dir = store_dir
+        if shared:
+            self.dataset = ds.dataset(shared_table(store_dir, None if shared is True else shared))
+        else:
+            self.dataset = open_store(store_dir)
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        An engine over an in-memory DataFrame instead of a store (e.g. for benchmarks).
+        """
+        engine = cls.__new__(cls)
+        engine.store_dir = None
+        engine.dataset = ds.dataset(pa.Table.from_pandas(df, preserve_index=False))
+        return engine
+
+    def columns(self, wanted):
+        return [col for col in wanted if col in self.dataset.schema.names]
+
+    def record_batches(self, columns, filters=None, batch_size=BATCH_SIZE):
+        """
+        Yield the matching rows as Arrow RecordBatches of at most batch_size rows.
+        """
+        scanner = self.dataset.scanner(columns=self.columns(columns), filter=filters, batch_size=batch_size)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch
+
+    def batches(self, columns, filters=None, batch_size=BATCH_SIZE):
+        """
+        Yield the matching rows as pandas DataFrames of at most batch_size rows.
+        """
+        for batch in self.record_batches(columns, filters, batch_size):
+            yield batch.to_pandas()
+
+    def count(self, filters=None):
+        return self.dataset.count_rows(filter=filters)
+
+    def page(self, columns, filters=None, limit=100, offset=0):
+        """
+        A small page of matching rows.
+        """
+        scanner = self.dataset.scanner(columns=self.columns(columns), filter=filters)
+        return scanner.head(offset + limit).slice(offset).to_pandas()
+
+    def value_counts(self, column, filters=None):
+        counts = None
+        for batch in self.batches([column], filters):
+            batch_counts = batch[column].value_counts()
+            counts = batch_counts if counts is None else counts.add(batch_counts, fill_value=0)
+        if counts is None:
+            return pd.Series(dtype='int64')
+        counts = counts[counts > 0]  # categories that never occur in the matching rows
+        return counts.astype('int64').sort_values(ascending=False)
+
+    def top_values(self, column, filters=None, n=10):
+        """
+        Top-n values of a column by matching rows, largest first (ties broken by
+        value, like accident_cube.top).
+        """
+        counts = self.group_counts([column], filters)
+        counts = counts.set_index(counts[column].astype(object))['count'].rename_axis(column)
+        return counts.sort_index(kind='stable').sort_values(ascending=False, kind='stable').head(n)
+
+    def group_counts(self, columns, filters=None):
+        """
+        Matching rows per combination of (non-null) values of the columns: a DataFrame
+        of the columns + 'count'. Batches are counted by Arrow and their counts summed
+        whenever they reach BATCH_SIZE groups.
+        """
+        columns = self.columns(columns)
+        parts = []
+        for batch in self.record_batches(columns, filters):
+            table = pa.Table.from_batches([batch]).drop_null()
+            parts.append(_aggregate_counts(table, columns, ([], 'count_all'), 'count_all'))
+            if sum(part.num_rows for part in parts) > BATCH_SIZE:
+                parts = [_sum_counts(parts, columns)]
+        if not parts:
+            return pd.DataFrame(columns=columns + ['count'])
+        return _sum_counts(parts, columns).to_pandas()
+
+    def correlation(self, columns, filters=None):
+        """
+        Pearson correlation matrix with pairwise-complete observations (same as
+        DataFrame.corr()), from per-batch sums and cross products.
+        """
+        columns = self.columns(columns)
+        k = len(columns)
+        sums = [np.zeros((k, k)) for _ in range(4)]
+        for batch in self.batches(columns, filters):
+            for total, part in zip(sums, moment_sums(batch[columns].to_numpy(dtype='float64'))):
+                total += part
+        return correlation_matrix(*sums, columns)
+
+    def sample(self, columns, filters=None, n=10000, seed=42):
+        """
+        Uniform random sample of about n matching rows, drawn batch by batch.
+        """
+        total = self.count(filters)
+        if total == 0:
+            return pd.DataFrame(columns=self.columns(columns))
+        rate = min(1.0, n / total)
+        rng = np.random.default_rng(seed)
+        parts = [batch[rng.random(len(batch)) < rate] for batch in self.batches(columns, filters)]
+        return pd.concat(parts, ignore_index=True).head(n)
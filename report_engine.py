@@ -0,0 +1,91 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from accident_store import CLEANED_STORE
+from accident_cube import add_calendar_dims
+from query_engine import QueryEngine
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Headline metrics of the final report, computed from per-value counts only:
+# from the pre-aggregated cube plus grouped scans of the store for the dimensions
+# the cube does not keep (no raw rows held at all) or, for older stores, from one
+# value_counts() per column of the loaded frame. Memory is bounded by the number of
+# distinct cities / hours / weather conditions, not by the number of rows.
+SEVERE_LEVEL = 3
+# Cuboid of the cube (see accident_cube.CUBOIDS) holding each report dimension
+REPORT_DIMS = {'Severity': 'base'}
+# Report dimensions not in the cube: counted per Year and State (the report variants)
+ROW_DIMS = ['City', 'Hour', 'Weather_Condition']
+VARIANT_DIMS = ['Year', 'State']
+REPORT_WORKERS = min(8, os.cpu_count() or 1)
+
+def _counts_by_value(counts):
+    # largest first, ties broken by value (so the first entry is Series.mode()[0])
+    counts = counts[counts > 0]
+    return counts.sort_index(kind='stable').sort_values(ascending=False, kind='stable')
+
+def headline_metrics(counts):
+    """
+    Report metrics from {dimension: accident counts per value}.
+    """
+    severity = counts['Severity']
+    total = int(severity.sum())
+    if total == 0:
+        return None
+    city, hour, weather = (_counts_by_value(counts[dim]) for dim in ('City', 'Hour', 'Weather_Condition'))
+    return {
+        'total_accidents': total,
+        'top_city': city.index[0],
+        'top_city_count': int(city.iloc[0]),
+        'peak_hour': int(hour.index[0]),
+        'common_weather': weather.index[0],
+        'severe_pct': severity[severity.index >= SEVERE_LEVEL].sum() / total * 100,
+        'severity_counts': severity[severity > 0].sort_values(ascending=False),
+    }
+
+def metrics_from_frame(df):
+    """
+    Metrics of a loaded frame: one value_counts() pass per column, no filtered copies.
+    """
+    return headline_metrics({dim: df[dim].value_counts() for dim in ROW_DIMS + list(REPORT_DIMS)})
+
+def row_counts(store_dir=CLEANED_STORE):
+    """
+    {dimension: accidents per Year, State and value} of the ROW_DIMS, for
+    metrics_from_cube.
+    """
+    engine = QueryEngine(store_dir)
+    counts = {}
+    for dim in ROW_DIMS:
+        frame = engine.group_counts(VARIANT_DIMS + [dim])
+        # plain values, so ties are broken by value as in metrics_from_frame
+        counts[dim] = frame.astype({'State': object, dim: object})
+    return counts
+
+def metrics_from_cube(cube, rows, **selected):
+    """
+    Metrics of the cube and the row counts (see row_counts), optionally restricted
+    to {dimension: values} (Year or State).
+    """
+    counts = {}
+    sources = dict({dim: cube[name] for dim, name in REPORT_DIMS.items()}, **rows)
+    for dim, frame in sources.items():
+        if 'Year' in selected and 'Year' not in frame.columns:
+            frame = add_calendar_dims(frame, ['Year'])
+        for col, values in selected.items():
+            frame = frame[frame[col].isin(values)]
+        counts[dim] = frame.groupby(dim, observed=True)['count'].sum()
+    return headline_metrics(counts)
+
+def variant_metrics(cube, rows, by, workers=REPORT_WORKERS):
+    """
+    {value: metrics} for every value of one dimension (State or Year),
+    computed in parallel.
+    """
+    if by == 'Year':
+        cube = {name: add_calendar_dims(frame, ['Year']) for name, frame in cube.items()}
+    values = sorted(cube['base'][by].unique())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda value: metrics_from_cube(cube, rows, **{by: [value]}), values)
+        return {value: metrics for value, metrics in zip(values, results) if metrics is not None}
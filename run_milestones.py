@@ -0,0 +1,43 @@
+import milestone2_eda
+import milestone3_map
+import milestone4_report
+from accident_store import CLEANED_STORE
+from accident_cube import load_cube
+from data_access import load_accidents, cache_info
+from chart_pipeline import chart_inputs, render_charts
+from report_engine import metrics_from_cube, metrics_from_frame, row_counts
+from instrumentation import stage, print_summary
+
+# ==========================================
+# Runs Milestones 2-4 back to back in one process.
+# The cleaned data is loaded once (the union of the columns all three need), the
+# inputs of all six graphs are computed from it, and the graphs are drawn in parallel
+# by the chart pipeline (graphs whose inputs did not change are skipped).
+# ==========================================
+if __name__ == "__main__":
+    columns = milestone2_eda.GRAPH_COLUMNS + milestone3_map.MAP_COLUMNS + milestone4_report.REPORT_COLUMNS
+    print("Loading cleaned dataset once for Milestones 2-4...")
+    with stage('load') as s:
+        df = load_accidents(columns, store_dir=CLEANED_STORE)
+        s.rows_out = len(df) if df is not None else None
+    if df is None:
+        print(f"Error: '{CLEANED_STORE}' not found. Please run Milestone 1 first.")
+    else:
+        print("\nRendering graphs...")
+        with stage('chart_inputs', rows_in=len(df)):
+            inputs = chart_inputs(df, CLEANED_STORE, milestone2_eda.APPROXIMATE_TOP_N)
+        with stage('render_charts'):
+            for name, status in render_charts(inputs).items():
+                print(f"  {name}: {status}")
+
+        milestone3_map.report_hotspots(df)
+
+        with stage('insights'):
+            cube = load_cube(CLEANED_STORE)
+            rows = row_counts(CLEANED_STORE) if cube is not None else None
+            metrics = metrics_from_cube(cube, rows) if cube is not None else metrics_from_frame(df)
+            milestone4_report.save_report(milestone4_report.format_report(metrics))
+        if cube is not None:
+            milestone4_report.save_variant_reports(cube, rows)
+        print(f"\nData cache: {cache_info()}")
+        print_summary()
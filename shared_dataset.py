@@ -0,0 +1,122 @@
+import os
+import uuid
+import fcntl
+from contextlib import contextmanager
+import pyarrow as pa
+import pyarrow.compute as pc
+from accident_store import CLEANED_STORE, open_store, store_exists
+from data_access import store_fingerprint
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# The cleaned dataset (or the columns the dashboard needs) as one uncompressed Arrow
+# IPC file next to the store. It is opened read-only as a memory map, so loading it
+# copies nothing: every Streamlit session, and every process on the machine that
+# opens it, shares the same page-cache pages. Per-session state is only what a query
+# produces (filter masks, aggregates, small pages of rows).
+# The file carries the store fingerprint and is rebuilt when Milestone 1 changes the
+# store; a process that still maps the old file keeps reading it until it reopens.
+# Rebuilds hold a lock file next to it, so concurrent sessions or processes build it once.
+SHARED_FILE = '_shared.arrow'
+
+def shared_path(store_dir=CLEANED_STORE):
+    return os.path.join(store_dir, SHARED_FILE)
+
+def _open(path):
+    """
+    The table in an Arrow IPC file, memory-mapped (zero copy), or None if the file is
+    missing or unreadable.
+    """
+    try:
+        return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+def _metadata(table):
+    metadata = table.schema.metadata or {}
+    return {key.decode(): value.decode() for key, value in metadata.items()}
+
+def _dictionaries(dataset, columns):
+    """
+    One dictionary per dictionary-encoded column holding its values over the whole
+    store: an IPC file cannot switch dictionaries between batches. The values are
+    collected batch by batch, so only the distinct values are held.
+    """
+    values = {col: pa.array([], pa.string()) for col in columns}
+    if columns:
+        for batch in dataset.to_batches(columns=columns):
+            for col in columns:
+                values[col] = pc.unique(pa.concat_arrays([values[col], batch.column(col).dictionary]))
+    return {col: unique.take(pc.array_sort_indices(unique)).drop_null() for col, unique in values.items()}
+
+def _recode(array, dictionary):
+    # same values, indices into the global dictionary
+    positions = pc.index_in(array.dictionary, value_set=dictionary)
+    return pa.DictionaryArray.from_arrays(pc.take(positions, array.indices).cast(array.type.index_type), dictionary)
+
+def write_shared_file(store_dir=CLEANED_STORE, columns=None):
+    """
+    Write (the given columns of) the store to its shared Arrow file, batch by batch.
+    The file is written under a temporary name and moved into place, so readers only
+    ever see a complete file. Returns the number of rows.
+    """
+    fingerprint = store_fingerprint(store_dir)
+    dataset = open_store(store_dir)
+    names = dataset.schema.names if columns is None else [col for col in columns if col in dataset.schema.names]
+    schema = pa.schema([dataset.schema.field(col) for col in names])
+    dictionaries = _dictionaries(dataset, [f.name for f in schema if pa.types.is_dictionary(f.type)])
+    schema = schema.with_metadata({'fingerprint': fingerprint})
+
+    path = shared_path(store_dir)
+    tmp_path = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+    rows = 0
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            for batch in dataset.to_batches(columns=names):
+                arrays = [_recode(batch.column(col), dictionaries[col]) if col in dictionaries else batch.column(col)
+                          for col in names]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                rows += batch.num_rows
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+@contextmanager
+def _build_lock(path):
+    # exclusive across processes while the shared file is (re)built
+    with open(f'{path}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _current(table, fingerprint, wanted):
+    return table is not None and _metadata(table).get('fingerprint') == fingerprint and \
+        set(wanted) <= set(table.schema.names)
+
+def shared_table(store_dir=CLEANED_STORE, columns=None):
+    """
+    The cleaned dataset as a memory-mapped Arrow table (read-only, shared between
+    processes), built from the store first if the shared file is missing, stale or
+    lacks a requested column. Returns None if the store is missing.
+    """
+    if not store_exists(store_dir):
+        return None
+    store_columns = open_store(store_dir).schema.names
+    wanted = [col for col in (store_columns if columns is None else columns) if col in store_columns]
+    path = shared_path(store_dir)
+    fingerprint = store_fingerprint(store_dir)
+    table = _open(path)
+    if not _current(table, fingerprint, wanted):
+        with _build_lock(path):
+            # another session or process may have built it while this one waited
+            table = _open(path)
+            if not _current(table, fingerprint, wanted):
+                print(f"Building the shared dataset file {path}...")
+                write_shared_file(store_dir, wanted)
+                table = _open(path)
+    return table
@@ -0,0 +1,222 @@
+import math
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+from density_raster import US_EXTENT
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Quadtree cells over US_EXTENT: at level L the extent is split into 2^L x 2^L cells
+# and a cell id is the Z-order (Morton) code of its column/row, so cells of a
+# coarser level are contiguous id ranges of the finer one.
+# Level 16 cells are roughly 90m x 45m; this is the 'Cell' column stored by Milestone 1.
+CELL_LEVEL = 16
+HOTSPOT_LEVEL = 10
+# A bounding box is covered by at most this many id ranges
+MAX_RANGES = 64
+EARTH_RADIUS_KM = 6371.0
+
+def _spread_bits(v):
+    v = v & 0xFFFFFFFF
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    v = (v | (v << 1)) & 0x5555555555555555
+    return v
+
+def _compact_bits(v):
+    v = v & 0x5555555555555555
+    v = (v | (v >> 1)) & 0x3333333333333333
+    v = (v | (v >> 2)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v >> 4)) & 0x00FF00FF00FF00FF
+    v = (v | (v >> 8)) & 0x0000FFFF0000FFFF
+    v = (v | (v >> 16)) & 0x00000000FFFFFFFF
+    return v
+
+def _grid_position(lat, lng, level):
+    lng_min, lng_max, lat_min, lat_max = US_EXTENT
+    size = 1 << level
+    x = np.floor((np.asarray(lng, dtype='float64') - lng_min) / (lng_max - lng_min) * size)
+    y = np.floor((np.asarray(lat, dtype='float64') - lat_min) / (lat_max - lat_min) * size)
+    return x, y
+
+def morton(x, y):
+    x = np.asarray(x, dtype='uint64')
+    y = np.asarray(y, dtype='uint64')
+    return (_spread_bits(x) | (_spread_bits(y) << np.uint64(1))).astype('int64')
+
+def cell_ids(lat, lng, level=CELL_LEVEL):
+    """
+    Quadtree cell id of each point (int64); -1 for points outside US_EXTENT or
+    with a missing coordinate.
+    """
+    x, y = _grid_position(lat, lng, level)
+    size = 1 << level
+    inside = (x >= 0) & (x < size) & (y >= 0) & (y < size)
+    cells = np.full(len(x), -1, dtype='int64')
+    cells[inside] = morton(x[inside], y[inside])
+    return cells
+
+def cell_center(cells, level=CELL_LEVEL):
+    """
+    (lat, lng) of the center of each cell.
+    """
+    cells = np.asarray(cells, dtype='uint64')
+    x = _compact_bits(cells).astype('float64')
+    y = _compact_bits(cells >> np.uint64(1)).astype('float64')
+    lng_min, lng_max, lat_min, lat_max = US_EXTENT
+    size = 1 << level
+    return (lat_min + (y + 0.5) / size * (lat_max - lat_min),
+            lng_min + (x + 0.5) / size * (lng_max - lng_min))
+
+def add_cell_column(df):
+    """
+    Add the 'Cell' column and order the rows by it, so rows that are close on the
+    map are stored together (Parquet row-group statistics then prune bbox queries).
+    """
+    df = df.copy(deep=False)
+    df['Cell'] = cell_ids(df['Start_Lat'], df['Start_Lng'])
+    return df.iloc[np.argsort(df['Cell'].to_numpy(), kind='stable')]
+
+def bbox_ranges(lat_min, lat_max, lng_min, lng_max, level=CELL_LEVEL, max_ranges=MAX_RANGES):
+    """
+    Sorted, merged [start, end) ranges of level-`level` cell ids covering a bounding
+    box. The cover is made of the coarsest cells that keep the count under max_ranges.
+    A box reaching outside US_EXTENT also covers the -1 cell of outside points.
+    """
+    ext_lng_min, ext_lng_max, ext_lat_min, ext_lat_max = US_EXTENT
+    outside = [(-1, 0)] if (lat_min < ext_lat_min or lat_max >= ext_lat_max or
+                            lng_min < ext_lng_min or lng_max >= ext_lng_max) else []
+    for coarse in range(level, -1, -1):
+        x0, y0 = _grid_position(lat_min, lng_min, coarse)
+        x1, y1 = _grid_position(lat_max, lng_max, coarse)
+        size = 1 << coarse
+        x0, x1 = int(np.clip(x0, 0, size - 1)), int(np.clip(x1, 0, size - 1))
+        y0, y1 = int(np.clip(y0, 0, size - 1)), int(np.clip(y1, 0, size - 1))
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= max_ranges * 4 or coarse == 0:
+            break
+    xs, ys = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+    codes = np.sort(morton(xs.ravel(), ys.ravel()))
+    shift = 2 * (level - coarse)
+    starts, ends = codes << shift, (codes + 1) << shift
+
+    # merge ranges that touch (neighbours along the Z-order curve)
+    merged = [[starts[0], ends[0]]]
+    for start, end in zip(starts[1:], ends[1:]):
+        if start == merged[-1][1]:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    while len(merged) > max_ranges:
+        # close the smallest gap; the exact lat/lng check removes the extra rows
+        gaps = [merged[i + 1][0] - merged[i][1] for i in range(len(merged) - 1)]
+        i = int(np.argmin(gaps))
+        merged[i][1] = merged[i + 1][1]
+        del merged[i + 1]
+    return outside + [(int(start), int(end)) for start, end in merged]
+
+def bbox_expression(lat_min, lat_max, lng_min, lng_max, with_cells=True):
+    """
+    Arrow filter for the points inside a bounding box: the Cell ranges let the scan
+    skip row groups, the coordinate bounds make the result exact.
+    """
+    expr = ((ds.field('Start_Lat') >= lat_min) & (ds.field('Start_Lat') <= lat_max) &
+            (ds.field('Start_Lng') >= lng_min) & (ds.field('Start_Lng') <= lng_max))
+    if with_cells:
+        cells = None
+        for start, end in bbox_ranges(lat_min, lat_max, lng_min, lng_max):
+            term = (ds.field('Cell') >= start) & (ds.field('Cell') < end)
+            cells = term if cells is None else cells | term
+        expr = expr & cells
+    return expr
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype='float64')) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def radius_bbox(lat, lng, radius_km):
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+class SpatialIndex:
+    """
+    In-memory index of a DataFrame's points: row positions sorted by cell id plus a
+    cell -> row-range table, for bounding-box / radius queries and hotspot ranking
+    without scanning every Start_Lat/Start_Lng.
+    """
+
+    def __init__(self, df):
+        self.lat = df['Start_Lat'].to_numpy(dtype='float64')
+        self.lng = df['Start_Lng'].to_numpy(dtype='float64')
+        cells = df['Cell'].to_numpy() if 'Cell' in df.columns else cell_ids(self.lat, self.lng)
+        self.order = np.argsort(cells, kind='stable')
+        sorted_cells = cells[self.order]
+        # cell -> rows order[start:end]
+        self.cells, self.starts = np.unique(sorted_cells, return_index=True)
+        self.ends = np.append(self.starts[1:], len(sorted_cells))
+        self.sorted_cells = sorted_cells
+
+    def table(self):
+        return pd.DataFrame({'cell': self.cells, 'start': self.starts, 'end': self.ends})
+
+    def _rows_in_ranges(self, ranges):
+        parts = []
+        for start, end in ranges:
+            i = np.searchsorted(self.cells, start, side='left')
+            j = np.searchsorted(self.cells, end, side='left')
+            if i < j:
+                parts.append(self.order[self.starts[i]:self.ends[j - 1]])
+        return np.concatenate(parts) if parts else np.empty(0, dtype='int64')
+
+    def bbox(self, lat_min, lat_max, lng_min, lng_max):
+        """
+        Row positions of the points inside the bounding box.
+        """
+        rows = self._rows_in_ranges(bbox_ranges(lat_min, lat_max, lng_min, lng_max))
+        lat, lng = self.lat[rows], self.lng[rows]
+        inside = (lat >= lat_min) & (lat <= lat_max) & (lng >= lng_min) & (lng <= lng_max)
+        return np.sort(rows[inside])
+
+    def radius(self, lat, lng, radius_km):
+        """
+        Row positions of the points within radius_km of (lat, lng).
+        """
+        rows = self.bbox(*radius_bbox(lat, lng, radius_km))
+        return rows[haversine_km(lat, lng, self.lat[rows], self.lng[rows]) <= radius_km]
+
+    def hotspots(self, n=10, level=HOTSPOT_LEVEL):
+        """
+        The n cells (of a coarser level) with the most points.
+        """
+        valid = self.sorted_cells >= 0
+        coarse = self.sorted_cells[valid] >> (2 * (CELL_LEVEL - level))
+        cells, counts = np.unique(coarse, return_counts=True)
+        return hotspot_table(cells, counts, n, level)
+
+def hotspot_table(cells, counts, n=10, level=HOTSPOT_LEVEL):
+    top = np.argsort(-counts, kind='stable')[:n]
+    lat, lng = cell_center(cells[top], level)
+    return pd.DataFrame({'cell': cells[top], 'lat': lat, 'lng': lng, 'accidents': counts[top]})
+
+def grid_hotspots(grid, n=10, bbox=None):
+    """
+    The n busiest cells of a density grid (see density_raster), summed over
+    severities, with their centers; only cells centered in bbox
+    (lat_min, lat_max, lng_min, lng_max) if given.
+    """
+    counts = grid.sum(axis=0)
+    height, width = counts.shape
+    rows, cols = np.nonzero(counts)
+    lng_min, lng_max, lat_min, lat_max = US_EXTENT
+    cells = pd.DataFrame({
+        'lat': lat_min + (rows + 0.5) / height * (lat_max - lat_min),
+        'lng': lng_min + (cols + 0.5) / width * (lng_max - lng_min),
+        'accidents': counts[rows, cols].astype('int64'),
+    })
+    if bbox is not None:
+        cells = cells[cells['lat'].between(bbox[0], bbox[1]) & cells['lng'].between(bbox[2], bbox[3])]
+    return cells.sort_values('accidents', ascending=False, kind='stable').head(n).reset_index(drop=True)
@@ -0,0 +1,107 @@
+import os
+import json
+import datetime
+from accident_store import CLEANED_STORE
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# What the dashboard needs for its first paint, written by Milestone 1 next to the
+# store: the date bounds, the sidebar option lists and the KPIs of the default view
+# (whole date range, the first DEFAULT_STATES states, every severity, no weather
+# filter). The dashboard renders the sidebar and KPIs from it while the cube and
+# the query engine are still loading. It carries the store fingerprint, so a
+# snapshot from an older store is ignored.
+SNAPSHOT_FILE = '_startup.json'
+DEFAULT_STATES = 3
+
+def build_snapshot(cube, engine):
+    """
+    The startup snapshot of a cube (see accident_cube) as a JSON-ready dict, or None
+    for an empty cube. The top city and the weather conditions (not in the cube) come
+    from the query engine.
+    """
+    from accident_cube import cube_indexes, total, mean
+    from query_engine import filter_expression
+    base = cube_indexes(cube)['base']
+    if base.day_bounds() is None:
+        return None
+    min_date, max_date = base.day_bounds()
+    states = [str(state) for state in base.options('State')]
+    severity = [int(level) for level in base.options('Severity')]
+    view = dict(State=states[:DEFAULT_STATES], Severity=severity)
+    base_view = base.select((min_date, max_date), **view).to_frame()
+    accidents = total(base_view)
+    top_city = engine.top_values('City', filter_expression(**view), 1) if accidents else None
+    return {
+        'min_date': min_date.isoformat(),
+        'max_date': max_date.isoformat(),
+        'options': {
+            'State': states,
+            'Weather_Condition': sorted(str(weather) for weather in engine.value_counts('Weather_Condition').index),
+            'Severity': severity,
+        },
+        'default_view': view,
+        'kpis': {
+            'total': int(accidents),
+            'top_city': str(top_city.index[0]) if accidents else None,
+            'severity': float(mean(base_view, 'Severity')),
+            'visibility': float(mean(base_view, 'Visibility(mi)')),
+        },
+    }
+
+def save_snapshot(store_dir=CLEANED_STORE):
+    """
+    Write the startup snapshot of the stored cube. Call it after the store and the
+    cube are written.
+    """
+    from accident_cube import load_cube
+    from data_access import store_fingerprint
+    from query_engine import QueryEngine
+    cube = load_cube(store_dir)
+    snapshot = build_snapshot(cube, QueryEngine(store_dir)) if cube else None
+    if snapshot is None:
+        return None
+    snapshot['fingerprint'] = store_fingerprint(store_dir)
+    _write_snapshot(snapshot, store_dir)
+    return snapshot
+
+def refresh_snapshot(previous, store_dir=CLEANED_STORE):
+    """
+    Re-stamp the startup snapshot with the current store fingerprint, after a run
+    that rewrote the ingest state but added no rows (nothing in the snapshot changed),
+    provided it belonged to the `previous` fingerprint. Returns the snapshot, or None
+    if there was no current one.
+    """
+    from data_access import store_fingerprint
+    snapshot = _read_snapshot(store_dir)
+    if snapshot is None or snapshot.get('fingerprint') != previous:
+        return None
+    snapshot['fingerprint'] = store_fingerprint(store_dir)
+    _write_snapshot(snapshot, store_dir)
+    return snapshot
+
+def _read_snapshot(store_dir):
+    try:
+        with open(os.path.join(store_dir, SNAPSHOT_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_snapshot(snapshot, store_dir):
+    path = os.path.join(store_dir, SNAPSHOT_FILE)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(snapshot, f, indent=2)
+    os.replace(f'{path}.tmp', path)
+
+def load_snapshot(fingerprint, store_dir=CLEANED_STORE):
+    """
+    The startup snapshot with its dates as datetime.date, or None if it is missing
+    or belongs to another version of the store.
+    """
+    snapshot = _read_snapshot(store_dir)
+    if snapshot is None or snapshot.get('fingerprint') != fingerprint:
+        return None
+    for key in ('min_date', 'max_date'):
+        snapshot[key] = datetime.date.fromisoformat(snapshot[key])
+    return snapshot
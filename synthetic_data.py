@@ -0,0 +1,173 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Deterministic stand-in for the Kaggle US_Accidents file: the same 46 columns, with
+# roughly the real cardinalities (49 states, ~13k cities, ~140 weather conditions),
+# skewed frequencies, the real per-column null rates, some invalid durations and
+# some exact duplicate rows. The same (rows, seed) always gives the same file.
+SYNTHETIC_FILE = 'US_Accidents_synthetic.csv'
+SEED = 2023
+CHUNK_ROWS = 500_000
+N_CITIES = 13_000
+N_WEATHER = 140
+N_COUNTIES = 1_800
+N_AIRPORTS = 2_000
+DUPLICATE_RATE = 0.01
+INVALID_DURATION_RATE = 0.02
+
+STATES = ['CA', 'FL', 'TX', 'SC', 'NY', 'NC', 'VA', 'PA', 'MN', 'OR', 'AZ', 'GA', 'IL', 'TN', 'MI',
+          'LA', 'NJ', 'MD', 'OH', 'WA', 'AL', 'UT', 'CO', 'OK', 'MO', 'CT', 'IN', 'MA', 'WI', 'KY',
+          'NE', 'MT', 'IA', 'AR', 'NV', 'KS', 'DC', 'RI', 'MS', 'DE', 'WV', 'ID', 'NM', 'NH', 'WY',
+          'ME', 'ND', 'VT', 'SD']
+WEATHER = ['Fair', 'Mostly Cloudy', 'Cloudy', 'Clear', 'Partly Cloudy', 'Overcast', 'Light Rain',
+           'Scattered Clouds', 'Light Snow', 'Fog', 'Rain', 'Haze', 'Fair / Windy', 'Heavy Rain',
+           'Light Drizzle', 'Thunder in the Vicinity', 'Cloudy / Windy', 'T-Storm', 'Smoke', 'Snow']
+WIND_DIRECTIONS = ['CALM', 'S', 'SSW', 'W', 'WNW', 'NW', 'Calm', 'SW', 'WSW', 'SSE', 'N', 'NNW',
+                   'E', 'SE', 'ESE', 'ENE', 'NE', 'NNE', 'VAR', 'South', 'West', 'North', 'Variable', 'East']
+TIMEZONES = ['US/Eastern', 'US/Pacific', 'US/Central', 'US/Mountain']
+SOURCES = ['Source1', 'Source2', 'Source3']
+FLAG_COLUMNS = ['Amenity', 'Bump', 'Crossing', 'Give_Way', 'Junction', 'No_Exit', 'Railway',
+                'Roundabout', 'Station', 'Stop', 'Traffic_Calming', 'Traffic_Signal', 'Turning_Loop']
+TWILIGHT_COLUMNS = ['Sunrise_Sunset', 'Civil_Twilight', 'Nautical_Twilight', 'Astronomical_Twilight']
+# Share of missing values per column (as in the March 2023 release)
+NULL_RATES = {
+    'End_Lat': 0.44, 'End_Lng': 0.44, 'Description': 0.000001, 'Street': 0.0014, 'City': 0.00003,
+    'Zipcode': 0.0002, 'Timezone': 0.001, 'Airport_Code': 0.003, 'Weather_Timestamp': 0.016,
+    'Temperature(F)': 0.021, 'Wind_Chill(F)': 0.26, 'Humidity(%)': 0.023, 'Pressure(in)': 0.018,
+    'Visibility(mi)': 0.023, 'Wind_Direction': 0.023, 'Wind_Speed(mph)': 0.074,
+    'Precipitation(in)': 0.29, 'Weather_Condition': 0.022, 'Sunrise_Sunset': 0.003,
+    'Civil_Twilight': 0.003, 'Nautical_Twilight': 0.003, 'Astronomical_Twilight': 0.003,
+}
+FIRST_DAY = np.datetime64('2016-01-01', 's')
+YEARS = 8
+# Accidents per hour of day: morning and evening rush hours
+HOUR_WEIGHTS = np.array([2, 1.5, 1.2, 1, 1.2, 2, 4, 7, 8, 5, 4, 4.2, 4.4, 5, 6, 7.5, 8.5, 8, 5, 3.5, 3, 2.7, 2.4, 2.2])
+
+def _zipf_weights(n, s=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+def _universe(seed):
+    """
+    The fixed value sets every chunk draws from: cities (each in one state, with a
+    centre), counties, airports and the weather conditions, with their frequencies.
+    """
+    rng = np.random.default_rng([seed, 0])
+    state_of_city = rng.choice(len(STATES), N_CITIES, p=_zipf_weights(len(STATES), 0.9))
+    weather = WEATHER + [f'Condition {i}' for i in range(N_WEATHER - len(WEATHER))]
+    return {
+        'city_names': np.array([f'City {i:05d}' for i in range(N_CITIES)], dtype=object),
+        'city_state': np.array(STATES, dtype=object)[state_of_city],
+        'city_weights': _zipf_weights(N_CITIES, 1.05),
+        'city_lat': rng.uniform(25.5, 48.5, N_CITIES),
+        'city_lng': rng.uniform(-123.5, -68.0, N_CITIES),
+        'city_county': rng.integers(0, N_COUNTIES, N_CITIES),
+        'city_airport': rng.integers(0, N_AIRPORTS, N_CITIES),
+        'city_timezone': rng.integers(0, len(TIMEZONES), N_CITIES),
+        'weather': np.array(weather, dtype=object),
+        'weather_weights': _zipf_weights(N_WEATHER, 1.6),
+    }
+
+def _timestamps(stamps):
+    return pd.Series(np.datetime_as_string(stamps, unit='s')).str.replace('T', ' ', regex=False)
+
+def generate_chunk(first_row, n, seed=SEED, universe=None):
+    """
+    Rows first_row .. first_row + n of the synthetic file as a raw (string
+    timestamps) DataFrame, duplicates included.
+    """
+    universe = universe or _universe(seed)
+    rng = np.random.default_rng([seed, 1, first_row])
+    unique = n - int(n * DUPLICATE_RATE)
+
+    city = rng.choice(N_CITIES, unique, p=universe['city_weights'])
+    # more accidents in later years, rush hours and on weekdays
+    day = (np.sqrt(rng.random(unique)) * YEARS * 365).astype('int64')
+    weekend = (day + 4) % 7 >= 5
+    day[weekend & (rng.random(unique) < 0.4)] -= 2
+    hour = rng.choice(24, unique, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    start = FIRST_DAY + (day * 86400 + hour * 3600 + rng.integers(0, 3600, unique)).astype('timedelta64[s]')
+    minutes = rng.lognormal(3.8, 1.0, unique)
+    invalid = rng.random(unique) < INVALID_DURATION_RATE
+    minutes[invalid] = rng.choice([-30.0, 0.0, 3000.0], invalid.sum())
+    end = start + (minutes * 60).astype('timedelta64[s]')
+    severity = rng.choice([1, 2, 3, 4], unique, p=[0.009, 0.797, 0.168, 0.026])
+    temperature = rng.normal(62, 19, unique).round(1)
+    lat = universe['city_lat'][city] + rng.normal(0, 0.08, unique)
+    lng = universe['city_lng'][city] + rng.normal(0, 0.08, unique)
+    daylight = np.where((hour >= 7) & (hour < 19), 'Day', 'Night').astype(object)
+
+    columns = {
+        'ID': np.char.add('A-', np.arange(first_row, first_row + unique).astype(str)),
+        'Source': np.array(SOURCES, dtype=object)[rng.choice(3, unique, p=[0.55, 0.42, 0.03])],
+        'Severity': severity,
+        'Start_Time': _timestamps(start),
+        'End_Time': _timestamps(end),
+        'Start_Lat': lat.round(6),
+        'Start_Lng': lng.round(6),
+        'End_Lat': (lat + rng.normal(0, 0.005, unique)).round(6),
+        'End_Lng': (lng + rng.normal(0, 0.005, unique)).round(6),
+        'Distance(mi)': rng.exponential(0.56, unique).round(3),
+        'Description': np.char.add('Accident on road ', rng.integers(0, 5000, unique).astype(str)),
+        'Street': np.char.add('Street ', rng.integers(0, 50000, unique).astype(str)),
+        'City': universe['city_names'][city],
+        'County': np.char.add('County ', universe['city_county'][city].astype(str)),
+        'State': universe['city_state'][city],
+        'Zipcode': np.char.zfill(rng.integers(1000, 99999, unique).astype(str), 5),
+        'Country': 'US',
+        'Timezone': np.array(TIMEZONES, dtype=object)[universe['city_timezone'][city]],
+        'Airport_Code': np.char.add('K', universe['city_airport'][city].astype(str)),
+        'Weather_Timestamp': _timestamps(start - (start.astype('int64') % 3600).astype('timedelta64[s]')),
+        'Temperature(F)': temperature,
+        'Wind_Chill(F)': (temperature - rng.exponential(3, unique)).round(1),
+        'Humidity(%)': rng.uniform(10, 100, unique).round(0),
+        'Pressure(in)': rng.normal(29.5, 1.0, unique).round(2),
+        'Visibility(mi)': np.minimum(rng.exponential(2, unique) + 3, 10).round(1),
+        'Wind_Direction': np.array(WIND_DIRECTIONS, dtype=object)[rng.integers(0, len(WIND_DIRECTIONS), unique)],
+        'Wind_Speed(mph)': rng.gamma(2.5, 3.0, unique).round(1),
+        'Precipitation(in)': (rng.exponential(0.01, unique) * (rng.random(unique) < 0.1)).round(2),
+        'Weather_Condition': universe['weather'][rng.choice(N_WEATHER, unique, p=universe['weather_weights'])],
+    }
+    for col in FLAG_COLUMNS:
+        columns[col] = rng.random(unique) < (0.15 if col in ('Crossing', 'Traffic_Signal', 'Junction') else 0.01)
+    for col in TWILIGHT_COLUMNS:
+        columns[col] = daylight
+
+    df = pd.DataFrame(columns)
+    for col, rate in NULL_RATES.items():
+        df[col] = df[col].mask(rng.random(unique) < rate)
+    # exact copies of some rows, shuffled in among the others
+    copies = df.iloc[rng.integers(0, unique, n - unique)]
+    return pd.concat([df, copies]).iloc[rng.permutation(n)].reset_index(drop=True)
+
+def generate_accidents(rows, seed=SEED, chunk_rows=CHUNK_ROWS):
+    """
+    The synthetic dataset as an iterator of raw DataFrame chunks of chunk_rows rows.
+    """
+    universe = _universe(seed)
+    for first_row in range(0, rows, chunk_rows):
+        yield generate_chunk(first_row, min(chunk_rows, rows - first_row), seed, universe)
+
+def write_synthetic_csv(rows, path=SYNTHETIC_FILE, seed=SEED):
+    """
+    Write the synthetic dataset to a CSV file shaped like US_Accidents_March23.csv.
+    Returns the path.
+    """
+    tmp_path = f'{path}.partial'
+    for i, chunk in enumerate(generate_accidents(rows, seed)):
+        chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+    os.replace(tmp_path, path)
+    return path
+
+if __name__ == "__main__":
+    # python synthetic_data.py ROWS [FILE]
+    rows = int(float(sys.argv[1])) if len(sys.argv) > 1 else 100_000
+    path = sys.argv[2] if len(sys.argv) > 2 else SYNTHETIC_FILE
+    print(f"Generating {rows:,} synthetic accident rows...")
+    write_synthetic_csv(rows, path)
+    print(f"Saved: {path}")
@@ -0,0 +1,53 @@
+import os
+import sys
+import shutil
+import pytest
+
+# The modules live at the repository root; the tests do not write a trace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PIPELINE_INSTRUMENT', '0')
+
+SYNTHETIC_ROWS = 3000
+
+@pytest.fixture(scope='session')
+def synthetic_store(tmp_path_factory):
+    """
+    One store of SYNTHETIC_ROWS synthetic accidents for the whole session, written the
+    way Milestone 1's parallel run writes it (data, ingest state, summaries, startup
+    snapshot): {'csv': raw CSV path, 'store': store directory, 'state': ingest state}.
+    Tests only read it; a test that writes into its store uses store_copy. The
+    pipeline's progress output is captured by pytest like any test output.
+    """
+    import milestone1_analysis as m1
+    import parallel_ingest
+    from accident_store import new_ingest_state, save_ingest_state, update_aggregates
+    from accident_cube import save_cube
+    from accident_stats import save_stats
+    from density_raster import save_rasters
+    from heavy_hitters import save_heavy_hitters
+    from time_rollups import save_rollups
+    from startup_snapshot import save_snapshot
+    from synthetic_data import write_synthetic_csv
+    tmp_path = tmp_path_factory.mktemp('synthetic')
+    path = str(write_synthetic_csv(SYNTHETIC_ROWS, str(tmp_path / 'synthetic.csv')))
+    store = str(tmp_path / 'store')
+    state = new_ingest_state(m1.surviving_columns(m1.profile_data(path, 1000)))
+    parallel_ingest.ingest_parallel(path, state, store, workers=1)
+    save_ingest_state(state, store)
+    update_aggregates(state['aggregates'], store, replace=True)
+    save_cube(state['cube'], store)
+    save_rasters(state['rasters'], store)
+    save_stats(state['stats'], store)
+    save_heavy_hitters(state['heavy_hitters'], store)
+    save_rollups(state['rollups'], store)
+    save_snapshot(store)
+    return {'csv': path, 'store': store, 'state': state}
+
+@pytest.fixture
+def store_copy(synthetic_store, tmp_path):
+    """
+    A copy of the synthetic store that the test may write into.
+    """
+    store = str(tmp_path / 'store')
+    shutil.copytree(synthetic_store['store'], store)
+    return store
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from accident_cube import CUBE_DIR, FILTER_DIMS, build_cube, load_cube, rollup, total
+
+def _frame(rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Start_Time': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 400 * 24, rows), unit='h'),
+        'State': rng.choice(['CA', 'TX', 'FL'], rows),
+        'Weather_Condition': rng.choice(['Fair', 'Rain', 'Snow'], rows),
+        'Severity': rng.integers(1, 5, rows),
+        'Visibility(mi)': rng.choice([10.0, 2.5, np.nan], rows),
+    })
+
+def test_cube_has_only_the_filter_dimensions():
+    base = build_cube(_frame())['base']
+    assert [col for col in base.columns if col == 'count' or not col.endswith(('_sum', '_sumsq', '_count'))] \
+        == FILTER_DIMS + ['count']
+
+def test_older_cube_is_rolled_up_when_loaded(tmp_path):
+    # a cube written with Weather_Condition as a dimension, plus a cuboid no longer kept
+    df = _frame()
+    older = df.assign(Day=pd.to_datetime(df['Start_Time']).dt.normalize())
+    older = older.assign(Day=(older['Day'] - pd.Timestamp('1970-01-01')).dt.days.astype('int32'), count=1)
+    older['Visibility(mi)_sum'] = df['Visibility(mi)'].fillna(0)
+    older['Visibility(mi)_sumsq'] = (df['Visibility(mi)'] ** 2).fillna(0)
+    older['Visibility(mi)_count'] = df['Visibility(mi)'].notna().astype('int64')
+    values = ['count', 'Visibility(mi)_sum', 'Visibility(mi)_sumsq', 'Visibility(mi)_count']
+    (tmp_path / CUBE_DIR).mkdir()
+    older.groupby(['Day', 'State', 'Weather_Condition', 'Severity'])[values].sum().reset_index() \
+        .to_parquet(tmp_path / CUBE_DIR / 'base.parquet', index=False)
+    older.groupby(['Day', 'State', 'Severity'])[['count']].sum().reset_index() \
+        .to_parquet(tmp_path / CUBE_DIR / 'hour.parquet', index=False)
+
+    cube = load_cube(str(tmp_path))
+    expected = build_cube(df)['base']
+    assert list(cube) == ['base'] and 'Weather_Condition' not in cube['base'].columns
+    assert len(cube['base']) == len(expected) and total(cube['base']) == len(df)
+    for by in (['State'], ['Month', 'Severity']):
+        pd.testing.assert_frame_equal(rollup(cube['base'], by)[values], rollup(expected, by)[values],
+                                      check_dtype=False, check_index_type=False)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from accident_stats import build_stats, merge_stats, SKETCH_BINS
+
+COLUMNS = ['Severity', 'Temperature(F)', 'Humidity(%)', 'Visibility(mi)', 'Wind_Speed(mph)']
+
+def _frame(rows=6000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Year': rng.integers(2016, 2020, rows),
+        'State': rng.choice(['CA', 'TX', 'FL'], rows),
+        'Severity': rng.integers(1, 5, rows),
+        'Temperature(F)': rng.normal(60, 20, rows),
+        'Visibility(mi)': rng.uniform(0, 10, rows),
+        'Wind_Speed(mph)': rng.gamma(2.0, 4.0, rows),
+    })
+    df['Humidity(%)'] = np.clip(80 - 0.5 * df['Temperature(F)'] + rng.normal(0, 10, rows), 0, 100)
+    # missing values in different rows per column: correlations are pairwise-complete
+    for col in COLUMNS[1:]:
+        df.loc[rng.random(rows) < 0.1, col] = np.nan
+    return df
+
+def _merged(df, chunks=4):
+    stats = None
+    for positions in np.array_split(np.arange(len(df)), chunks):
+        stats = merge_stats(stats, build_stats(df.iloc[positions]))
+    return stats
+
+def test_correlation_matches_pandas_over_merged_chunks():
+    df = _frame()
+    stats = _merged(df)
+    pd.testing.assert_frame_equal(stats.correlation(COLUMNS), df[COLUMNS].corr(), atol=1e-9)
+    view = df[df['State'].isin(['CA', 'TX']) & (df['Severity'] > 2)]
+    selected = stats.select(State=['CA', 'TX'], Severity=[3, 4])
+    pd.testing.assert_frame_equal(selected.correlation(COLUMNS), view[COLUMNS].corr(), atol=1e-9)
+    assert selected.mean('Temperature(F)') == pytest.approx(view['Temperature(F)'].mean())
+
+@pytest.mark.parametrize('col', list(SKETCH_BINS))
+def test_quantiles_within_one_bin(col):
+    df = _frame(seed=1)
+    stats = _merged(df)
+    values = df[col].dropna().to_numpy()
+    width = SKETCH_BINS[col][2]
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        exact = np.quantile(values, q, method='inverted_cdf')
+        assert abs(stats.quantile(col, q) - exact) <= width + 1e-9
+    assert stats.quantile(col, 0.5) == build_stats(df).quantile(col, 0.5)
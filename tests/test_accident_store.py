@@ -0,0 +1,25 @@
+import io
+import contextlib
+import numpy as np
+import pandas as pd
+import milestone1_analysis as m1
+from accident_store import new_ingest_state, read_store
+from synthetic_data import write_synthetic_csv
+
+def test_dtypes_inferred_per_chunk_do_not_break_the_store(tmp_path):
+    # chunk 1 (rows 0-19): 5-digit Zipcodes with a leading zero, whole-number
+    # Humidity; chunk 2: ZIP+4 codes, fractional and missing Humidity
+    path = str(tmp_path / 'drift.csv')
+    df = pd.read_csv(write_synthetic_csv(40, str(tmp_path / 'synthetic.csv')), dtype=str)
+    df['Zipcode'] = [f'0{2100 + i}' for i in range(20)] + [f'9{i:04d}-1234' for i in range(20, len(df))]
+    df['Humidity(%)'] = [str(50 + i) for i in range(20)] + [None if i % 3 else f'{i}.5' for i in range(20, len(df))]
+    df.to_csv(path, index=False)
+    store = str(tmp_path / 'store')
+    with contextlib.redirect_stdout(io.StringIO()):
+        state = new_ingest_state(m1.surviving_columns(m1.profile_data(path, 20)))
+        rows = m1.stream_clean_to_store(path, state, store, chunksize=20)
+    stored = read_store(store, columns=['ID', 'Zipcode', 'Humidity(%)']).set_index('ID').sort_index()
+    raw = df.set_index('ID').loc[stored.index]
+    assert rows == len(stored) > 20
+    assert stored['Zipcode'].tolist() == raw['Zipcode'].tolist()
+    assert np.allclose(stored['Humidity(%)'], raw['Humidity(%)'].astype(float), equal_nan=True)
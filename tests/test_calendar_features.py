@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from calendar_features import calendar_codes, add_calendar_features, day_numbers, NO_DAY, WEEKDAYS, MONTHS
+
+def _times(rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    # 1900-2040, so about half of the timestamps are before 1970
+    seconds = rng.integers(-70 * 365 * 86400, 70 * 365 * 86400, rows)
+    times = pd.Series(pd.to_datetime(seconds, unit='s'))
+    edges = pd.to_datetime(['1969-12-31 23:59:59', '1970-01-01 00:00:00', '1969-12-31 00:00:00',
+                            '1900-02-28 12:30:00', '2000-02-29 23:00:00', '1969-01-01 00:00:01'])
+    times.iloc[:len(edges)] = edges
+    times.iloc[-20:] = pd.NaT
+    return times
+
+def test_codes_match_the_dt_accessors():
+    times = _times()
+    codes = calendar_codes(times)
+    present = times.notna().to_numpy()
+    dt = times[present].dt
+    assert np.array_equal(codes['Hour'][present], dt.hour)
+    assert np.array_equal(codes['Weekday'][present], dt.dayofweek)
+    assert np.array_equal(codes['Month'][present], dt.month)
+    assert np.array_equal(codes['Year'][present], dt.year)
+    epoch_days = (times[present] - pd.Timestamp('1970-01-01')).dt.floor('D').dt.days
+    assert np.array_equal(codes['Day'][present], epoch_days)
+    assert np.array_equal(codes['Day'], day_numbers(times))
+    # missing timestamps: Day = NO_DAY, zero codes
+    assert (codes['Day'][~present] == NO_DAY).all()
+    assert all((codes[name][~present] == 0).all() for name in ('Hour', 'Weekday', 'Month', 'Year'))
+
+def test_labels_match_the_names():
+    df = add_calendar_features(pd.DataFrame({'Start_Time': _times(seed=1)}))
+    present = df['Start_Time'].notna()
+    assert (df.loc[present, 'Weekday'].astype(str) == df.loc[present, 'Start_Time'].dt.day_name()).all()
+    assert (df.loc[present, 'Month'].astype(str) == df.loc[present, 'Start_Time'].dt.month_name()).all()
+    assert df.loc[~present, ['Weekday', 'Month']].isna().all().all()
+    assert list(df['Weekday'].cat.categories) == WEEKDAYS and list(df['Month'].cat.categories) == MONTHS
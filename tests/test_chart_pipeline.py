@@ -0,0 +1,31 @@
+import os
+import pandas as pd
+from chart_pipeline import CHARTS, GRAPHS_DIR, render_charts
+
+def _inputs(hours=24):
+    return {
+        'hour_trend': pd.Series(range(1, hours + 1), index=range(hours), name='count'),
+        'severity_pie': pd.Series({2: 70, 3: 20, 4: 10}, name='count'),
+    }
+
+def _mtimes():
+    return {name: os.stat(os.path.join(GRAPHS_DIR, CHARTS[name][3])).st_mtime_ns for name in _inputs()}
+
+def test_unchanged_charts_are_not_drawn_again(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert render_charts(_inputs(), workers=2) == {'hour_trend': 'rendered', 'severity_pie': 'rendered'}
+    drawn = _mtimes()
+
+    assert render_charts(_inputs(), workers=2) == {'hour_trend': 'cached', 'severity_pie': 'cached'}
+    assert _mtimes() == drawn
+
+    # a changed input redraws that chart only
+    assert render_charts(_inputs(hours=12), workers=2) == {'hour_trend': 'rendered', 'severity_pie': 'cached'}
+    assert _mtimes()['severity_pie'] == drawn['severity_pie']
+    assert _mtimes()['hour_trend'] != drawn['hour_trend']
+
+    # so does a PNG written by something else since, and force=True redraws everything
+    path = os.path.join(GRAPHS_DIR, CHARTS['severity_pie'][3])
+    os.utime(path, ns=(drawn['severity_pie'] + 10**9, drawn['severity_pie'] + 10**9))
+    assert render_charts(_inputs(hours=12), workers=2)['severity_pie'] == 'rendered'
+    assert set(render_charts(_inputs(hours=12), workers=2, force=True).values()) == {'rendered'}
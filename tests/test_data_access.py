@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+import data_access
+from accident_store import new_ingest_state, save_ingest_state, write_store
+from data_access import load_accidents, store_fingerprint, clear_cache, cache_info
+
+def _frame(rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Year': rng.choice([2020, 2021], rows),
+        'State': rng.choice(['CA', 'TX'], rows),
+        'Severity': rng.integers(1, 5, rows),
+        'Distance(mi)': rng.random(rows),
+        'Temperature(F)': rng.random(rows),
+        'Humidity(%)': rng.random(rows),
+    })
+
+def _ingest(df, store, append=False):
+    # as Milestone 1 does: the data first, then the ingest state
+    write_store(df, store, append=append)
+    save_ingest_state(new_ingest_state(list(df.columns)), store)
+
+@pytest.fixture
+def store(tmp_path):
+    store = str(tmp_path / 'store')
+    _ingest(_frame(), store)
+    clear_cache()
+    yield store
+    clear_cache()
+
+def _counters():
+    info = cache_info()
+    return {key: info[key] for key in ('hits', 'misses', 'evictions')}
+
+def _delta(before):
+    return {key: value - before[key] for key, value in _counters().items()}
+
+def test_lru_evicts_the_least_recently_used_entry(store, monkeypatch):
+    before = _counters()
+    load_accidents(['Severity', 'Distance(mi)'], store_dir=store)
+    load_accidents(['Temperature(F)'], store_dir=store)
+    # a subset of the first entry's columns is served from it, and makes it the most recent
+    assert list(load_accidents(['Severity'], store_dir=store).columns) == ['Severity']
+    assert _delta(before) == {'hits': 1, 'misses': 2, 'evictions': 0}
+
+    # room for the two entries only: the third one evicts the Temperature entry
+    monkeypatch.setattr(data_access, 'CACHE_BUDGET_MB', cache_info()['nbytes'] / 2**20)
+    load_accidents(['Humidity(%)'], store_dir=store)
+    assert _delta(before) == {'hits': 1, 'misses': 3, 'evictions': 1}
+    assert cache_info()['entries'] == 2
+    load_accidents(['Distance(mi)'], store_dir=store)
+    assert _delta(before)['hits'] == 2
+    load_accidents(['Temperature(F)'], store_dir=store)
+    assert _delta(before)['misses'] == 4
+
+def test_memory_budget(store, monkeypatch):
+    monkeypatch.setattr(data_access, 'CACHE_BUDGET_MB', 1 / 2**20)
+    # an entry over the budget on its own is still kept, until the next one replaces it
+    df = load_accidents(['Severity'], store_dir=store)
+    assert len(df) == 2000 and cache_info()['entries'] == 1
+    load_accidents(['Temperature(F)'], store_dir=store)
+    info = cache_info()
+    assert info['entries'] == 1 and info['nbytes'] > 1
+    monkeypatch.setattr(data_access, 'CACHE_BUDGET_MB', 4096)
+    load_accidents(['Severity'], store_dir=store)
+    load_accidents(['Humidity(%)'], store_dir=store)
+    assert cache_info()['entries'] == 3
+
+def test_returned_frames_do_not_write_into_the_cache(store):
+    df = load_accidents(['Severity', 'Distance(mi)'], store_dir=store)
+    expected = df.copy()
+    df.loc[df.index[0], 'Severity'] = 99
+    df['Extra'] = 1
+    again = load_accidents(['Severity', 'Distance(mi)'], store_dir=store)
+    pd.testing.assert_frame_equal(again, expected)
+
+def test_fingerprint_changes_with_every_ingest(store):
+    first = store_fingerprint(store)
+    assert store_fingerprint(store) == first
+    assert len(load_accidents(['Severity'], store_dir=store)) == 2000
+    # caches and aggregates written next to the data are not a new version
+    with open(f'{store}/_shared.arrow', 'wb') as f:
+        f.write(b'cache')
+    assert store_fingerprint(store) == first
+
+    _ingest(_frame(500, seed=1), store, append=True)
+    appended = store_fingerprint(store)
+    assert appended != first
+    before = _counters()
+    assert len(load_accidents(['Severity'], store_dir=store)) == 2500
+    assert _delta(before)['misses'] == 1
+
+    _ingest(_frame(300, seed=2)[['Year', 'State', 'Severity']], store)
+    assert store_fingerprint(store) not in (first, appended)
+    assert len(load_accidents(['Severity'], store_dir=store)) == 300
@@ -0,0 +1,46 @@
+import io
+import gzip
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import data_export
+from query_engine import QueryEngine, filter_expression
+from data_export import export_file, write_export
+
+COLUMNS = ['Start_Time', 'State', 'City', 'Severity']
+
+def test_exports_without_matches_keep_the_header(synthetic_store):
+    engine = QueryEngine(synthetic_store['store'])
+    nothing = filter_expression(State=['no such state'])
+    for fmt, read in [('CSV', pd.read_csv), ('CSV (gzip)', lambda f: pd.read_csv(gzip.GzipFile(fileobj=f))),
+                      ('Parquet', lambda f: pq.read_table(f).to_pandas())]:
+        sink = io.BytesIO()
+        assert write_export(engine, COLUMNS, nothing, fmt, sink) == 0
+        sink.seek(0)
+        frame = read(sink)
+        assert list(frame.columns) == COLUMNS and frame.empty
+
+def test_export_limit(synthetic_store):
+    engine = QueryEngine(synthetic_store['store'])
+    sink = io.BytesIO()
+    assert write_export(engine, COLUMNS, None, 'CSV', sink, limit=150) == 150
+    sink.seek(0)
+    assert len(pd.read_csv(sink)) == 150
+
+def test_failed_export_closes_its_temporary_file(synthetic_store, monkeypatch):
+    files = []
+    temporary_file = data_export.tempfile.TemporaryFile
+    monkeypatch.setattr(data_export.tempfile, 'TemporaryFile', lambda: files.append(temporary_file()) or files[-1])
+    def fail_midway(engine, columns, filters, fmt, sink, limit=None):
+        sink.write(b'partial export')
+        raise OSError('disk full')
+    write = data_export.write_export
+    monkeypatch.setattr(data_export, 'write_export', fail_midway)
+    engine = QueryEngine(synthetic_store['store'])
+    with pytest.raises(OSError):
+        export_file(engine, COLUMNS, None, 'CSV')
+    assert len(files) == 1 and files[0].closed
+    monkeypatch.setattr(data_export, 'write_export', write)
+    tmp = export_file(engine, COLUMNS, None, 'CSV', limit=10)
+    with tmp:
+        assert len(pd.read_csv(tmp)) == 10
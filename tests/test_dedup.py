@@ -0,0 +1,99 @@
+import os
+import numpy as np
+import pandas as pd
+from dedup import FingerprintSet, row_fingerprints
+
+def _messy_csv(path):
+    """
+    Rows whose dtypes change from chunk to chunk (chunks of 10): Zipcode is int64,
+    float64 (a missing value) or text (a ZIP+4 code), Amenity bool or object (a
+    missing value); some rows are repeated in chunks of another dtype.
+    """
+    df = pd.DataFrame({
+        'ID': [f'A-{i}' for i in range(60)],
+        'Zipcode': [str(10000 + i) for i in range(60)],
+        'Amenity': [i % 3 == 0 for i in range(60)],
+        'Street': [f'Street {i % 7}' for i in range(60)],
+    }).astype(object)
+    df.loc[25, 'Zipcode'] = None
+    df.loc[41, 'Zipcode'] = '12345-6789'
+    df.loc[52, 'Amenity'] = None
+    for source, target in [(3, 28), (5, 44), (12, 55), (27, 38), (14, 17)]:
+        df.loc[target] = df.loc[source]
+    df.to_csv(path, index=False)
+
+def test_streaming_dedup_matches_drop_duplicates(tmp_path):
+    path = tmp_path / 'messy.csv'
+    _messy_csv(path)
+    expected = pd.read_csv(path).drop_duplicates()['ID'].tolist()
+
+    seen = FingerprintSet()
+    kept = []
+    for chunk in pd.read_csv(path, chunksize=10):
+        kept += chunk['ID'][seen.add_unique(row_fingerprints(chunk))].tolist()
+    assert kept == expected
+    assert len(kept) == 55
+
+def test_fingerprints_ignore_inferred_dtypes():
+    as_ints = pd.DataFrame({'Zipcode': [10001], 'Amenity': [True], 'City': ['Dayton']})
+    as_floats = pd.DataFrame({'Zipcode': [10001.0, np.nan], 'Amenity': [True, np.nan], 'City': ['Dayton', 'X']})
+    as_text = pd.DataFrame({'Zipcode': ['10001', '10001-2'], 'Amenity': [True, False],
+                            'City': pd.Series(['Dayton', 'X'], dtype='category')})
+    fingerprints = [row_fingerprints(df)[0] for df in (as_ints, as_floats, as_text)]
+    assert len(set(fingerprints)) == 1
+    assert row_fingerprints(as_floats)[1] != row_fingerprints(as_text)[1]
+
+def test_zero_padded_codes_stay_distinct(tmp_path):
+    # every chunk has a letter code, so the column is text throughout, as in drop_duplicates
+    codes = ['007', '7', '07', 'A7', '1.0', '1', '1.50', 'B1', '1.5', ' 7', '+7', 'C7', '7', '007', '1.5', 'A7']
+    path = tmp_path / 'codes.csv'
+    pd.DataFrame({'ID': 'A-1', 'Code': codes}).to_csv(path, index=False)
+    expected = pd.read_csv(path).drop_duplicates()['Code'].tolist()
+    assert len(expected) == 12
+
+    seen = FingerprintSet()
+    kept = []
+    for chunk in pd.read_csv(path, chunksize=4):
+        kept += chunk['Code'][seen.add_unique(row_fingerprints(chunk))].tolist()
+    assert kept == expected
+    # the same codes as Python objects (a column left as object by missing values)
+    as_objects = pd.DataFrame({'Code': pd.Series(codes[:12] + [None, True], dtype=object)})
+    assert len(set(row_fingerprints(as_objects))) == 14
+
+def test_small_chunk_streaming_clean_matches_in_memory(synthetic_store):
+    import milestone1_analysis as m1
+    from accident_store import new_ingest_state
+    path = synthetic_store['csv']
+    df = m1.load_data(path)
+    expected = m1.clean_and_preprocess(df, m1.explore_data(df))
+    state = new_ingest_state(m1.surviving_columns(m1.profile_data(path, 500)))
+    streamed = pd.concat(m1.clean_and_preprocess_streaming(path, state, 500))
+    assert sorted(streamed['ID']) == sorted(expected['ID'])
+
+def test_saved_set_stays_in_sorted_runs(tmp_path, monkeypatch):
+    import dedup
+    monkeypatch.setattr(dedup, 'MAX_SAVED_RUNS', 3)
+    rng = np.random.default_rng(0)
+    batches = [rng.integers(0, 2**63, 1000, dtype='uint64') for _ in range(6)]
+    index = str(tmp_path / 'index')
+    seen = FingerprintSet(memory_limit_mb=999 * 8 / 2**20)  # a run per batch
+    for batch in batches[:4]:
+        seen.add_unique(batch)
+    seen.save(index)
+    runs = sorted(os.listdir(index))
+    assert len(runs) == 3 and all(name.startswith('run-') for name in runs)
+
+    # a later run adds its own runs next to the saved ones, which are not rewritten
+    loaded = FingerprintSet.load(index)
+    assert len(loaded) == 4000 and loaded.contains(np.concatenate(batches[:4])).all()
+    later = FingerprintSet(runs=loaded.runs, memory_limit_mb=999 * 8 / 2**20)
+    assert not later.add_unique(batches[1]).any()
+    later.add_unique(batches[4])
+    later.add_unique(batches[5][:10])
+    largest = max(runs, key=lambda name: os.path.getsize(os.path.join(index, name)))
+    later.save(index)
+    assert len(os.listdir(index)) == 3 and largest in os.listdir(index)
+    reloaded = FingerprintSet.load(index)
+    assert len(reloaded) == 5010
+    assert reloaded.contains(np.concatenate(batches[:5] + [batches[5][:10]])).all()
+    assert not reloaded.contains(batches[5][10:]).any()
@@ -0,0 +1,30 @@
+import os
+import numpy as np
+import density_raster
+from accident_store import read_store
+from density_raster import filtered_raster, prebuilt_raster, CACHE_DIR
+from query_engine import QueryEngine, filter_expression
+
+def test_prebuilt_views_match_rebinned_rows(synthetic_store):
+    store = synthetic_store['store']
+    engine = QueryEngine(store)
+    states = list(read_store(store, columns=['State'])['State'].astype(str).unique()[:2])
+    for view in [{}, {'State': states}, {'Severity': [2, 3]}, {'State': states, 'Severity': [4]}]:
+        expected = filtered_raster(engine, filter_expression(**view), 1)
+        grid = prebuilt_raster(1, store, view.get('State'), view.get('Severity'))
+        assert np.array_equal(grid, expected)
+    assert prebuilt_raster(2, store, states) is None  # per-State cells are kept at STATE_ZOOM only
+
+def test_disk_cache_is_bounded(store_copy, monkeypatch):
+    store = store_copy
+    engine = QueryEngine(store)
+    grid_mb = density_raster.empty_grid(0).nbytes / 2**20
+    monkeypatch.setattr(density_raster, 'CACHE_MAX_MB', grid_mb * 2.5)
+    for i in range(5):
+        filtered_raster(engine, filter_expression(Severity=[i % 4 + 1]), 0, cache_key=f'view{i}')
+    assert len(os.listdir(os.path.join(store, CACHE_DIR))) == 2
+
+def test_engine_without_store_is_not_cached(synthetic_store):
+    df = read_store(synthetic_store['store'], columns=['Start_Lat', 'Start_Lng', 'Severity'])
+    grid = filtered_raster(QueryEngine.from_frame(df), None, 0, cache_key='anything')
+    assert grid.sum() > 0
@@ -0,0 +1,42 @@
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+from figure_cache import FigureCache
+
+def _draw(calls, n):
+    def draw():
+        calls.append(n)
+        fig, ax = plt.subplots(figsize=(2, 2))
+        ax.bar(range(n), range(1, n + 1))
+        return fig
+    return draw
+
+def test_lru_order_budget_and_counters():
+    calls = []
+    sizes = {n: len(FigureCache().render('bars', _draw([], n), n)) for n in (1, 2, 3)}
+    # room for the charts of n=1 and n=2, not for a third
+    cache = FigureCache(budget_mb=(sizes[1] + sizes[2]) / 2**20)
+    first = cache.render('bars', _draw(calls, 1), 1)
+    cache.render('bars', _draw(calls, 2), 2)
+    assert cache.render('bars', _draw(calls, 1), 1) == first  # a hit: n=1 is now the most recent
+    assert calls == [1, 2]
+
+    cache.render('bars', _draw(calls, 3), 3)  # evicts n=2, the least recently used
+    info = cache.info()
+    assert calls == [1, 2, 3]
+    assert info['nbytes'] <= cache.budget and info['entries'] == 2
+    assert (info['hits'], info['misses'], info['evictions']) == (1, 3, 1)
+
+    cache.render('bars', _draw(calls, 1), 1)
+    cache.render('bars', _draw(calls, 2), 2)
+    assert calls == [1, 2, 3, 2]
+    assert cache.chart_info().loc['bars', ['hits', 'misses']].tolist() == [2, 4]
+
+def test_image_over_budget_is_kept_alone():
+    cache = FigureCache(budget_mb=0)
+    cache.render('a', _draw([], 1), 1)
+    cache.render('b', _draw([], 2), 2)
+    info = cache.info()
+    assert info['entries'] == 1 and info['evictions'] == 1
+    assert isinstance(cache.chart_info(), pd.DataFrame) and set(cache.chart_info().index) == {'a', 'b'}
@@ -0,0 +1,68 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from accident_cube import build_cube, cube_indexes, scan_cube, total, rollup
+from filter_engine import FilterIndex
+from query_engine import QueryEngine, filter_expression
+
+def _frame(rows=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Start_Time': pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365 * 24, rows), unit='h'),
+        'State': rng.choice(['CA', 'TX', 'FL', 'NY', 'OH'], rows, p=[0.4, 0.3, 0.2, 0.09, 0.01]),
+        # 'Hail' is rare (the row-id path of value_mask), the others common (the code lookup)
+        'Weather_Condition': rng.choice(['Fair', 'Rain', 'Cloudy', 'Hail', None], rows,
+                                        p=[0.5, 0.2, 0.2, 0.005, 0.095]),
+        'Severity': rng.integers(1, 5, rows),
+    })
+    df.loc[rng.random(rows) < 0.01, 'Start_Time'] = pd.NaT
+    return df
+
+def _expected(df, date_range=None, **selected):
+    mask = pd.Series(True, index=df.index)
+    if date_range is not None:
+        days = df['Start_Time'].dt.normalize()
+        mask &= days.between(pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]))
+    for col, values in selected.items():
+        if values:
+            mask &= df[col].isin(values)
+    return mask.to_numpy()
+
+D = datetime.date
+SELECTIONS = [
+    {},
+    {'date_range': (D(2020, 3, 1), D(2020, 3, 1))},
+    {'date_range': (D(2019, 6, 15), D(2020, 8, 31)), 'State': ['CA', 'OH'], 'Severity': [3, 4]},
+    {'date_range': (D(2015, 1, 1), D(2030, 1, 1)), 'Weather_Condition': ['Hail']},
+    {'Weather_Condition': ['Fair', 'Rain', 'Cloudy'], 'State': ['TX', 'no such state']},
+    {'State': [], 'Weather_Condition': [], 'Severity': []},   # empty selections: no filter
+    {'State': ['no such state']},                              # nothing matches
+    {'date_range': (D(2010, 1, 1), D(2010, 12, 31))},          # before the data
+    {'date_range': (D(2020, 5, 1), D(2020, 4, 1))},            # end before start
+]
+
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_rows_match_a_pandas_mask(selection):
+    df = _frame()
+    view = FilterIndex(df).select(**selection)
+    expected = _expected(df, **selection)
+    assert np.array_equal(view.mask, expected)
+    assert len(view) == expected.sum() and view.empty == (not expected.any())
+    assert view['State'].index.equals(df.index[expected])
+
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_cube_counts_match_a_pandas_mask(selection):
+    df = _frame().dropna(subset=['Weather_Condition'])  # as cleaned (a key column)
+    if selection.get('Weather_Condition'):
+        # not a cube dimension: the cube of the matching rows comes from the query engine
+        engine = QueryEngine.from_frame(df.assign(Year=df['Start_Time'].dt.year))
+        cube = scan_cube(engine, filter_expression(**selection))['base']
+    else:
+        selected = {col: values for col, values in selection.items() if col != 'Weather_Condition'}
+        cube = cube_indexes(build_cube(df))['base'].select(**selected).to_frame()
+    matching = df[_expected(df, **selection)]
+    assert total(cube) == len(matching)
+    if len(matching):
+        counts = rollup(cube, ['State'])['count']
+        assert counts.to_dict() == matching['State'].value_counts().to_dict()
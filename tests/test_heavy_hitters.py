@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from heavy_hitters import build_heavy_hitters, merge_heavy_hitters, top_k
+
+def _frame(rows=8000, cities=300, seed=0):
+    rng = np.random.default_rng(seed)
+    # Zipf-like city frequencies: a few heavy hitters and a long tail
+    weights = 1 / np.arange(1, cities + 1)
+    return pd.DataFrame({
+        'Year': rng.integers(2018, 2021, rows),
+        'State': rng.choice(['CA', 'TX'], rows),
+        'City': rng.choice([f'City{i}' for i in range(cities)], rows, p=weights / weights.sum()),
+        'Weather_Condition': rng.choice(['Fair', 'Rain', 'Snow', 'Fog'], rows),
+    })
+
+def _merged(df, k, chunks=5):
+    summaries = None
+    for positions in np.array_split(np.arange(len(df)), chunks):
+        summaries = merge_heavy_hitters(summaries, build_heavy_hitters(df.iloc[positions], k), k)
+    return summaries
+
+def test_merge_keeps_the_error_bounds():
+    df = _frame()
+    table = _merged(df, k=8)['City']
+    true = df.groupby(['Year', 'State', 'City']).size()
+    for (year, state), group in table.groupby(['Year', 'State']):
+        counts = true.loc[(year, state)]
+        kept = counts.reindex(group['item']).fillna(0).to_numpy()
+        assert (group['count'].to_numpy() - group['error'].to_numpy() <= kept).all()
+        assert (kept <= group['count'].to_numpy()).all()
+        assert (counts.drop(group['item'], errors='ignore') <= group['floor'].iloc[0]).all()
+
+    items = top_k(table, n=5, State=['CA'])
+    counts = df[df['State'] == 'CA']['City'].value_counts()
+    assert ((items['lower'] <= counts[items.index]) & (counts[items.index] <= items['count'])).all()
+    assert (counts.drop(items.index) <= items.attrs['unlisted']).all()
+
+def test_top_k_is_exact_below_capacity():
+    df = _frame(cities=20)
+    for summaries in (build_heavy_hitters(df, k=64), _merged(df, k=64)):
+        for col in ('City', 'Weather_Condition'):
+            items = top_k(summaries[col], n=100, Year=[2019, 2020])
+            expected = df[df['Year'] >= 2019][col].value_counts()
+            assert (items['error'] == 0).all() and items.attrs['floor'] == 0
+            assert items['count'].to_dict() == expected.to_dict()
@@ -0,0 +1,87 @@
+import shutil
+import pandas as pd
+import milestone1_analysis as m1
+from accident_store import new_ingest_state, save_ingest_state, load_ingest_state, update_aggregates, \
+    read_store, write_store
+
+KEY = ['Start_Time', 'Start_Lat', 'Start_Lng', 'Severity']
+
+def _dumps(tmp_path, synthetic_store, with_ids=True):
+    """
+    The first 2000 rows of the synthetic CSV as the first monthly dump, all of them as
+    the next one (so with IDs, the next dump is the CSV of the synthetic store).
+    Without IDs, in Start_Time order, five rows around the cut share one Start_Time.
+    """
+    df = pd.read_csv(synthetic_store['csv'])
+    if not with_ids:
+        df = df.drop(columns='ID').sort_values('Start_Time', kind='stable', ignore_index=True)
+        shared = pd.Timestamp(df.loc[1999, 'Start_Time'])
+        df.loc[1997:2001, 'Start_Time'] = str(shared)
+        df.loc[1997:2001, 'End_Time'] = str(shared + pd.Timedelta(minutes=30))
+    old, new = str(tmp_path / 'old.csv'), str(tmp_path / 'new.csv')
+    df.iloc[:2000].to_csv(old, index=False)
+    df.to_csv(new, index=False)
+    return old, new
+
+def _stream_ingest(path, store):
+    state = new_ingest_state(m1.surviving_columns(m1.profile_data(path, 700)))
+    m1.stream_clean_to_store(path, state, store, 700)
+    save_ingest_state(state, store)
+    update_aggregates(state['aggregates'], store, replace=True)
+
+def _rows(store):
+    return read_store(store, columns=KEY).sort_values(KEY, ignore_index=True)
+
+def _ids(store):
+    return sorted(read_store(store, columns=['ID'])['ID'])
+
+def test_incremental_picks_up_new_rows_once(tmp_path, synthetic_store):
+    old, new = _dumps(tmp_path, synthetic_store)
+    _stream_ingest(old, str(tmp_path / 'store'))
+    added = m1.run_incremental(new, str(tmp_path / 'store'))
+    again = m1.run_incremental(new, str(tmp_path / 'store'))
+    stored = read_store(str(tmp_path / 'store'), columns=['ID'])
+    assert added > 0 and again == 0
+    assert not stored['ID'].duplicated().any()
+    assert sorted(stored['ID']) == _ids(synthetic_store['store'])
+
+def test_watermark_keeps_new_rows_at_the_same_time(tmp_path, synthetic_store):
+    old, new = _dumps(tmp_path, synthetic_store, with_ids=False)
+    _stream_ingest(new, str(tmp_path / 'expected'))
+    _stream_ingest(old, str(tmp_path / 'store'))
+    watermark = load_ingest_state(str(tmp_path / 'store'))['watermark']
+    m1.run_incremental(new, str(tmp_path / 'store'))
+    assert m1.run_incremental(new, str(tmp_path / 'store')) == 0
+    assert isinstance(watermark, pd.Timestamp)
+    stored = _rows(str(tmp_path / 'store'))
+    assert (stored['Start_Time'] == watermark).sum() == 5
+    pd.testing.assert_frame_equal(stored, _rows(str(tmp_path / 'expected')), check_categorical=False)
+
+def test_unsorted_rows_without_ids(tmp_path, synthetic_store, monkeypatch):
+    # rows out of Start_Time order, in chunks smaller than the file: every row of a
+    # run is compared with the previous run's watermark, not with earlier chunks
+    old, new = _dumps(tmp_path, synthetic_store, with_ids=False)
+    shuffled_old, shuffled_new = str(tmp_path / 'shuffled_old.csv'), str(tmp_path / 'shuffled_new.csv')
+    pd.read_csv(old).sample(frac=1, random_state=0).to_csv(shuffled_old, index=False)
+    pd.read_csv(new).sample(frac=1, random_state=1).to_csv(shuffled_new, index=False)
+    monkeypatch.setattr(m1, 'chunksize_for_memory', lambda *args, **kwargs: 300)
+    _stream_ingest(new, str(tmp_path / 'expected'))
+    _stream_ingest(shuffled_old, str(tmp_path / 'first'))
+    _stream_ingest(old, str(tmp_path / 'store'))
+    shutil.copytree(str(tmp_path / 'store'), str(tmp_path / 'store_before'))
+    m1.run_incremental(shuffled_new, str(tmp_path / 'store'))
+    # a full run keeps every row, an incremental one every row after the watermark
+    pd.testing.assert_frame_equal(_rows(str(tmp_path / 'first')), _rows(str(tmp_path / 'store_before')),
+                                  check_categorical=False)
+    pd.testing.assert_frame_equal(_rows(str(tmp_path / 'store')), _rows(str(tmp_path / 'expected')),
+                                  check_categorical=False)
+
+def test_incremental_after_in_memory_run(tmp_path, synthetic_store):
+    old, new = _dumps(tmp_path, synthetic_store)
+    store = str(tmp_path / 'store')
+    df = m1.load_data(old)
+    missing = m1.explore_data(df)
+    write_store(m1.clean_and_preprocess(df, missing), store)
+    save_ingest_state(m1.ingest_state_of(df, missing), store)
+    assert m1.run_incremental(new, store) > 0
+    assert _ids(store) == _ids(synthetic_store['store'])
@@ -0,0 +1,48 @@
+import json
+import pytest
+import instrumentation
+from instrumentation import configure, stage, print_summary
+
+@pytest.fixture(autouse=True)
+def restore_settings(monkeypatch):
+    for name in ('INSTRUMENT', 'SAMPLE_MEMORY', 'TRACE_FILE'):
+        monkeypatch.setattr(instrumentation, name, getattr(instrumentation, name))
+
+def test_trace_is_bounded_and_rotated(tmp_path, monkeypatch):
+    trace = str(tmp_path / 'trace.jsonl')
+    monkeypatch.setattr(instrumentation, 'TRACE_MAX_MB', 2 / 1024)  # 2 KB
+    monkeypatch.setattr(instrumentation, '_records', instrumentation.deque(maxlen=5))
+    configure(enabled=True, sample_memory=False, trace_file=trace)
+    for i in range(50):
+        with stage(f'step{i % 3}'):
+            pass
+    assert len(instrumentation._records) == 5
+    with open(trace) as f:
+        lines = [json.loads(line) for line in f]
+    assert 0 < len(lines) < 50 and lines[-1]['stage'] == 'step1'
+    assert (tmp_path / 'trace.jsonl.1').stat().st_size > 2048
+    print_summary()
+    assert len(instrumentation._records) == 0
+
+def test_disabled_stages_record_nothing(tmp_path):
+    configure(enabled=False, trace_file=str(tmp_path / 'trace.jsonl'))
+    with stage('off'):
+        pass
+    assert not (tmp_path / 'trace.jsonl').exists()
+
+def test_memory_is_sampled_for_top_level_stages(tmp_path, monkeypatch):
+    intervals = {}
+    class Recorder(instrumentation.PeakMemory):
+        def __init__(self, interval=None):
+            super().__init__(interval)
+            intervals[len(intervals)] = interval
+    monkeypatch.setattr(instrumentation, 'PeakMemory', Recorder)
+    configure(enabled=True, sample_memory='top', trace_file='')
+    with stage('outer'):
+        with stage('chunk'):
+            pass
+    assert intervals == {0: instrumentation.SAMPLE_INTERVAL, 1: None}
+    configure(sample_memory=False)
+    with stage('outer'):
+        pass
+    assert intervals[2] is None
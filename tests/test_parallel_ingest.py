@@ -0,0 +1,48 @@
+import os
+import pandas as pd
+import pytest
+import milestone1_analysis as m1
+import parallel_ingest
+from accident_store import new_ingest_state, read_store
+
+def test_parallel_ingest_matches_sequential(tmp_path, synthetic_store):
+    path = synthetic_store['csv']
+    columns = m1.surviving_columns(m1.profile_data(path, 1000))
+    sequential = new_ingest_state(columns)
+    expected = pd.concat(m1.clean_and_preprocess_streaming(path, sequential, 1000))
+    # several ranges, each inferring its own dtypes
+    state = new_ingest_state(columns)
+    range_mb = os.path.getsize(path) / 7 / 2**20
+    rows = parallel_ingest.ingest_parallel(path, state, str(tmp_path / 'store'), workers=2, range_mb=range_mb)
+
+    stored = read_store(str(tmp_path / 'store'), columns=['ID'])
+    assert rows == len(expected) == len(stored)
+    assert sorted(stored['ID']) == sorted(expected['ID'])
+    assert state['aggregates']['duplicates_removed'] == sequential['aggregates']['duplicates_removed']
+    assert state['aggregates']['invalid_durations'] == sequential['aggregates']['invalid_durations']
+    assert state['cube']['base']['count'].sum() == len(expected)
+
+def test_rows_sharing_an_id_are_not_duplicates(tmp_path, synthetic_store):
+    path = str(tmp_path / 'shared_ids.csv')
+    df = pd.read_csv(synthetic_store['csv'])
+    # in the last range: an exact copy of row 1, and a different accident reusing its ID
+    df.loc[len(df) - 2] = df.loc[1]
+    df.loc[len(df) - 1, 'ID'] = df.loc[1, 'ID']
+    df.to_csv(path, index=False)
+    columns = m1.surviving_columns(m1.profile_data(path, 1000))
+    expected = pd.concat(m1.clean_and_preprocess_streaming(path, new_ingest_state(columns), 1000))
+    range_mb = os.path.getsize(path) / 4 / 2**20
+    rows = parallel_ingest.ingest_parallel(path, new_ingest_state(columns), str(tmp_path / 'store'),
+                                           workers=2, range_mb=range_mb)
+    stored = read_store(str(tmp_path / 'store'), columns=['ID', 'Start_Time'])
+    assert rows == len(expected) == len(stored)
+    assert sorted(zip(stored['ID'], stored['Start_Time'])) == sorted(zip(expected['ID'], expected['Start_Time']))
+
+def test_parallel_ingest_needs_ids(tmp_path, synthetic_store):
+    path = synthetic_store['csv']
+    os.makedirs(tmp_path / 'store')
+    (tmp_path / 'store' / 'kept').write_text('')
+    columns = [col for col in synthetic_store['state']['columns'] if col != 'ID']
+    with pytest.raises(ValueError):
+        parallel_ingest.ingest_parallel(path, new_ingest_state(columns), str(tmp_path / 'store'), workers=1)
+    assert os.path.exists(tmp_path / 'store' / 'kept')  # the store is left alone
@@ -0,0 +1,57 @@
+import io
+import contextlib
+import numpy as np
+import pandas as pd
+import pytest
+import milestone1_analysis as m1
+from synthetic_data import write_synthetic_csv
+
+SKETCH_SIZE = 256
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('profile')
+    df = pd.read_csv(write_synthetic_csv(3000, str(tmp_path / 'synthetic.csv')), dtype=str)
+    # on the 40% threshold exactly (kept), and one row over it (dropped)
+    df['Wind_Chill(F)'] = [None] * 1200 + ['30.0'] * (len(df) - 1200)
+    df['Precipitation(in)'] = [None] * 1201 + ['0.1'] * (len(df) - 1201)
+    path = str(tmp_path / 'dataset.csv')
+    df.to_csv(path, index=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return path, m1.load_data(path), m1.profile_data(path, 500, SKETCH_SIZE)
+
+def test_distinct_estimates_within_the_sketch_error(dataset):
+    _, df, profile = dataset
+    estimates = profile['columns']['distinct_estimate']
+    exact = df.nunique()
+    # KMV relative standard error is 1/sqrt(k - 2); allow three of them
+    bound = 3 / np.sqrt(SKETCH_SIZE - 2)
+    for col in df.columns:
+        if exact[col] < SKETCH_SIZE:
+            assert estimates[col] == exact[col], col
+        else:
+            assert abs(estimates[col] - exact[col]) <= bound * exact[col], col
+    assert (exact >= SKETCH_SIZE).sum() > 5
+
+def test_surviving_columns_match_the_in_memory_drop(dataset):
+    _, df, profile = dataset
+    with contextlib.redirect_stdout(io.StringIO()):
+        kept = m1.surviving_columns(profile)
+    cols_to_drop = m1.columns_to_drop(df.isnull().sum(), len(df))
+    assert profile['rows'] == len(df)
+    # (in the profile's column order; they are read as usecols)
+    assert set(kept) == set(df.columns) - set(cols_to_drop) and len(kept) == len(set(kept))
+    assert {'End_Lat', 'Precipitation(in)'} <= set(cols_to_drop) and 'Wind_Chill(F)' in kept
+
+def test_merged_partial_profiles_match_one_pass(dataset):
+    # the parallel profile merges per-range partials: same profile as one pass
+    path, _, profile = dataset
+    partials = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for chunk in m1.load_data(path, 500):
+            partials.append(m1.update_profile(m1.new_profile(), chunk, SKETCH_SIZE))
+    merged = partials[0]
+    for partial in partials[1:]:
+        m1.merge_profiles(merged, partial, SKETCH_SIZE)
+    merged = m1.finish_profile(merged, SKETCH_SIZE)
+    pd.testing.assert_frame_equal(merged['columns'], profile['columns'])
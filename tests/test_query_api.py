@@ -0,0 +1,133 @@
+import io
+import json
+import shutil
+import threading
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+import pandas as pd
+import pytest
+from accident_store import read_store
+from accident_cube import build_cube, save_cube
+from query_api import CORRELATION_COLUMNS, MAX_TOP_N, normalize_query, QueryService, PooledHTTPServer, \
+    QueryHandler
+
+@pytest.mark.parametrize('n', ['0', '-5', str(MAX_TOP_N + 1), '10000000000', 'ten'])
+def test_top_rejects_bad_n(n):
+    with pytest.raises(ValueError):
+        normalize_query('/top', {'n': [n]})
+
+def test_top_n_in_range():
+    assert dict(normalize_query('/top', {'n': [str(MAX_TOP_N)]}))['n'] == MAX_TOP_N
+    assert dict(normalize_query('/top', {}))['n'] == 10
+
+def test_correlation_rejects_unknown_columns():
+    with pytest.raises(ValueError, match='Visibility'):
+        normalize_query('/correlation', {'columns': ['Severity,Foo']})
+    assert dict(normalize_query('/correlation', {'columns': ['Severity']}))['columns'] == ('Severity',)
+
+def test_trends_rejects_bad_window():
+    with pytest.raises(ValueError):
+        normalize_query('/trends', {'window': ['0']})
+
+@pytest.fixture(scope='module')
+def api(synthetic_store, tmp_path_factory):
+    # the service writes its shared dataset file into the store: serve a copy
+    store = str(tmp_path_factory.mktemp('api') / 'store')
+    shutil.copytree(synthetic_store['store'], store)
+    server = PooledHTTPServer(('127.0.0.1', 0), QueryHandler, QueryService(store), workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}', read_store(store)
+    server.shutdown()
+    server.server_close()
+
+def _get(url, etag=None):
+    request = Request(url)
+    if etag is not None:
+        request.add_header('If-None-Match', etag)
+    try:
+        with urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except HTTPError as exc:
+        with exc:
+            return exc.code, exc.headers, exc.read()
+
+def test_kpis_and_top_match_the_rows(api):
+    base, rows = api
+    status, _, body = _get(base + '/kpis')
+    kpis = json.loads(body)
+    assert status == 200 and kpis['total'] == len(rows)
+    cities = rows['City'].astype(str).value_counts()
+    assert cities[kpis['top_city']] == cities.max()
+    assert kpis['avg_severity'] == pytest.approx(rows['Severity'].mean())
+
+    states = sorted(rows['State'].astype(str).unique()[:2])
+    status, _, body = _get(base + f'/top?dim=City&n=5&state={",".join(states)}')
+    matching = rows[rows['State'].astype(str).isin(states)]
+    expected = matching['City'].astype(str).value_counts()
+    items = json.loads(body)['items']
+    assert status == 200 and len(items) == 5
+    assert [item['count'] for item in items] == expected.head(5).tolist()
+    assert all(expected[item['value']] == item['count'] for item in items)
+
+def test_weather_filter_and_hour_are_counted_from_the_rows(api):
+    # neither is a cube dimension: the query engine answers them exactly
+    base, rows = api
+    weather = rows['Weather_Condition'].astype(str).value_counts().index[:2].tolist()
+    matching = rows[rows['Weather_Condition'].astype(str).isin(weather)]
+    status, _, body = _get(base + f'/kpis?weather={quote(",".join(weather))}')
+    kpis = json.loads(body)
+    assert status == 200 and kpis['total'] == len(matching)
+    assert kpis['avg_severity'] == pytest.approx(matching['Severity'].mean())
+    status, _, body = _get(base + f'/histogram?dim=Hour&weather={quote(",".join(weather))}')
+    expected = matching['Hour'].value_counts().sort_index()
+    histogram = json.loads(body)
+    assert status == 200 and histogram['labels'] == expected.index.tolist()
+    assert histogram['counts'] == expected.tolist()
+
+def test_etag_and_not_modified(api):
+    base, _ = api
+    status, headers, body = _get(base + '/histogram?dim=Hour&severity=2,3')
+    etag = headers['ETag']
+    assert status == 200 and etag and sum(json.loads(body)['counts']) > 0
+    # the same query spelled differently has the same ETag, and a matching If-None-Match gets 304
+    status, headers, body = _get(base + '/histogram?severity=3&severity=2&dim=Hour', etag)
+    assert status == 304 and body == b'' and headers['ETag'] == etag
+    status, _, _ = _get(base + '/histogram?dim=Hour&severity=2,3', '"stale"')
+    assert status == 200
+
+def test_bounded_parameters_are_rejected(api):
+    base, _ = api
+    for query in [f'/top?n={MAX_TOP_N + 1}', '/top?n=0', '/top?dim=Start_Lat', '/trends?window=0',
+                  '/export?format=xlsx', '/export?columns=State,no_such_column', '/kpis?limit=5']:
+        status, _, body = _get(base + query)
+        assert status == 400 and 'error' in json.loads(body)
+    status, _, body = _get(base + f'/top?dim=State&n={MAX_TOP_N}')
+    assert status == 200 and len(json.loads(body)['items']) <= MAX_TOP_N
+
+def test_export_returns_the_matching_rows(api):
+    base, rows = api
+    state = str(rows['State'].astype(str).iloc[0])
+    status, headers, body = _get(base + f'/export?format=csv&columns=State,Severity&state={state}')
+    assert status == 200 and headers['Content-Length'] == str(len(body))
+    exported = pd.read_csv(io.BytesIO(body))
+    assert list(exported.columns) == ['State', 'Severity']
+    assert len(exported) == int((rows['State'].astype(str) == state).sum())
+    assert (exported['State'] == state).all()
+
+def test_unknown_correlation_column_is_a_bad_request(api):
+    base, _ = api
+    status, _, body = _get(base + '/correlation?columns=Foo')
+    error = json.loads(body)['error']
+    assert status == 400 and 'Foo' in error and all(col in error for col in CORRELATION_COLUMNS)
+
+def test_empty_cube_gives_empty_results(store_copy):
+    save_cube(build_cube(read_store(store_copy).iloc[:0]), store_copy)
+    service = QueryService(store_copy)
+    status, body, _ = service.respond('/kpis', {'start': ['2020-01-01']})
+    assert status == 200 and json.loads(body)['total'] == 0
+    status, body, _ = service.respond('/histogram', {'dim': ['Weekday']})
+    assert status == 200 and sum(json.loads(body)['counts']) == 0
+    status, body, _ = service.respond('/top', {'dim': ['State']})
+    assert status == 200 and json.loads(body)['items'] == []
+    assert service.respond('/correlation', {})[0] == 200
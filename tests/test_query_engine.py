@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import query_engine
+from query_engine import QueryEngine, filter_expression
+
+def _frame(rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Year': rng.integers(2016, 2024, rows).astype('int16'),
+        'State': rng.choice(['CA', 'TX', 'FL'], rows),
+        'City': pd.Series(rng.choice([f'City{i}' for i in range(40)] + [None], rows), dtype='category'),
+    })
+
+def test_group_counts_match_pandas(monkeypatch):
+    df = _frame()
+    monkeypatch.setattr(query_engine, 'BATCH_SIZE', 300)  # several batches, summed along the way
+    counts = QueryEngine.from_frame(df).group_counts(['Year', 'State', 'City'], filter_expression(State=['CA', 'TX']))
+    expected = df[df['State'].isin(['CA', 'TX'])].groupby(['Year', 'State', 'City'], observed=True).size()
+    counts = counts.astype({'City': object}).set_index(['Year', 'State', 'City'])['count'].sort_index()
+    assert counts.to_dict() == expected.rename(index=str, level='City').sort_index().to_dict()
+
+def test_top_values_break_ties_by_value():
+    df = pd.DataFrame({'City': ['b', 'a', 'c', 'c', 'b', 'a', 'd']})
+    top = QueryEngine.from_frame(df).top_values('City', n=3)
+    assert list(top.index) == ['a', 'b', 'c'] and list(top) == [2, 2, 2]
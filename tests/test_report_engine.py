@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from accident_store import read_store
+from report_engine import metrics_from_cube, metrics_from_frame, row_counts, variant_metrics
+
+@pytest.fixture(scope='module')
+def report(synthetic_store):
+    store = synthetic_store['store']
+    df = read_store(store).astype({'State': object, 'City': object, 'Weather_Condition': object})
+    return synthetic_store['state']['cube'], row_counts(store), df
+
+def _baseline(df):
+    # the metrics as the original generate_insights computed them on the cleaned frame
+    return {
+        'total_accidents': len(df),
+        'top_city': df['City'].mode()[0],
+        'top_city_count': df['City'].value_counts().iloc[0],
+        'peak_hour': int(df['Hour'].mode()[0]),
+        'common_weather': df['Weather_Condition'].mode()[0],
+        'severe_pct': len(df[df['Severity'] >= 3]) / len(df) * 100,
+        'severity_counts': df['Severity'].value_counts(),
+    }
+
+def _assert_same(metrics, expected):
+    for key, value in expected.items():
+        if key == 'severity_counts':
+            assert metrics[key].sort_index().to_dict() == value.sort_index().to_dict()
+        elif key == 'severe_pct':
+            assert metrics[key] == pytest.approx(value)
+        else:
+            assert metrics[key] == value, key
+
+def test_metrics_match_the_baseline(report):
+    cube, rows, df = report
+    expected = _baseline(df)
+    _assert_same(metrics_from_cube(cube, rows), expected)
+    _assert_same(metrics_from_frame(df), expected)
+
+@pytest.mark.parametrize('by', ['State', 'Year'])
+def test_variant_metrics_match_the_baseline_per_value(report, by):
+    cube, rows, df = report
+    variants = variant_metrics(cube, rows, by, workers=2)
+    values = df[by].unique()
+    assert sorted(variants) == sorted(values)
+    for value in values:
+        _assert_same(variants[value], _baseline(df[df[by] == value]))
+
+def test_empty_selection_has_no_metrics(report):
+    cube, rows, _ = report
+    assert metrics_from_cube(cube, rows, State=['no such state']) is None
+    assert metrics_from_frame(pd.DataFrame({col: pd.Series(dtype=object)
+                                            for col in ['City', 'Hour', 'Weather_Condition', 'Severity']})) is None
@@ -0,0 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+import shared_dataset
+from accident_store import read_store
+from shared_dataset import shared_table
+
+COLUMNS = ['ID', 'State', 'City', 'Weather_Condition', 'Severity']
+
+def test_shared_file_matches_the_store_and_is_built_once(store_copy, monkeypatch):
+    store = store_copy
+    builds = []
+    write = shared_dataset.write_shared_file
+    monkeypatch.setattr(shared_dataset, 'write_shared_file', lambda *args: builds.append(args) or write(*args))
+    with ThreadPoolExecutor(4) as pool:
+        tables = list(pool.map(lambda _: shared_table(store, COLUMNS), range(4)))
+    assert len(builds) == 1
+    shared = tables[0].to_pandas().astype(str).sort_values('ID', ignore_index=True)
+    expected = read_store(store, columns=COLUMNS)[COLUMNS].astype(str).sort_values('ID', ignore_index=True)
+    assert shared.equals(expected)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from density_raster import US_EXTENT
+from spatial_index import SpatialIndex, bbox_ranges, bbox_expression, cell_ids, haversine_km
+
+LNG_MIN, LNG_MAX, LAT_MIN, LAT_MAX = US_EXTENT
+LAT_MID, LNG_MID = (LAT_MIN + LAT_MAX) / 2, (LNG_MIN + LNG_MAX) / 2
+
+def _points(rows=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(LAT_MIN - 2, LAT_MAX + 2, rows)  # a few points outside the extent
+    lng = rng.uniform(LNG_MIN - 2, LNG_MAX + 2, rows)
+    # a dense cluster around the center, where the coarsest cells meet
+    lat[:2000] = rng.normal(LAT_MID, 0.05, 2000)
+    lng[:2000] = rng.normal(LNG_MID, 0.05, 2000)
+    lat[-10:] = np.nan
+    df = pd.DataFrame({'Start_Lat': lat, 'Start_Lng': lng})
+    df['Cell'] = cell_ids(df['Start_Lat'], df['Start_Lng'])
+    return df
+
+BOXES = [
+    (LAT_MID - 0.1, LAT_MID + 0.1, LNG_MID - 0.1, LNG_MID + 0.1),   # across the level-1 cell corner
+    (LAT_MID - 3.0, LAT_MID + 0.01, LNG_MID - 0.01, LNG_MID + 7.0),  # thin, across both center lines
+    (34.0, 34.001, -118.3, -118.2),                                   # a few level-16 cells
+    (30.0, 45.0, -100.0, -80.0),                                      # large: coarse cells, merged ranges
+    (LAT_MIN - 1, LAT_MIN + 1, LNG_MAX - 1, LNG_MAX + 1),            # reaching outside the extent
+    (LAT_MIN, LAT_MAX, LNG_MIN, LNG_MAX),                            # the whole extent
+]
+
+def _inside(df, box):
+    lat_min, lat_max, lng_min, lng_max = box
+    return np.flatnonzero(df['Start_Lat'].between(lat_min, lat_max) & df['Start_Lng'].between(lng_min, lng_max))
+
+@pytest.mark.parametrize('box', BOXES)
+def test_bbox_is_exact(box):
+    df = _points()
+    assert np.array_equal(SpatialIndex(df).bbox(*box), _inside(df, box))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    assert len(table.filter(bbox_expression(*box))) == len(_inside(df, box))
+
+@pytest.mark.parametrize('box', BOXES)
+@pytest.mark.parametrize('max_ranges', [1, 4, 64])
+def test_ranges_cover_every_point_in_the_box(box, max_ranges):
+    df = _points()
+    cells = df['Cell'].to_numpy()[_inside(df, box)]
+    ranges = bbox_ranges(*box, max_ranges=max_ranges)
+    assert len(ranges) <= max_ranges + 1  # + the cell of points outside the extent
+    assert all(start < end for start, end in ranges)
+    covered = np.zeros(len(cells), dtype=bool)
+    for start, end in ranges:
+        covered |= (cells >= start) & (cells < end)
+    assert covered.all()
+
+def test_radius_matches_distances():
+    df = _points()
+    rows = SpatialIndex(df).radius(LAT_MID, LNG_MID, 8.0)
+    distance = haversine_km(LAT_MID, LNG_MID, df['Start_Lat'], df['Start_Lng'])
+    assert len(rows) > 0 and np.array_equal(rows, np.flatnonzero(distance <= 8.0))
@@ -0,0 +1,80 @@
+import datetime
+import pandas as pd
+import pytest
+import milestone1_analysis as m1
+from accident_store import new_ingest_state, save_ingest_state, load_ingest_state, update_aggregates, read_store
+from accident_cube import save_cube
+from accident_stats import save_stats
+from density_raster import save_rasters
+from heavy_hitters import save_heavy_hitters
+from time_rollups import save_rollups
+from data_access import store_fingerprint
+from startup_snapshot import DEFAULT_STATES, load_snapshot, save_snapshot
+
+def _full_ingest(path, store):
+    # as Milestone 1's streaming run does
+    state = new_ingest_state(m1.surviving_columns(m1.profile_data(path, 700)))
+    m1.stream_clean_to_store(path, state, store, 700)
+    save_ingest_state(state, store)
+    update_aggregates(state['aggregates'], store, replace=True)
+    save_cube(state['cube'], store)
+    save_rasters(state['rasters'], store)
+    save_stats(state['stats'], store)
+    save_heavy_hitters(state['heavy_hitters'], store)
+    save_rollups(state['rollups'], store)
+    return save_snapshot(store)
+
+@pytest.fixture
+def dumps(tmp_path, synthetic_store):
+    # the first 2000 rows as the first dump, all of them as the next one
+    df = pd.read_csv(synthetic_store['csv'])
+    old, new = str(tmp_path / 'old.csv'), str(tmp_path / 'new.csv')
+    df.iloc[:2000].to_csv(old, index=False)
+    df.to_csv(new, index=False)
+    return old, new
+
+def _expected_view(store):
+    rows = read_store(store, columns=['Start_Time', 'State', 'City', 'Weather_Condition', 'Severity'])
+    rows = rows.astype({'State': str, 'City': str, 'Weather_Condition': str})
+    states = sorted(rows['State'].unique())
+    return rows, states, rows[rows['State'].isin(states[:DEFAULT_STATES])]
+
+def test_saved_snapshot_loads_with_the_store_fingerprint(synthetic_store):
+    store = synthetic_store['store']
+    snapshot = load_snapshot(store_fingerprint(store), store)
+    rows, states, view = _expected_view(store)
+    assert snapshot['min_date'] == rows['Start_Time'].min().date()
+    assert snapshot['max_date'] == rows['Start_Time'].max().date()
+    assert isinstance(snapshot['min_date'], datetime.date)
+    assert snapshot['options']['State'] == states
+    assert snapshot['options']['Weather_Condition'] == sorted(rows['Weather_Condition'].unique())
+    assert snapshot['default_view']['State'] == states[:DEFAULT_STATES]
+    assert snapshot['kpis']['total'] == len(view)
+    assert view['City'].value_counts()[snapshot['kpis']['top_city']] == view['City'].value_counts().max()
+    assert snapshot['kpis']['severity'] == pytest.approx(view['Severity'].mean())
+
+def test_snapshot_of_another_store_version_is_ignored(tmp_path, store_copy):
+    store = store_copy
+    fingerprint = store_fingerprint(store)
+    assert load_snapshot('another version', store) is None
+    assert load_snapshot(fingerprint, str(tmp_path / 'no store')) is None
+    save_ingest_state(load_ingest_state(store), store)  # what every ingest rewrites
+    assert store_fingerprint(store) != fingerprint
+    assert load_snapshot(store_fingerprint(store), store) is None
+
+def test_incremental_run_rebuilds_the_snapshot_only_when_it_wrote_rows(tmp_path, dumps, monkeypatch):
+    old, new = dumps
+    store = str(tmp_path / 'store')
+    builds = []
+    monkeypatch.setattr(m1, 'save_snapshot', lambda store_dir: builds.append(store_dir) or save_snapshot(store_dir))
+    first = _full_ingest(old, store)
+    # nothing new: the snapshot is kept, stamped with the new fingerprint
+    assert m1.run_incremental(old, store) == 0
+    assert builds == []
+    kept = load_snapshot(store_fingerprint(store), store)
+    assert kept is not None and kept['kpis'] == first['kpis']
+
+    assert m1.run_incremental(new, store) > 0
+    assert builds == [store]
+    rebuilt = load_snapshot(store_fingerprint(store), store)
+    assert rebuilt['kpis']['total'] == len(_expected_view(store)[2]) > first['kpis']['total']
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from time_rollups import build_rollups, merge_rollups, FREQUENCIES
+
+def _frame(rows=5000, start='2019-11-20', days=500, states=('CA', 'TX', 'FL'), seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Start_Time': pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days * 24 * 60, rows), unit='min'),
+        'State': rng.choice(list(states), rows),
+        'Severity': rng.integers(1, 5, rows),
+    })
+    df.loc[:5, 'Start_Time'] = pd.NaT  # left out of the rollups
+    return df
+
+def _daily_rows(times, counts):
+    return pd.DataFrame({'Start_Time': np.repeat(pd.to_datetime(times), counts), 'State': 'CA', 'Severity': 2})
+
+def test_merged_chunks_match_the_whole():
+    # different time spans and States on either side
+    a = _frame(states=('CA', 'TX'))
+    b = _frame(start='2020-03-01', days=800, states=('TX', 'FL', 'NY'), seed=1)
+    merged = merge_rollups(build_rollups(a), build_rollups(b))
+    whole = build_rollups(pd.concat([a, b], ignore_index=True))
+    assert merged.states == whole.states and merged.severities == whole.severities
+    for freq in FREQUENCIES:
+        assert merged.arrays[freq][0] == whole.arrays[freq][0]
+        assert np.array_equal(merged.arrays[freq][1], whole.arrays[freq][1])
+        for view in [{}, {'State': ['TX']}, {'State': ['CA', 'NY'], 'Severity': [3, 4]}]:
+            pd.testing.assert_series_equal(merged.counts(freq, **view), whole.counts(freq, **view))
+
+@pytest.mark.parametrize('freq, period', [('W', 'W-SUN'), ('M', 'M')])
+def test_weeks_and_months_sum_the_days(freq, period):
+    df = _frame()
+    rollups = build_rollups(df)
+    counts = rollups.counts(freq, State=['CA', 'FL'], Severity=[2])
+    rows = df[df['State'].isin(['CA', 'FL']) & (df['Severity'] == 2)].dropna(subset=['Start_Time'])
+    expected = rows.groupby(rows['Start_Time'].dt.to_period(period).dt.start_time).size()
+    assert counts.sum() == rollups.counts('D', State=['CA', 'FL'], Severity=[2]).sum() == len(rows)
+    assert counts[counts > 0].to_dict() == expected.to_dict()
+    # each period starts on a Monday / the first of a month
+    assert (counts.index.dayofweek == 0).all() if freq == 'W' else (counts.index.day == 1).all()
+
+def test_year_over_year():
+    months = pd.date_range('2020-01-01', periods=24, freq='MS')
+    rollups = build_rollups(_daily_rows(months, [10] * 12 + [15] * 12))
+    table = rollups.year_over_year('M')
+    assert table['last_year'].iloc[:12].isna().all() and table['change'].iloc[:12].isna().all()
+    assert (table['last_year'].iloc[12:] == 10).all()
+    assert np.allclose(table['change'].iloc[12:], 0.5)
+    assert table.index[0] == pd.Timestamp('2020-01-01')
+    assert len(rollups.year_over_year('M', start='2021-03-15')) == 10
+
+def test_anomalies():
+    days = pd.date_range('2021-01-01', periods=60, freq='D')
+    counts = np.where(np.arange(60) % 2, 6, 4)
+    counts[40] = 50
+    rollups = build_rollups(_daily_rows(days, counts))
+    table = rollups.anomalies(14)
+    assert list(table.index) == [days[40]]
+    assert table['count'].iloc[0] == 50 and table['baseline'].iloc[0] == pytest.approx(5.0)
+    assert rollups.anomalies(14, start=days[41]).empty
@@ -0,0 +1,215 @@
+import os
+import numpy as np
+import pandas as pd
+from accident_store import CLEANED_STORE
+from calendar_features import day_numbers, NO_DAY
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Accident counts over time, built at ingest time and stored next to the data, so
+# trend queries over the full history never touch row-level data. Counts are kept
+# per (State, Severity) as dense int32 arrays of shape (states, severities, periods)
+# at three granularities:
+#   'D' days since 1970-01-01
+#   'W' weeks starting on Monday
+#   'M' calendar months
+# Rollups of two chunks, partitions or threads are merged by adding their arrays.
+ROLLUPS_FILE = '_rollups.npz'
+FREQUENCIES = ['D', 'W', 'M']
+# Periods per year, for year-over-year comparisons: 364 days / 52 weeks keep the
+# same weekday a year apart
+PERIODS_PER_YEAR = {'D': 364, 'W': 52, 'M': 12}
+# A period is an anomaly when it is this many standard deviations away from the
+# moving average of the periods before it
+ANOMALY_THRESHOLD = 3.0
+
+def _period_numbers(days, freq):
+    """
+    Period numbers of int day numbers: days, Monday weeks, or months since 1970.
+    """
+    days = np.asarray(days, dtype='int64')
+    if freq == 'D':
+        return days
+    if freq == 'W':
+        # 1970-01-01 was a Thursday: week 0 starts on Monday 1969-12-29
+        return (days + 3) // 7
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype('int64')
+
+def _period_starts(first, n, freq):
+    """
+    First day of n consecutive periods, as a DatetimeIndex.
+    """
+    numbers = np.arange(first, first + n)
+    if freq == 'D':
+        starts = numbers.astype('datetime64[D]')
+    elif freq == 'W':
+        starts = (numbers * 7 - 3).astype('datetime64[D]')
+    else:
+        starts = numbers.astype('datetime64[M]').astype('datetime64[D]')
+    return pd.DatetimeIndex(starts.astype('datetime64[ns]'))
+
+def _period_start(day, freq):
+    """
+    First day of the period containing a date, as a Timestamp.
+    """
+    return _period_starts(_period_numbers(day_numbers([day]), freq)[0], 1, freq)[0]
+
+def _rebin(daily, first_day, freq):
+    """
+    Daily counts summed into weeks or months: (first period, counts).
+    """
+    periods = _period_numbers(np.arange(first_day, first_day + daily.shape[-1]), freq)
+    if len(periods) == 0:
+        return 0, daily
+    bounds = np.flatnonzero(np.diff(periods, prepend=periods[0] - 1))
+    return int(periods[0]), np.add.reduceat(daily, bounds, axis=-1).astype('int32')
+
+class TimeRollups:
+    """
+    Counts per State, Severity and period. Queries sum over the selected States and
+    Severities (empty selection = all) and return pandas Series indexed by the first
+    day of each period.
+    """
+
+    def __init__(self, states, severities, arrays):
+        self.states = list(states)
+        self.severities = list(severities)
+        self.arrays = arrays  # freq -> (first period number, counts)
+        self.first_day, self.daily = arrays['D']
+
+    def day_bounds(self):
+        """
+        First and last day with an accident, as datetime.date (None if empty).
+        """
+        active = np.flatnonzero(self.daily.sum(axis=(0, 1)))
+        if len(active) == 0:
+            return None
+        return tuple(np.datetime64(self.first_day + int(i), 'D').astype(object) for i in active[[0, -1]])
+
+    def counts(self, freq='D', start=None, end=None, State=None, Severity=None):
+        """
+        Accidents per period between two dates (inclusive; the periods containing
+        them), for the selected States and Severities.
+        """
+        first, array = self.arrays[freq]
+        rows = [i for i, state in enumerate(self.states) if not State or state in set(State)]
+        cols = [i for i, level in enumerate(self.severities) if not Severity or level in set(Severity)]
+        values = array[np.ix_(rows, cols)].sum(axis=(0, 1)) if rows and cols else np.zeros(array.shape[-1], 'int64')
+        lo, hi = 0, len(values)
+        if start is not None:
+            lo = int(np.clip(_period_numbers(day_numbers([start]), freq)[0] - first, 0, hi))
+        if end is not None:
+            hi = int(np.clip(_period_numbers(day_numbers([end]), freq)[0] - first + 1, lo, hi))
+        return pd.Series(values[lo:hi].astype('int64'), index=_period_starts(first + lo, hi - lo, freq), name='count')
+
+    def moving_average(self, window, freq='D', start=None, end=None, **selected):
+        """
+        Trailing moving average over `window` periods (shorter at the start of the range).
+        """
+        counts = self.counts(freq, start, end, **selected)
+        return moving_average(counts, window)
+
+    def year_over_year(self, freq='M', start=None, end=None, **selected):
+        """
+        Counts per period next to the same period one year earlier and the relative
+        change (NaN where there is no earlier year in the data).
+        """
+        counts = self.counts(freq, None, end, **selected)
+        lag = PERIODS_PER_YEAR[freq]
+        table = pd.DataFrame({'count': counts, 'last_year': counts.shift(lag)})
+        with np.errstate(divide='ignore', invalid='ignore'):
+            table['change'] = table['count'] / table['last_year'] - 1
+        table.loc[table['last_year'] == 0, 'change'] = np.nan
+        if start is not None:
+            table = table[table.index >= _period_start(start, freq)]
+        return table
+
+    def anomalies(self, window, freq='D', start=None, end=None, threshold=ANOMALY_THRESHOLD, **selected):
+        """
+        Periods whose count is more than `threshold` standard deviations from the
+        moving average of the `window` periods before them, with that baseline and
+        the z-score.
+        """
+        counts = self.counts(freq, None, end, **selected)
+        history = counts.shift(1).rolling(window, min_periods=window)
+        table = pd.DataFrame({'count': counts, 'baseline': history.mean(), 'std': history.std()})
+        with np.errstate(divide='ignore', invalid='ignore'):
+            table['z'] = (table['count'] - table['baseline']) / table['std']
+        table = table[np.isfinite(table['z']) & (table['z'].abs() > threshold)]
+        if start is not None:
+            table = table[table.index >= _period_start(start, freq)]
+        return table
+
+def moving_average(counts, window):
+    """
+    Trailing moving average of a count Series, from its cumulative sum.
+    """
+    values = counts.to_numpy(dtype='float64')
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return pd.Series((cumulative[ends] - cumulative[starts]) / (ends - starts), index=counts.index, name='moving_average')
+
+def _from_daily(states, severities, first_day, daily):
+    arrays = {'D': (int(first_day), daily)}
+    for freq in ('W', 'M'):
+        arrays[freq] = _rebin(daily, int(first_day), freq)
+    return TimeRollups(states, severities, arrays)
+
+def build_rollups(df):
+    """
+    Rollups of a cleaned DataFrame (or one cleaned chunk). Rows without a start
+    time, State or Severity are left out.
+    """
+    days = df['Day'].to_numpy() if 'Day' in df.columns else day_numbers(df['Start_Time'])
+    valid = (days != NO_DAY) & df['State'].notna().to_numpy() & df['Severity'].notna().to_numpy()
+    states, state_codes = np.unique(df['State'].astype(object).to_numpy()[valid].astype(str), return_inverse=True)
+    severities, severity_codes = np.unique(df['Severity'].to_numpy()[valid].astype('int64'), return_inverse=True)
+    days = days[valid].astype('int64')
+    first_day = int(days.min()) if len(days) else 0
+    n_days = int(days.max()) - first_day + 1 if len(days) else 0
+    shape = (len(states), len(severities), n_days)
+    flat = np.ravel_multi_index((state_codes, severity_codes, days - first_day), shape) if len(days) else days
+    daily = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape).astype('int32')
+    return _from_daily(states.tolist(), severities.tolist(), first_day, daily)
+
+def merge_rollups(a, b):
+    """
+    Combine two TimeRollups (e.g. of two chunks, or the stored rollups and a new delta).
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    states = sorted(set(a.states) | set(b.states))
+    severities = sorted(set(a.severities) | set(b.severities))
+    parts = [r for r in (a, b) if r.daily.shape[-1]]
+    if not parts:
+        return _from_daily(states, severities, 0, np.zeros((len(states), len(severities), 0), dtype='int32'))
+    first_day = min(r.first_day for r in parts)
+    last_day = max(r.first_day + r.daily.shape[-1] for r in parts)
+    daily = np.zeros((len(states), len(severities), last_day - first_day), dtype='int32')
+    for r in parts:
+        rows = [states.index(state) for state in r.states]
+        cols = [severities.index(level) for level in r.severities]
+        offset = r.first_day - first_day
+        daily[np.ix_(rows, cols, np.arange(offset, offset + r.daily.shape[-1]))] += r.daily
+    return _from_daily(states, severities, first_day, daily)
+
+def save_rollups(rollups, store_dir=CLEANED_STORE):
+    arrays = {f'{freq}:counts': array for freq, (_, array) in rollups.arrays.items()}
+    arrays.update({f'{freq}:first': np.int64(first) for freq, (first, _) in rollups.arrays.items()})
+    np.savez_compressed(os.path.join(store_dir, ROLLUPS_FILE), states=np.array(rollups.states, dtype=str),
+                        severities=np.array(rollups.severities, dtype='int64'), **arrays)
+
+def load_rollups(store_dir=CLEANED_STORE):
+    """
+    The stored rollups, or None if Milestone 1 has not built them.
+    """
+    path = os.path.join(store_dir, ROLLUPS_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return TimeRollups([str(state) for state in data['states']], [int(level) for level in data['severities']],
+                           {freq: (int(data[f'{freq}:first']), data[f'{freq}:counts']) for freq in FREQUENCIES})